@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        autodiscover_modules('tasks')
+        if settings.PROFILING_ENABLED:
+            from . import profiling
+            profiling.instrument()
@@ -0,0 +1,166 @@
+"""PostgreSQL backend with connection health checks and pooling.
+
+Configured through extra keys of the DATABASES entry:
+
+CONN_HEALTH_CHECKS
+    Check a persistent connection with a trivial query the first time it
+    is used in a request, and reconnect if the server went away, instead
+    of failing the request.
+POOL
+    {'MAX_SIZE': n, 'TIMEOUT': seconds}. When MAX_SIZE is positive, closed
+    connections are handed back to a process wide pool of at most n
+    connections instead of being torn down, and new ones are taken from
+    it. When all n are in use, connecting waits up to TIMEOUT seconds.
+    Pooled connections go back to the pool at the end of every request
+    whatever CONN_MAX_AGE says, so that threads take turns with them.
+
+Set DISABLE_SERVER_SIDE_CURSORS as well when connecting through PgBouncer
+in transaction pooling mode.
+"""
+import queue
+import threading
+import time
+from django.db import DatabaseError
+from django.db.backends.postgresql import base
+from django.db.utils import OperationalError
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """A bounded, thread safe pool of raw psycopg2 connections"""
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.created = 0
+        self.in_use = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+
+    def get(self, connect):
+        """Return an idle connection, or one made with connect()"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f'No database connection available within {self.timeout}s '
+                f'(pool of {self.max_size})'
+            )
+        with self._lock:
+            self.in_use += 1
+        try:
+            while True:
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if not connection.closed:
+                    return connection
+            connection = connect()
+            with self._lock:
+                self.created += 1
+            return connection
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def put(self, connection):
+        """Return a connection taken with get() to the pool"""
+        try:
+            if not connection.closed:
+                status = connection.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_IDLE:
+                    self._idle.put(connection)
+                    return
+                if status != extensions.TRANSACTION_STATUS_UNKNOWN:
+                    connection.rollback()
+                    self._idle.put(connection)
+                    return
+                connection.close()
+        except DatabaseError:
+            connection.close()
+        finally:
+            self._release()
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        """Return the pool size and how many connections are in use,
+        idle and were opened in total"""
+        return {
+            'max_size': self.max_size,
+            'in_use': self.in_use,
+            'idle': self._idle.qsize(),
+            'created': self.created,
+        }
+
+
+def get_pool(alias):
+    """Return the pool of the database alias, or None if not pooled"""
+    return _pools.get(alias)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_done = False
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL') or {}
+        if options.get('MAX_SIZE', 0) <= 0:
+            return None
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = ConnectionPool(
+                    options['MAX_SIZE'], options.get('TIMEOUT', 30)
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.get(lambda: super(DatabaseWrapper, self)
+                        .get_new_connection(conn_params))
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        pool.put(self.connection)
+
+    def connect(self):
+        # A fresh connection needs no check; connect() itself calls
+        # ensure_connection() while setting the connection up
+        self.health_check_done = True
+        super().connect()
+        if self.pool is not None:
+            # A connection kept by an idle thread would hold a pool slot
+            # other threads are waiting for
+            self.close_at = time.monotonic()
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        # Runs at the start and end of every request, so the next use of
+        # a persistent connection will be health checked again
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
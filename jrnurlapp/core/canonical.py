@@ -0,0 +1,65 @@
+"""Canonical forms of urls, used to recognise the same page saved twice"""
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid',
+                   'mc_eid', 'igshid', 'yclid', '_ga'}
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def canonicalize_url(url):
+    """Return the canonical form of url.
+
+    The scheme and host are lower cased, default ports, trailing slashes
+    and tracking parameters (utm_* and click ids) are dropped. Fragments
+    only address part of a page and are dropped too, except for #! and #/
+    routes of single page applications, which address different content.
+    Urls that cannot be parsed are returned stripped but otherwise as
+    they are."""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+
+    netloc = (parts.hostname or '').rstrip('.')
+    if ':' in netloc:
+        netloc = f'[{netloc}]'
+    if parts.username is not None:
+        userinfo = parts.username
+        if parts.password is not None:
+            userinfo = f'{userinfo}:{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{netloc}:{port}'
+
+    path = parts.path.rstrip('/') or '/'
+
+    query = urlencode([
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    ])
+
+    fragment = parts.fragment
+    if not fragment.startswith(('!', '/')):
+        fragment = ''
+
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def url_hash(url):
+    """Return the fixed width (64 hex digit) SHA-256 of url's canonical
+    form"""
+    return hashlib.sha256(
+        canonicalize_url(url).encode('utf-8')
+    ).hexdigest()
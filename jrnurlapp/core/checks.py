@@ -0,0 +1,28 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+def cache_is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Return whether every process sees the writes to a cache.
+
+    A LocMemCache lives in the memory of a single process, so versions
+    bumped and entries deleted there never reach the other web workers or
+    the job workers."""
+    return not isinstance(caches[alias], LocMemCache)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when deployed with a cache of one process"""
+    if cache_is_shared():
+        return []
+    return [Warning(
+        'The default cache is kept in the memory of each process.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a cache shared by '
+             'every web and job worker, e.g. '
+             'django.core.cache.backends.memcached.PyMemcacheCache, or '
+             'responses and tokens invalidated in one process stay cached '
+             'in the others.',
+        id='core.W001',
+    )]
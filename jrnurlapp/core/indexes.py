@@ -0,0 +1,126 @@
+"""Audit the indexes of the project's tables from PostgreSQL's statistics.
+
+The statistics views count index and sequential scans since the last
+reset, so the report covers the workload of that period: look at it
+after the database has served normal traffic for a while, and reset()
+after changing indexes to measure the new ones. Only tables of
+installed models are looked at.
+"""
+from collections import namedtuple
+from django.db import connection
+
+MIN_ROWS = 1000
+
+IndexUse = namedtuple('IndexUse', 'table index size definition')
+Redundant = namedtuple('Redundant', 'table index covered_by size')
+TableScans = namedtuple('TableScans',
+                        'table rows seq_scans rows_per_scan idx_scans')
+
+
+def _tables():
+    return connection.introspection.django_table_names(only_existing=True)
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def stats_since():
+    """Return when the statistics of the database were last reset, or
+    None if they never were"""
+    return _fetch('SELECT stats_reset FROM pg_stat_database '
+                  'WHERE datname = current_database()', [])[0][0]
+
+
+def reset():
+    """Start counting scans afresh for every table of the database"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_stat_reset()')
+
+
+def unused_indexes():
+    """Return the indexes that were never scanned, leaving out the ones
+    enforcing a primary key or uniqueness, largest first"""
+    return [IndexUse(*row) for row in _fetch(
+        'SELECT stat.relname, stat.indexrelname, '
+        'pg_relation_size(stat.indexrelid), '
+        'pg_get_indexdef(stat.indexrelid) '
+        'FROM pg_stat_user_indexes AS stat '
+        'JOIN pg_index AS ind ON ind.indexrelid = stat.indexrelid '
+        'WHERE stat.idx_scan = 0 AND NOT ind.indisunique '
+        'AND ind.indisvalid '
+        'AND stat.schemaname = ANY(current_schemas(false)) '
+        'AND stat.relname = ANY(%s) '
+        'ORDER BY pg_relation_size(stat.indexrelid) DESC, stat.indexrelname',
+        [_tables()]
+    )]
+
+
+def invalid_indexes():
+    """Return the indexes left invalid by a CREATE INDEX CONCURRENTLY that
+    failed. They cost writes like any index but are never used."""
+    return [IndexUse(*row) for row in _fetch(
+        'SELECT tab.relname, idx.relname, pg_relation_size(idx.oid), '
+        'pg_get_indexdef(idx.oid) '
+        'FROM pg_index AS ind '
+        'JOIN pg_class AS idx ON idx.oid = ind.indexrelid '
+        'JOIN pg_class AS tab ON tab.oid = ind.indrelid '
+        'WHERE NOT ind.indisvalid '
+        'AND tab.relnamespace::regnamespace::name = '
+        'ANY(current_schemas(false)) '
+        'AND tab.relname = ANY(%s) '
+        'ORDER BY tab.relname, idx.relname',
+        [_tables()]
+    )]
+
+
+def redundant_indexes():
+    """Return the plain indexes whose columns, operator classes and
+    directions lead another index of the same kind on the table, which
+    serves every query they could"""
+    return [Redundant(*row) for row in _fetch(
+        'SELECT tab.relname, idx.relname, other.relname, '
+        'pg_relation_size(idx.oid) '
+        'FROM pg_index AS ind '
+        'JOIN pg_index AS wider ON wider.indrelid = ind.indrelid '
+        'AND wider.indexrelid <> ind.indexrelid '
+        'JOIN pg_class AS idx ON idx.oid = ind.indexrelid '
+        'JOIN pg_class AS other ON other.oid = wider.indexrelid '
+        'JOIN pg_class AS tab ON tab.oid = ind.indrelid '
+        'JOIN pg_am AS am ON am.oid = idx.relam '
+        "WHERE am.amname = 'btree' AND other.relam = idx.relam "
+        'AND NOT ind.indisunique AND ind.indisvalid AND wider.indisvalid '
+        'AND ind.indpred IS NULL AND wider.indpred IS NULL '
+        'AND ind.indexprs IS NULL AND wider.indexprs IS NULL '
+        # int2vector and oidvector print as space separated numbers
+        "AND wider.indkey::text || ' ' LIKE ind.indkey::text || ' %%' "
+        "AND wider.indclass::text || ' ' LIKE ind.indclass::text || ' %%' "
+        "AND wider.indoption::text || ' ' "
+        "LIKE ind.indoption::text || ' %%' "
+        # Of two identical indexes only one is redundant
+        'AND (wider.indkey::text <> ind.indkey::text '
+        'OR wider.indisunique OR wider.indexrelid < ind.indexrelid) '
+        'AND tab.relnamespace::regnamespace::name = '
+        'ANY(current_schemas(false)) '
+        'AND tab.relname = ANY(%s) '
+        'ORDER BY tab.relname, idx.relname, other.relname',
+        [_tables()]
+    )]
+
+
+def sequential_scans(min_rows=MIN_ROWS):
+    """Return the tables of at least min_rows rows that were read with
+    sequential scans, those reading the most rows first. These are the
+    tables queries are missing an index on."""
+    return [TableScans(*row) for row in _fetch(
+        'SELECT relname, n_live_tup, seq_scan, seq_tup_read / seq_scan, '
+        'COALESCE(idx_scan, 0) '
+        'FROM pg_stat_user_tables '
+        'WHERE seq_scan > 0 AND n_live_tup >= %s '
+        'AND schemaname = ANY(current_schemas(false)) '
+        'AND relname = ANY(%s) '
+        'ORDER BY seq_tup_read DESC, relname',
+        [min_rows, _tables()]
+    )]
@@ -0,0 +1,386 @@
+"""Background tasks.
+
+Functions decorated with @task run in `manage.py run_workers` instead of
+the request that queued them:
+
+    @task()
+    def import_bookmarks(user_id, path):
+        ...
+
+    job = import_bookmarks.delay(user.id, path, user=user)
+
+Every call is a Job row, which tracks its status, attempts, result and
+last error whichever broker carries it to the workers. Arguments and
+results must be JSON serializable. Apps define their tasks in a tasks
+module, which is loaded when Django starts. A task can clean up after a
+job that failed for good with a handler registered by @<task>.on_failure,
+called with the same arguments.
+
+A running job holds a lease of JOBS_LEASE seconds, which its worker
+renews with a heartbeat while the task runs: when the worker dies before
+recording the outcome, workers take the job for a failed attempt once
+the lease has expired and queue it again. An attempt taken over like
+this no longer records its outcome should it finish after all.
+
+The broker is chosen with the JOBS_BROKER setting:
+
+- DatabaseBroker, the default, polls the job table itself, claiming due
+  jobs with SELECT ... FOR UPDATE SKIP LOCKED
+- LocalBroker queues jobs in memory, for tests and single process setups
+- RedisBroker pushes job ids through a list on a Redis compatible server
+  at JOBS_BROKER_URL and needs the redis package
+"""
+import heapq
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 10
+MAX_RETRY_DELAY = 3600
+# Seconds between looks for expired leases, and the first and longest
+# waits of a worker after the broker or database failed
+REAP_INTERVAL = 60
+# Heartbeats renewing the lease of a running job within JOBS_LEASE
+HEARTBEATS_PER_LEASE = 3
+WORKER_BACKOFF = 1
+MAX_WORKER_BACKOFF = 60
+
+registry = {}
+
+
+class PermanentError(Exception):
+    """Raised by a task to fail its job without further attempts"""
+
+
+class LeaseExpired(Exception):
+    """Recorded for an attempt whose worker never reported back"""
+
+
+class Task:
+    """A function that can be run by the background workers"""
+
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.failure_handler = None
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def on_failure(self, func):
+        """Register the decorated function to be called with the
+        arguments of every job of the task that fails for good"""
+        self.failure_handler = func
+        return func
+
+    def delay(self, *args, user=None, **kwargs):
+        """Queue a call of the task, returning its Job"""
+        job = Job.objects.create(name=self.name, args=list(args),
+                                 kwargs=kwargs, user=user,
+                                 max_attempts=self.max_attempts)
+        transaction.on_commit(lambda: get_broker().enqueue(job))
+        return job
+
+
+def task(name=None, max_attempts=3):
+    """Register the decorated function as a background task"""
+    def decorator(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}',
+                          max_attempts)
+        registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def retry_delay(attempts):
+    """Return the seconds to wait before the next attempt of a job"""
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def _start(job_id):
+    """Mark a queued job as running, returning None if another worker
+    started it first"""
+    timestamp = now()
+    started = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+        status=Job.RUNNING, attempts=F('attempts') + 1, started=timestamp,
+        heartbeat=timestamp
+    )
+    return Job.objects.get(pk=job_id) if started else None
+
+
+class DatabaseBroker:
+    """Use the job table as the queue"""
+
+    def enqueue(self, job):
+        pass
+
+    def claim(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with transaction.atomic():
+                job = Job.objects.select_for_update(skip_locked=True).filter(
+                    status=Job.QUEUED, run_at__lte=now()
+                ).order_by('run_at').first()
+                if job is not None:
+                    return _start(job.pk)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(remaining, settings.JOBS_POLL_INTERVAL))
+
+
+class LocalBroker:
+    """Queue job ids in memory, for tests and single process setups"""
+
+    def __init__(self):
+        self._queue = []
+        self._ready = threading.Condition()
+
+    def enqueue(self, job):
+        with self._ready:
+            heapq.heappush(self._queue, (job.run_at.timestamp(), str(job.pk)))
+            self._ready.notify()
+
+    def claim(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self._ready:
+            while True:
+                if self._queue and self._queue[0][0] <= time.time():
+                    job_id = heapq.heappop(self._queue)[1]
+                    break
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    return None
+                if self._queue:
+                    wait = min(wait, self._queue[0][0] - time.time())
+                self._ready.wait(wait)
+        return _start(job_id)
+
+
+class RedisBroker:
+    """Push job ids through a Redis list, holding retries in a sorted set
+    until they are due"""
+    QUEUE = 'jobs:queue'
+    DELAYED = 'jobs:delayed'
+
+    def __init__(self, url=None):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker requires redis')
+        self.client = redis.Redis.from_url(url or settings.JOBS_BROKER_URL)
+
+    def enqueue(self, job):
+        if job.run_at > now():
+            self.client.zadd(self.DELAYED,
+                             {str(job.pk): job.run_at.timestamp()})
+        else:
+            self.client.lpush(self.QUEUE, str(job.pk))
+
+    def _promote_due(self):
+        due = self.client.zrangebyscore(self.DELAYED, 0, time.time())
+        for job_id in due:
+            # Only the worker that removes the id queues it
+            if self.client.zrem(self.DELAYED, job_id):
+                self.client.lpush(self.QUEUE, job_id)
+
+    def claim(self, timeout):
+        self._promote_due()
+        item = self.client.brpop(self.QUEUE, timeout=max(int(timeout), 1))
+        if item is None:
+            return None
+        return _start(item[1].decode())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the broker configured by the JOBS_BROKER setting"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.JOBS_BROKER)()
+        return _broker
+
+
+def _attempt(job):
+    """Return the job's row while it runs the attempt of job"""
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING,
+                              attempts=job.attempts)
+
+
+class Heartbeat(threading.Thread):
+    """Renew the lease of a running job until stopped, or until the job
+    was taken over"""
+
+    def __init__(self, job):
+        super().__init__(name=f'heartbeat-{job.pk}', daemon=True)
+        self.job = job
+        self.interval = settings.JOBS_LEASE / HEARTBEATS_PER_LEASE
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not _attempt(self.job).update(heartbeat=now()):
+                        return
+                except Exception:
+                    logger.exception('Heartbeat of job %s failed',
+                                     self.job.pk)
+                    connections.close_all()
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.join()
+
+
+def execute(job, broker=None):
+    """Run a started job and record its outcome.
+
+    A job that raises is queued again on broker after an exponential
+    backoff until it has used up its attempts, unless it raises
+    PermanentError."""
+    try:
+        task = registry[job.name]
+    except KeyError:
+        outcome = PermanentError(f'Unknown task {job.name}')
+    else:
+        try:
+            with Heartbeat(job):
+                job.result = task(*job.args, **job.kwargs)
+            outcome = None
+        except Exception as exc:
+            outcome = exc
+
+    if _record(job, outcome) and job.status == Job.QUEUED:
+        (broker or get_broker()).enqueue(job)
+    return job
+
+
+def _record(job, outcome):
+    """Save the outcome of a job's attempt, an exception or None, and
+    run the failure handler of a job that failed for good.
+
+    Returns False, recording nothing, when the attempt was taken over
+    after its lease expired."""
+    job.finished = now()
+    if outcome is None:
+        job.status = Job.SUCCEEDED
+        job.error = ''
+    else:
+        logger.warning('Job %s (%s) attempt %d failed', job.pk, job.name,
+                       job.attempts, exc_info=outcome)
+        job.error = ''.join(traceback.format_exception(
+            type(outcome), outcome, outcome.__traceback__
+        ))
+        if isinstance(outcome, PermanentError) or \
+                job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_at = now() + timedelta(seconds=retry_delay(job.attempts))
+
+    recorded = _attempt(job).update(status=job.status, result=job.result,
+                                    error=job.error, run_at=job.run_at,
+                                    finished=job.finished)
+    if not recorded:
+        logger.warning('Job %s (%s) attempt %d was taken over after its '
+                       'lease expired, dropping its outcome', job.pk,
+                       job.name, job.attempts)
+        return False
+
+    task = registry.get(job.name)
+    if job.status == Job.FAILED and task and task.failure_handler:
+        try:
+            task.failure_handler(*job.args, **job.kwargs)
+        except Exception:
+            logger.exception('Failure handler of job %s (%s) failed',
+                             job.pk, job.name)
+    return True
+
+
+def requeue_stalled(broker=None):
+    """Record a failed attempt for the running jobs whose lease has
+    expired, queueing them again on broker unless they have used up their
+    attempts. Returns the jobs."""
+    expired = now() - timedelta(seconds=settings.JOBS_LEASE)
+    with transaction.atomic():
+        stalled = list(Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.RUNNING, heartbeat__lt=expired
+        ))
+        for job in stalled:
+            _record(job, LeaseExpired(
+                f'No heartbeat for {settings.JOBS_LEASE}s'
+            ))
+    for job in stalled:
+        if job.status == Job.QUEUED:
+            (broker or get_broker()).enqueue(job)
+    return stalled
+
+
+class Worker:
+    """Claim and run jobs until stopped"""
+
+    def __init__(self, broker=None, poll_interval=None):
+        self.broker = broker or get_broker()
+        self.poll_interval = poll_interval if poll_interval is not None \
+            else settings.JOBS_POLL_INTERVAL
+
+    def run_one(self, timeout=0):
+        """Run the next due job, waiting up to timeout seconds for one.
+        Return the job or None."""
+        job = self.broker.claim(timeout)
+        return job and execute(job, self.broker)
+
+    def run(self, stop=None, burst=False):
+        """Run jobs until stop is set or, with burst, until none are due.
+
+        Errors of the broker or the database are logged and the worker
+        backs off, doubling the wait while they go on."""
+        stop = stop or threading.Event()
+        errors = 0
+        next_reap = time.monotonic()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    if time.monotonic() >= next_reap:
+                        requeue_stalled(self.broker)
+                        next_reap = time.monotonic() + REAP_INTERVAL
+                    job = self.run_one(0 if burst else self.poll_interval)
+                except Exception:
+                    errors += 1
+                    delay = min(WORKER_BACKOFF * 2 ** (errors - 1),
+                                MAX_WORKER_BACKOFF)
+                    logger.exception('Worker failed, retrying in %.1fs',
+                                     delay)
+                    # Reconnect rather than reuse a broken connection
+                    connections.close_all()
+                    stop.wait(delay)
+                    continue
+                errors = 0
+                if job is None and burst:
+                    return
+        finally:
+            connections.close_all()
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from core import indexes
+
+
+class Command(BaseCommand):
+    """Django command to report unused, redundant and missing indexes"""
+    help = 'Report indexes that are never used or covered by others, ' \
+           'and tables read with sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=indexes.MIN_ROWS,
+                            help='Only report sequential scans of tables '
+                                 'with at least this many rows')
+        parser.add_argument('--reset', action='store_true',
+                            help='Reset the statistics after reporting, to '
+                                 'measure from now on')
+
+    def section(self, title, lines):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for line in lines or ['  None']:
+            self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        since = indexes.stats_since()
+        self.stdout.write('Scans counted since ' + (
+            since.isoformat(timespec='seconds') if since
+            else 'the database was created'
+        ))
+
+        self.section('Invalid indexes, left by failed concurrent builds:', [
+            f'  {index.table}.{index.index} ({filesizeformat(index.size)}): '
+            f'drop and create again'
+            for index in indexes.invalid_indexes()
+        ])
+        self.section('Unused indexes:', [
+            f'  {index.table}.{index.index} ({filesizeformat(index.size)})'
+            for index in indexes.unused_indexes()
+        ])
+        self.section('Redundant indexes:', [
+            f'  {index.table}.{index.index} ({filesizeformat(index.size)}) '
+            f'is covered by {index.covered_by}'
+            for index in indexes.redundant_indexes()
+        ])
+        self.section('Sequential scans, possibly missing an index:', [
+            f'  {table.table}: {table.seq_scans} scans reading '
+            f'{table.rows_per_scan} of {table.rows} rows each, '
+            f'{table.idx_scans} index scans'
+            for table in indexes.sequential_scans(options['min_rows'])
+        ])
+
+        if options['reset']:
+            indexes.reset()
+            self.stdout.write(self.style.SUCCESS('Statistics reset'))
@@ -0,0 +1,44 @@
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from core.checks import cache_is_shared
+from core.jobs import Worker, registry
+
+
+class Command(BaseCommand):
+    """Django command to run background jobs"""
+    help = 'Run queued background jobs in concurrent worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Jobs run at the same time')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no jobs are due')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: stop.set())
+
+        if not cache_is_shared():
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to this process: cached responses of '
+                'the web workers will not see the writes of jobs. Set '
+                'CACHE_BACKEND and CACHE_LOCATION to a shared cache.'
+            ))
+        self.stdout.write(
+            f'Running {options["concurrency"]} workers for tasks: '
+            f'{", ".join(sorted(registry))}'
+        )
+        workers = [
+            threading.Thread(target=Worker().run,
+                             args=(stop, options['burst']),
+                             name=f'worker-{number}')
+            for number in range(options['concurrency'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
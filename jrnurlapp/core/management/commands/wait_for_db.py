@@ -1,20 +1,43 @@
 import time
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from core.backends.postgresql.base import get_pool
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60,
+                            help='Give up after this many seconds')
+        parser.add_argument('--max-delay', type=float, default=5,
+                            help='Longest wait between attempts')
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1
+        while True:
             try:
-                db_conn = connections['default']
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                break
             except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                connection.close()
+                if time.monotonic() + delay > deadline:
+                    raise CommandError('Database unavailable, giving up')
+                self.stdout.write(
+                    f'Database unavailable, waiting {delay:g} seconds...'
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Database is available!'))
+        pool = get_pool(connection.alias)
+        if pool is not None:
+            self.stdout.write('Connection pool: ' + ', '.join(
+                f'{key}={value}' for key, value in pool.stats().items()
+            ))
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_auto_20210128_0316'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='urlcollection',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_urlcoll_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlitem',
+            index=models.Index(fields=['user', 'title', 'id'], name='core_urlitem_user_title_idx'),
+        ),
+    ]
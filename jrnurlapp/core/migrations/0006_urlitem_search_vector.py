@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:56
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlitem',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE core_urlitem SET search_vector =
+                setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+                setweight(to_tsvector('english',
+                    COALESCE(array_to_string(tags, ' '), '')), 'B') ||
+                setweight(to_tsvector('simple', COALESCE(regexp_replace(
+                    regexp_replace(url, '^[[:alpha:]]+://', ''),
+                    '[^[:alnum:]]+', ' ', 'g'), '')), 'C')
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='urlitem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_urlitem_search_idx'),
+        ),
+    ]
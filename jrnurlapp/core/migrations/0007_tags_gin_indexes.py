@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:56
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_urlitem_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='urlcollection',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='core_urlcoll_tags_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlitem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='core_urlitem_tags_idx'),
+        ),
+    ]
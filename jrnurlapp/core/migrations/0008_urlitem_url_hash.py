@@ -0,0 +1,94 @@
+from django.db import migrations, models
+from core.canonical import url_hash
+
+BATCH_SIZE = 1000
+
+
+def fill_url_hashes(apps, schema_editor):
+    """Hash every url and merge urlitems a user saved more than once.
+
+    The oldest urlitem of each duplicate group is kept. It takes over the
+    visits, tags and collection memberships of the others, which are then
+    deleted. Urlitems are hashed, and then merged in order of user and
+    hash, a batch at a time, so only the current group's keeper and the
+    batch are held in memory. The unique constraint is added by the next
+    migration, as PostgreSQL cannot alter the table in the transaction
+    that changed its rows."""
+    URLItem = apps.get_model('core', 'URLItem')
+    URLCollectionItems = apps.get_model('core', 'URLCollectionItems')
+
+    batch = []
+    for urlitem in URLItem.objects.only('id', 'url').iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        urlitem.url_hash = url_hash(urlitem.url)
+        batch.append(urlitem)
+        if len(batch) >= BATCH_SIZE:
+            URLItem.objects.bulk_update(batch, ['url_hash'])
+            batch = []
+    URLItem.objects.bulk_update(batch, ['url_hash'])
+
+    keeper = None
+    duplicates = {}
+    urlitems = URLItem.objects.order_by(
+        'user_id', 'url_hash', 'created', 'id'
+    ).only('id', 'user_id', 'url_hash', 'visits', 'tags')
+    for urlitem in urlitems.iterator(chunk_size=BATCH_SIZE):
+        if keeper is not None and \
+                (keeper.user_id, keeper.url_hash) == \
+                (urlitem.user_id, urlitem.url_hash):
+            keeper.visits += urlitem.visits
+            keeper.tags = list(dict.fromkeys(
+                (keeper.tags or []) + (urlitem.tags or [])
+            )) or keeper.tags
+            duplicates[urlitem.id] = keeper
+            continue
+        # Merge only between groups, once their keepers are complete
+        if len(duplicates) >= BATCH_SIZE:
+            merge_duplicates(URLItem, URLCollectionItems, duplicates)
+            duplicates = {}
+        keeper = urlitem
+    merge_duplicates(URLItem, URLCollectionItems, duplicates)
+
+
+def merge_duplicates(URLItem, URLCollectionItems, duplicates):
+    """Save the keepers of duplicates, a dict of duplicate urlitem id to
+    keeper, move the duplicates' links over to them and delete the
+    duplicates"""
+    if not duplicates:
+        return
+    merged = {keeper.id: keeper for keeper in duplicates.values()}
+    URLItem.objects.bulk_update(merged.values(), ['visits', 'tags'])
+
+    linked = set(URLCollectionItems.objects.filter(
+        item_id__in=merged
+    ).values_list('collection_id', 'item_id'))
+    moved = []
+    links = URLCollectionItems.objects.filter(item_id__in=duplicates)
+    for link in links.order_by('id'):
+        keeper_id = duplicates[link.item_id].id
+        if (link.collection_id, keeper_id) in linked:
+            continue
+        linked.add((link.collection_id, keeper_id))
+        link.item_id = keeper_id
+        moved.append(link)
+    URLCollectionItems.objects.bulk_update(moved, ['item'],
+                                           batch_size=BATCH_SIZE)
+    URLItem.objects.filter(id__in=list(duplicates)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_tags_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlitem',
+            name='url_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_url_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_urlitem_url_hash'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='urlitem',
+            constraint=models.UniqueConstraint(fields=('user', 'url_hash'), name='core_urlitem_user_url_hash_uniq'),
+        ),
+    ]
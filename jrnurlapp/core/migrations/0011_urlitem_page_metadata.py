@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlitem',
+            name='canonical_url',
+            field=models.URLField(blank=True, default='', max_length=2048),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='favicon_url',
+            field=models.URLField(blank=True, default='', max_length=2048),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='fetch_status',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='fetched',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='page_title',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='urlitem',
+            index=models.Index(condition=models.Q(('fetched__isnull', True)), fields=['created'], name='core_urlitem_unfetched_idx'),
+        ),
+    ]
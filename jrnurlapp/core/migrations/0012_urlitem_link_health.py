@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_urlitem_page_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlitem',
+            name='last_visited',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='link_checked',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='link_failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='link_status',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='urlitem',
+            name='next_check',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='urlitem',
+            index=models.Index(fields=['next_check'], name='core_urlitem_next_check_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_urlitem_link_health'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='urlcollectionitems',
+            name='item',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.urlitem'),
+        ),
+        migrations.AddIndex(
+            model_name='urlcollectionitems',
+            index=models.Index(fields=['item', 'collection'], name='core_urlcollitem_item_coll_idx'),
+        ),
+    ]
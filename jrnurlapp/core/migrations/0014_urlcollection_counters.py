@@ -0,0 +1,73 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:58
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_urlcollectionitems_item_collection_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlcollection',
+            name='item_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='urlcollection',
+            name='last_item_added',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='urlcollection',
+            name='total_visits',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='urlcollectionitems',
+            name='added',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        # Links made before this migration count as added when the later
+        # of their urlitem and urlcollection was created
+        migrations.RunSQL(
+            sql="""
+            UPDATE core_urlcollectionitems AS link
+            SET added = GREATEST(urlitem.created, urlcollection.created)
+            FROM core_urlitem AS urlitem, core_urlcollection AS urlcollection
+            WHERE urlitem.id = link.item_id
+            AND urlcollection.id = link.collection_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE core_urlcollection AS urlcollection SET
+                item_count = counted.item_count,
+                total_visits = counted.total_visits,
+                last_item_added = counted.last_item_added
+            FROM (
+                SELECT link.collection_id, COUNT(*) AS item_count,
+                    COALESCE(SUM(urlitem.visits), 0) AS total_visits,
+                    MAX(link.added) AS last_item_added
+                FROM core_urlcollectionitems AS link
+                JOIN core_urlitem AS urlitem ON urlitem.id = link.item_id
+                GROUP BY link.collection_id
+            ) AS counted
+            WHERE urlcollection.id = counted.collection_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='urlcollection',
+            index=models.Index(fields=['user', 'item_count', 'id'], name='core_urlcoll_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urlcollection',
+            index=models.Index(django.db.models.expressions.F('user'), django.db.models.expressions.OrderBy(django.db.models.expressions.F('last_item_added'), descending=True, nulls_last=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('id'), descending=True), name='core_urlcoll_user_activity_idx'),
+        ),
+    ]
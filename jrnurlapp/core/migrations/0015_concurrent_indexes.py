@@ -0,0 +1,181 @@
+"""Index the queries of the API without blocking writes.
+
+Indexes are built, and the single column foreign key indexes they make
+redundant dropped, CONCURRENTLY so the migration can run on a live
+database. That cannot happen in a transaction, so the migration is not
+atomic. A build that is interrupted leaves an invalid index behind, which
+`manage.py index_report` lists; drop it before migrating again.
+"""
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+# The foreign key indexes led by a composite index of this migration or
+# an earlier one: (model, field, leading index)
+REDUNDANT_INDEXES = (
+    ('urlcollection', 'user', 'core_urlcoll_user_name_idx'),
+    ('urlcollectionitems', 'collection', 'core_urlcollitem_coll_item_uniq'),
+    ('urlcollectionitems', 'user', 'core_urlcollitem_user_pk_idx'),
+    ('urlitem', 'user', 'core_urlitem_user_pk_idx'),
+)
+
+
+def remove_duplicate_links(apps, schema_editor):
+    """Keep the first of the links between the same urlcollection and
+    urlitem, and recount the urlcollections that had more"""
+    with transaction.atomic(using=schema_editor.connection.alias), \
+            schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            DELETE FROM core_urlcollectionitems AS link
+            USING core_urlcollectionitems AS kept
+            WHERE link.collection_id = kept.collection_id
+            AND link.item_id = kept.item_id
+            AND (link.added, link.id) > (kept.added, kept.id)
+            RETURNING link.collection_id
+        """)
+        collection_ids = list({str(pk) for pk, in cursor.fetchall()})
+        if not collection_ids:
+            return
+        cursor.execute("""
+            UPDATE core_urlcollection AS urlcollection SET
+                item_count = counted.item_count,
+                total_visits = counted.total_visits,
+                last_item_added = counted.last_item_added
+            FROM (
+                SELECT link.collection_id, COUNT(*) AS item_count,
+                    COALESCE(SUM(urlitem.visits), 0) AS total_visits,
+                    MAX(link.added) AS last_item_added
+                FROM core_urlcollectionitems AS link
+                JOIN core_urlitem AS urlitem ON urlitem.id = link.item_id
+                WHERE link.collection_id = ANY(%s::uuid[])
+                GROUP BY link.collection_id
+            ) AS counted
+            WHERE urlcollection.id = counted.collection_id
+        """, [collection_ids])
+
+
+def _foreign_key_index(apps, schema_editor, model_name, field_name):
+    model = apps.get_model('core', model_name)
+    column = model._meta.get_field(field_name).column
+    return model, column, schema_editor._create_index_name(
+        model._meta.db_table, [column]
+    )
+
+
+def drop_redundant_indexes(apps, schema_editor):
+    for model_name, field_name, leading in REDUNDANT_INDEXES:
+        model, column, name = _foreign_key_index(apps, schema_editor,
+                                                 model_name, field_name)
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(name)}'
+        )
+
+
+def create_redundant_indexes(apps, schema_editor):
+    for model_name, field_name, leading in REDUNDANT_INDEXES:
+        model, column, name = _foreign_key_index(apps, schema_editor,
+                                                 model_name, field_name)
+        quote = schema_editor.quote_name
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(name)} '
+            f'ON {quote(model._meta.db_table)} ({quote(column)})'
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0014_urlcollection_counters'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='urlitem',
+            index=models.Index(fields=['user', 'id'],
+                               name='core_urlitem_user_pk_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='urlcollectionitems',
+            index=models.Index(fields=['user', 'id'],
+                               name='core_urlcollitem_user_pk_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_links,
+                             migrations.RunPython.noop),
+        # The unique index is built concurrently and then turned into the
+        # constraint, which only takes a brief lock
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql='CREATE UNIQUE INDEX CONCURRENTLY '
+                        'core_urlcollitem_coll_item_uniq '
+                        'ON core_urlcollectionitems (collection_id, item_id)',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS '
+                                'core_urlcollitem_coll_item_uniq',
+                ),
+                migrations.RunSQL(
+                    sql='ALTER TABLE core_urlcollectionitems '
+                        'ADD CONSTRAINT core_urlcollitem_coll_item_uniq '
+                        'UNIQUE USING INDEX core_urlcollitem_coll_item_uniq',
+                    reverse_sql='ALTER TABLE core_urlcollectionitems '
+                                'DROP CONSTRAINT '
+                                'core_urlcollitem_coll_item_uniq',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='urlcollectionitems',
+                    constraint=models.UniqueConstraint(
+                        fields=('collection', 'item'),
+                        name='core_urlcollitem_coll_item_uniq'
+                    ),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(drop_redundant_indexes,
+                                     create_redundant_indexes),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='urlcollection',
+                    name='user',
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name='urlcollectionitems',
+                    name='collection',
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='core.urlcollection'
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name='urlcollectionitems',
+                    name='user',
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name='urlitem',
+                    name='user',
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+        ),
+    ]
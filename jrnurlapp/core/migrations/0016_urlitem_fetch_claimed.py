@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_concurrent_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='urlitem',
+            name='fetch_claimed',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_urlitem_fetch_claimed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Jobs running now hold the lease they took when they started
+        migrations.RunSQL(
+            sql="UPDATE core_job SET heartbeat = started "
+                "WHERE status = 'running'",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
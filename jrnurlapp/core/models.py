@@ -1,13 +1,35 @@
 from django.contrib.auth.models import AbstractBaseUser, \
     BaseUserManager, PermissionsMixin
 from django.conf import settings
+from django.core.exceptions import EmptyResultSet
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import connections, models, router, transaction
+from django.dispatch import Signal
 from django.utils.timezone import now
 import uuid
+from datetime import timedelta
+from . import canonical
 
 
-class UserManager(BaseUserManager):
+# Sent by updates of User querysets with the pks of the updated users,
+# since QuerySet.update() sends no post_save
+users_updated = Signal()
+
+
+class UserQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        """Update the users and send users_updated"""
+        pks = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        if pks:
+            users_updated.send(sender=self.model, pks=pks)
+        return rows
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
 
     def create_user(self, email, password=None, **extra_fields):
         """Creates and saves a new user"""
@@ -39,6 +61,135 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class TaggedQuerySet(models.QuerySet):
+
+    def tag_counts(self, limit=None):
+        """Return (tag, count) pairs over the tags of the queryset,
+        most used first"""
+        try:
+            sql, params = self.order_by().values(
+                'tags'
+            ).query.sql_with_params()
+        except EmptyResultSet:
+            return []
+        sql = f'SELECT tag, COUNT(*) FROM ({sql}) AS tagged, ' \
+              f'unnest(tagged.tags) AS tag ' \
+              f'GROUP BY tag ORDER BY COUNT(*) DESC, tag'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params += (limit,)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+def _touch_modified(instance, kwargs):
+    """Stamp instance.modified, including it in update_fields if given"""
+    instance.modified = now()
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        kwargs['update_fields'] = set(update_fields) | {'modified'}
+
+
+class URLCollectionQuerySet(TaggedQuerySet):
+
+    def touch(self):
+        """Mark every urlcollection in the queryset as modified now"""
+        return self.update(modified=now())
+
+    def count_added(self, links):
+        """Count links, URLCollectionItems that were just inserted, into
+        the counters of their urlcollections in a single UPDATE"""
+        return self._count_links(links, added=True)
+
+    def count_removed(self, links):
+        """Take links, URLCollectionItems that were just deleted, off the
+        counters of their urlcollections in a single UPDATE.
+
+        last_item_added is only looked up again for the urlcollections
+        that lost their most recently added link."""
+        return self._count_links(links, added=False)
+
+    def _count_links(self, links, added):
+        if not links:
+            return 0
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        collections = quote(self.model._meta.db_table)
+        urlitems = quote(URLItem._meta.db_table)
+        if added:
+            operator = '+'
+            last_item_added = 'GREATEST(urlcollection.last_item_added, ' \
+                'changed.last_item_added)'
+        else:
+            operator = '-'
+            last_item_added = (
+                f'CASE WHEN urlcollection.last_item_added > '
+                f'changed.last_item_added '
+                f'THEN urlcollection.last_item_added '
+                f'ELSE (SELECT MAX(link.added) '
+                f'FROM {quote(URLCollectionItems._meta.db_table)} AS link '
+                f'WHERE link.collection_id = urlcollection.id) END'
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {collections} AS urlcollection SET '
+                f'item_count = urlcollection.item_count {operator} '
+                f'changed.item_count, '
+                f'total_visits = urlcollection.total_visits {operator} '
+                f'changed.total_visits, '
+                f'last_item_added = {last_item_added} '
+                f'FROM (SELECT link.collection_id, COUNT(*) AS item_count, '
+                f'COALESCE(SUM(urlitem.visits), 0) AS total_visits, '
+                f'MAX(link.added) AS last_item_added '
+                f'FROM unnest(%s::uuid[], %s::uuid[], %s::timestamptz[]) '
+                f'AS link (collection_id, item_id, added) '
+                f'LEFT JOIN {urlitems} AS urlitem '
+                f'ON urlitem.id = link.item_id '
+                f'GROUP BY link.collection_id) AS changed '
+                f'WHERE urlcollection.id = changed.collection_id',
+                [[str(link.collection_id) for link in links],
+                 [str(link.item_id) for link in links],
+                 [link.added for link in links]]
+            )
+            return cursor.rowcount
+
+    def recount(self):
+        """Recompute the counters of every urlcollection in the queryset
+        from its links in a single UPDATE, repairing any drift. Returns
+        how many urlcollections were out of date."""
+        try:
+            ids, params = self.order_by().values('pk').query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        collections = quote(self.model._meta.db_table)
+        links = quote(URLCollectionItems._meta.db_table)
+        urlitems = quote(URLItem._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {collections} AS urlcollection SET '
+                f'item_count = counted.item_count, '
+                f'total_visits = counted.total_visits, '
+                f'last_item_added = counted.last_item_added '
+                f'FROM ({ids}) AS target (id) CROSS JOIN LATERAL ('
+                f'SELECT COUNT(*) AS item_count, '
+                f'COALESCE(SUM(urlitem.visits), 0) AS total_visits, '
+                f'MAX(link.added) AS last_item_added '
+                f'FROM {links} AS link JOIN {urlitems} AS urlitem '
+                f'ON urlitem.id = link.item_id '
+                f'WHERE link.collection_id = target.id) AS counted '
+                f'WHERE urlcollection.id = target.id AND ('
+                f'urlcollection.item_count, urlcollection.total_visits, '
+                f'urlcollection.last_item_added) IS DISTINCT FROM ('
+                f'counted.item_count, counted.total_visits, '
+                f'counted.last_item_added)',
+                params
+            )
+            return cursor.rowcount
+
+
 class URLCollection(models.Model):
     CAPTURED = 100
     TECHNICAL = 200
@@ -71,15 +222,289 @@ class URLCollection(models.Model):
                       blank=True, size=25)
     items = models.ManyToManyField('URLItem', through='URLCollectionItems',
                                    blank=True)
+    # Leads the composite indexes below
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE,
+                             db_index=False)
+    # Counters of the links, kept as they are added and removed
+    item_count = models.IntegerField(default=0, editable=False)
+    total_visits = models.BigIntegerField(default=0, editable=False)
+    last_item_added = models.DateTimeField(blank=True, null=True,
+                                           editable=False)
+
+    objects = URLCollectionQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('item_count', 'total_visits', 'last_item_added')
 
     def __str__(self):
         return f'{self.get_collection_type_display()} - {self.name}'
 
+    def save(self, *args, **kwargs):
+        """Save the urlcollection, stamping it as modified.
+
+        The counters are only written when the urlcollection is created,
+        so saving an instance does not undo the links counted since it
+        was loaded."""
+        _touch_modified(self, kwargs)
+        if not self._state.adding and not kwargs.get('force_insert') \
+                and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['name']
         verbose_name_plural = "URL Collections"
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_urlcoll_user_name_idx'),
+            GinIndex(fields=['tags'], name='core_urlcoll_tags_idx'),
+            # Ordering by size and by activity, most recent first
+            models.Index(fields=['user', 'item_count', 'id'],
+                         name='core_urlcoll_user_count_idx'),
+            models.Index(models.F('user'),
+                         models.F('last_item_added').desc(nulls_last=True),
+                         models.F('id').desc(),
+                         name='core_urlcoll_user_activity_idx'),
+        ]
+
+
+def urlitem_search_vector():
+    """Return the expression that builds a urlitem's search vector.
+
+    Titles and tags are stemmed as English. The url is split into its
+    host and path words, without the scheme, and indexed unstemmed."""
+    url_words = models.Func(
+        models.Func(models.F('url'), models.Value('^[[:alpha:]]+://'),
+                    models.Value(''), function='regexp_replace'),
+        models.Value('[^[:alnum:]]+'), models.Value(' '), models.Value('g'),
+        function='regexp_replace', output_field=models.TextField()
+    )
+    tag_words = models.Func(models.F('tags'), models.Value(' '),
+                            function='array_to_string',
+                            output_field=models.TextField())
+    return (
+        SearchVector('title', weight='A', config='english') +
+        SearchVector(tag_words, weight='B', config='english') +
+        SearchVector(url_words, weight='C', config='simple')
+    )
+
+
+def visited_link_check(timestamp):
+    """Return when the link of a urlitem visited at timestamp should be
+    checked at the latest"""
+    return timestamp + timedelta(
+        days=settings.JRNURL_LINK_CHECK_VISITED_DAYS
+    )
+
+
+def _collection_visits_sql(connection):
+    """Return an UPDATE adding the visits of visited, a WITH query of
+    (urlitem id, visits) rows, to the total_visits of the urlcollections
+    linking those urlitems"""
+    quote = connection.ops.quote_name
+    return (
+        f'UPDATE {quote(URLCollection._meta.db_table)} AS urlcollection '
+        f'SET total_visits = urlcollection.total_visits + linked.visits '
+        f'FROM (SELECT link.collection_id, SUM(visited.visits) AS visits '
+        f'FROM visited '
+        f'JOIN {quote(URLCollectionItems._meta.db_table)} AS link '
+        f'ON link.item_id = visited.id '
+        f'GROUP BY link.collection_id) AS linked '
+        f'WHERE urlcollection.id = linked.collection_id'
+    )
+
+
+class URLItemQuerySet(TaggedQuerySet):
+
+    def update_search_vector(self):
+        """Recompute the search vector of every urlitem in the queryset"""
+        return self.update(search_vector=urlitem_search_vector())
+
+    def visit(self):
+        """Count a visit of every urlitem in the queryset, and of their
+        urlcollections, marking them as modified and bringing their next
+        link check forward"""
+        try:
+            ids, params = self.order_by().values('pk').query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        timestamp = now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH visited AS (UPDATE {table} AS urlitem '
+                f'SET visits = urlitem.visits + 1, '
+                f'modified = %s, last_visited = %s, '
+                f'next_check = LEAST(urlitem.next_check, %s) '
+                f'WHERE urlitem.id IN ({ids}) '
+                f'RETURNING urlitem.id, 1 AS visits), '
+                f'totals AS ({_collection_visits_sql(connection)}) '
+                f'SELECT COUNT(*) FROM visited',
+                [timestamp, timestamp, visited_link_check(timestamp),
+                 *params]
+            )
+            return cursor.fetchone()[0]
+
+    def add_visits(self, counts):
+        """Add counts, a mapping of urlitem id to number of visits, to the
+        urlitems and their urlcollections in a single statement, and
+        mark the urlitems as visited and modified.
+
+        Returns the ids of the users owning the updated urlitems."""
+        if not counts:
+            return set()
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        ids, visits = zip(*counts.items())
+        timestamp = now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH visited AS (UPDATE {table} AS urlitem '
+                f'SET visits = urlitem.visits + counted.visits, '
+                f'modified = %s, last_visited = %s, '
+                f'next_check = LEAST(urlitem.next_check, %s) '
+                f'FROM unnest(%s::uuid[], %s::integer[]) '
+                f'AS counted (id, visits) '
+                f'WHERE urlitem.id = counted.id '
+                f'RETURNING urlitem.id, counted.visits, urlitem.user_id), '
+                f'totals AS ({_collection_visits_sql(connection)}) '
+                f'SELECT DISTINCT user_id FROM visited',
+                [timestamp, timestamp, visited_link_check(timestamp),
+                 [str(pk) for pk in ids], list(visits)]
+            )
+            return {user_id for user_id, in cursor.fetchall()}
+
+    def claim_link_checks(self, limit, lease):
+        """Return (id, url) of up to limit urlitems in the queryset that
+        are due for a link check, choosing the ones due earliest.
+
+        The claimed urlitems are not due again until lease has passed, so
+        concurrent checkers claim different urlitems and ones that are
+        never reported back are retried. Rows locked by another checker
+        are skipped."""
+        due = self.filter(next_check__lte=now()).order_by('next_check')
+        ids = due.values('id')[:limit].select_for_update(skip_locked=True)
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with transaction.atomic(using=self.db), \
+                connections[self.db].cursor() as cursor:
+            query, params = ids.query.sql_with_params()
+            cursor.execute(
+                f'UPDATE {table} SET next_check = %s '
+                f'WHERE id IN ({query}) RETURNING id, url',
+                [now() + lease, *params]
+            )
+            return cursor.fetchall()
+
+    def claim_metadata_fetches(self, limit, lease):
+        """Return (id, url) of up to limit urlitems in the queryset whose
+        page metadata has not been fetched, oldest first.
+
+        The claimed urlitems are not handed out again until lease has
+        passed, so concurrent fetches claim different urlitems and ones
+        that are never written back are retried. Rows locked by another
+        fetch are skipped."""
+        timestamp = now()
+        pending = self.filter(
+            models.Q(fetch_claimed__isnull=True) |
+            models.Q(fetch_claimed__lte=timestamp),
+            fetched__isnull=True
+        ).order_by('created')
+        ids = pending.values('id')[:limit].select_for_update(skip_locked=True)
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with transaction.atomic(using=self.db), \
+                connections[self.db].cursor() as cursor:
+            query, params = ids.query.sql_with_params()
+            cursor.execute(
+                f'UPDATE {table} SET fetch_claimed = %s '
+                f'WHERE id IN ({query}) RETURNING id, url',
+                [timestamp + lease, *params]
+            )
+            return cursor.fetchall()
+
+    def set_link_status(self, statuses):
+        """Store link check results, a list of (urlitem id, HTTP status)
+        pairs with None for unreachable links, in a single UPDATE.
+
+        Each urlitem is scheduled for its next check: links visited in the
+        last JRNURL_LINK_CHECK_DAYS after JRNURL_LINK_CHECK_VISITED_DAYS,
+        others after JRNURL_LINK_CHECK_DAYS and broken links after a
+        backoff that starts at the shorter interval and doubles with every
+        failure in a row. Returns the ids of the users owning the
+        updated urlitems."""
+        if not statuses:
+            return set()
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        ids, codes = zip(*statuses)
+        timestamp = now()
+        interval = timedelta(days=settings.JRNURL_LINK_CHECK_DAYS)
+        visited_interval = timedelta(
+            days=settings.JRNURL_LINK_CHECK_VISITED_DAYS
+        )
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS urlitem '
+                f'SET link_status = checked.status, link_checked = %s, '
+                f'modified = %s, '
+                f'link_failures = CASE WHEN {URLItem.BROKEN_SQL} '
+                f'THEN urlitem.link_failures + 1 ELSE 0 END, '
+                f'next_check = %s + CASE '
+                f'WHEN {URLItem.BROKEN_SQL} THEN LEAST('
+                f'%s * power(2, LEAST(urlitem.link_failures, 16)), %s) '
+                f'WHEN urlitem.last_visited > %s THEN %s '
+                f'ELSE %s END '
+                f'FROM unnest(%s::uuid[], %s::integer[]) '
+                f'AS checked (id, status) '
+                f'WHERE urlitem.id = checked.id '
+                f'RETURNING urlitem.user_id',
+                [timestamp, timestamp, timestamp,
+                 visited_interval, interval,
+                 timestamp - interval, visited_interval,
+                 interval, [str(pk) for pk in ids], list(codes)]
+            )
+            return {user_id for user_id, in cursor.fetchall()}
+
+    def set_metadata(self, pages):
+        """Store fetched page metadata, a list of (urlitem id, metadata)
+        pairs, in a single UPDATE.
+
+        Urlitems saved without a title of their own, which get their url
+        as title, take the page title. Returns the ids of the users owning
+        the updated urlitems."""
+        if not pages:
+            return set()
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        columns = ([str(pk) for pk, page in pages],) + tuple(
+            [page.get(field) for pk, page in pages]
+            for field in URLItem.METADATA_FIELDS
+        )
+        timestamp = now()
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS urlitem '
+                f'SET page_title = page.page_title, '
+                f'canonical_url = page.canonical_url, '
+                f'favicon_url = page.favicon_url, '
+                f'fetch_status = page.fetch_status, fetched = %s, '
+                f'modified = %s, '
+                f'title = CASE WHEN urlitem.title = urlitem.url '
+                f"AND page.page_title <> '' THEN page.page_title "
+                f'ELSE urlitem.title END '
+                f'FROM unnest(%s::uuid[], %s::varchar[], %s::varchar[], '
+                f'%s::varchar[], %s::integer[]) '
+                f'AS page (id, page_title, canonical_url, favicon_url, '
+                f'fetch_status) '
+                f'WHERE urlitem.id = page.id '
+                f'RETURNING urlitem.user_id',
+                [timestamp, timestamp, *columns]
+            )
+            user_ids = {user_id for user_id, in cursor.fetchall()}
+        self.filter(pk__in=columns[0]).update_search_vector()
+        return user_ids
 
 
 class URLItem(models.Model):
@@ -88,6 +513,7 @@ class URLItem(models.Model):
                           editable=False)
     title = models.CharField(max_length=255)
     url = models.URLField(max_length=2048)
+    url_hash = models.CharField(max_length=64, editable=False)
     visits = models.IntegerField()
     created = models.DateTimeField(blank=True,
                                    null=True,
@@ -101,28 +527,172 @@ class URLItem(models.Model):
     collection = models.ManyToManyField('URLCollection',
                                         through='URLCollectionItems',
                                         blank=True)
+    # Leads the composite indexes below
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE,
+                             db_index=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Metadata of the page, filled in by jrnurl.metadata
+    page_title = models.CharField(max_length=255, blank=True, default='')
+    canonical_url = models.URLField(max_length=2048, blank=True, default='')
+    favicon_url = models.URLField(max_length=2048, blank=True, default='')
+    fetch_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    fetched = models.DateTimeField(blank=True, null=True)
+    # Until when a metadata fetch has claimed the urlitem
+    fetch_claimed = models.DateTimeField(blank=True, null=True,
+                                         editable=False)
+    # Link health, kept by jrnurl.links
+    last_visited = models.DateTimeField(blank=True, null=True)
+    link_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    link_checked = models.DateTimeField(blank=True, null=True)
+    link_failures = models.PositiveSmallIntegerField(default=0)
+    next_check = models.DateTimeField(default=now)
+
+    objects = URLItemQuerySet.as_manager()
+
+    SEARCH_FIELDS = {'title', 'url', 'tags'}
+    METADATA_FIELDS = ('page_title', 'canonical_url', 'favicon_url',
+                       'fetch_status')
+    # A check failed to connect or got an error response
+    BROKEN_SQL = '(checked.status IS NULL OR checked.status >= 400)'
 
     def __str__(self):
         return self.title
 
+    def set_url_hash(self):
+        """Set url_hash from the canonical form of url"""
+        self.url_hash = canonical.url_hash(self.url)
+
+    def save(self, *args, **kwargs):
+        """Save the urlitem, stamping it as modified and refreshing its
+        url hash and search vector, and the visits of its urlcollections,
+        if needed"""
+        _touch_modified(self, kwargs)
+        self.set_url_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'url' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'url_hash'}
+        using = kwargs.get('using') or router.db_for_write(URLItem)
+        with transaction.atomic(using=using):
+            if not self._state.adding and \
+                    (update_fields is None or 'visits' in update_fields):
+                self._count_changed_visits(connections[using])
+            super().save(*args, **kwargs)
+            if update_fields is None or \
+                    self.SEARCH_FIELDS & set(update_fields):
+                URLItem.objects.using(using).filter(
+                    pk=self.pk
+                ).update_search_vector()
+
+    def _count_changed_visits(self, connection):
+        # The row stays locked until it is saved, so visits counted
+        # meanwhile cannot slip between the two
+        table = connection.ops.quote_name(self._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH visited AS (SELECT id, %s - visits AS visits '
+                f'FROM {table} WHERE id = %s AND visits <> %s '
+                f'FOR UPDATE) {_collection_visits_sql(connection)}',
+                [self.visits, self.pk, self.visits]
+            )
+
     class Meta:
         ordering = ['title']
         verbose_name_plural = "URL Items"
+        indexes = [
+            models.Index(fields=['user', 'title', 'id'],
+                         name='core_urlitem_user_title_idx'),
+            # Exports and other scans of all of a user's urlitems
+            models.Index(fields=['user', 'id'],
+                         name='core_urlitem_user_pk_idx'),
+            GinIndex(fields=['search_vector'],
+                     name='core_urlitem_search_idx'),
+            GinIndex(fields=['tags'], name='core_urlitem_tags_idx'),
+            # The link checker claims the urlitems due earliest
+            models.Index(fields=['next_check'],
+                         name='core_urlitem_next_check_idx'),
+            # Urlitems waiting for their page metadata
+            models.Index(fields=['created'],
+                         condition=models.Q(fetched__isnull=True),
+                         name='core_urlitem_unfetched_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'url_hash'],
+                                    name='core_urlitem_user_url_hash_uniq'),
+        ]
 
 
 class URLCollectionItems(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Indexed together with item below, and the other way round
     collection = models.ForeignKey(URLCollection,
-                                   on_delete=models.CASCADE)
+                                   on_delete=models.CASCADE,
+                                   db_index=False)
     item = models.ForeignKey(URLItem,
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE,
+                             db_index=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE,
+                             db_index=False)
+    added = models.DateTimeField(default=now, editable=False)
 
     def __str__(self):
         return self.collection.name + ': ' + self.item.title
 
     class Meta:
         verbose_name_plural = "URL Collection Items"
+        indexes = [
+            # Finds the collections holding a urlitem from the index alone
+            models.Index(fields=['item', 'collection'],
+                         name='core_urlcollitem_item_coll_idx'),
+            models.Index(fields=['user', 'id'],
+                         name='core_urlcollitem_user_pk_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['collection', 'item'],
+                                    name='core_urlcollitem_coll_item_uniq'),
+        ]
+
+
+class Job(models.Model):
+    """A call of a background task and its outcome"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    run_at = models.DateTimeField(default=now)
+    created = models.DateTimeField(default=now)
+    started = models.DateTimeField(blank=True, null=True)
+    # Last renewal of the lease of a running job
+    heartbeat = models.DateTimeField(blank=True, null=True)
+    finished = models.DateTimeField(blank=True, null=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE,
+                             blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+    class Meta:
+        indexes = [
+            # Workers poll for the next queued job that is due
+            models.Index(fields=['run_at'],
+                         condition=models.Q(status='queued'),
+                         name='core_job_queued_run_at_idx'),
+        ]
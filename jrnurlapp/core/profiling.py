@@ -0,0 +1,327 @@
+"""Per-request profiling.
+
+ProfilingMiddleware measures the total latency of every request, the
+number of database queries it ran and the time they took, and the time
+spent serializing its response, and adds them to histograms per view
+(URLItemViewSet.create, CreateTokenView, ...). core.views.metrics serves
+the histograms on /metrics in the Prometheus text format, to staff
+users and to scrapers sending the METRICS_TOKEN setting as a bearer
+token. Every process keeps its own histograms, so each gunicorn worker
+is a scrape target of its own.
+
+A request sending `X-Profile: 1` gets the breakdown of that request back
+in an X-Profile response header (and in Server-Timing, which browser
+developer tools display), including the SQL statements that ran more
+than once, the usual sign of a query per row. The breakdown is only
+given to staff users, or to anyone when DEBUG is on.
+
+Queries are timed by an execute wrapper on every database connection.
+Serialization is the time spent in serializer.data and in rendering the
+response, less the queries run meanwhile. Both find the profile of the
+request through a context variable, so the worker threads of
+jrnurl.async_views count towards the request that started them.
+"""
+import asyncio
+import contextvars
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+from rest_framework.response import Response
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+UNRESOLVED = 'unresolved'
+MAX_DUPLICATES = 10
+MAX_SQL_LENGTH = 500
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+current = contextvars.ContextVar('profile', default=None)
+
+
+class Profile:
+    """What one request spent where"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = []
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self._serializing = 0
+
+    def add_query(self, sql, params, duration):
+        self.queries.append((sql, params))
+        self.db_time += duration
+
+    @contextmanager
+    def serializing(self):
+        """Count the time spent in the block as serialization, unless an
+        enclosing block already does"""
+        self._serializing += 1
+        if self._serializing > 1:
+            try:
+                yield
+            finally:
+                self._serializing -= 1
+            return
+        started, db_time = time.perf_counter(), self.db_time
+        try:
+            yield
+        finally:
+            self._serializing -= 1
+            self.serialize_time += time.perf_counter() - started - \
+                (self.db_time - db_time)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def duplicates(self):
+        """Return the statements run more than once, most repeated first,
+        with how many of the runs had identical parameters"""
+        statements = Counter(sql for sql, params in self.queries)
+        runs = Counter((sql, repr(params)) for sql, params in self.queries
+                       if statements[sql] > 1)
+        identical = Counter()
+        for (sql, params), count in runs.items():
+            if count > 1:
+                identical[sql] += count
+        return [
+            {'sql': sql[:MAX_SQL_LENGTH], 'count': count,
+             'identical': identical[sql]}
+            for sql, count in statements.most_common(MAX_DUPLICATES)
+            if count > 1
+        ]
+
+    def breakdown(self, view):
+        return {
+            'view': view,
+            'total_ms': round(self.total * 1000, 2),
+            'queries': len(self.queries),
+            'db_ms': round(self.db_time * 1000, 2),
+            'serialize_ms': round(self.serialize_time * 1000, 2),
+            'duplicates': self.duplicates(),
+        }
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"') \
+        .replace('\n', r'\n')
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per view"""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                # Per bucket counts, the +Inf bucket, then the sum
+                series = self._series[view] = [0] * (len(self.buckets) + 2)
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((view, values[:])
+                            for view, values in self._series.items())
+        for view, values in series:
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},'
+                             f'le="{_format(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {values[-1]!r}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return '\n'.join(lines)
+
+
+request_duration = Histogram(
+    'jrnurl_request_duration_seconds',
+    'Total time taken to answer requests', SECONDS_BUCKETS
+)
+request_queries = Histogram(
+    'jrnurl_request_db_queries',
+    'Database queries run per request', QUERY_BUCKETS
+)
+request_db_duration = Histogram(
+    'jrnurl_request_db_duration_seconds',
+    'Time spent running database queries per request', SECONDS_BUCKETS
+)
+request_serialize_duration = Histogram(
+    'jrnurl_request_serialize_duration_seconds',
+    'Time spent serializing and rendering responses', SECONDS_BUCKETS
+)
+histograms = (request_duration, request_queries, request_db_duration,
+              request_serialize_duration)
+
+
+def record(view, profile):
+    request_duration.observe(view, profile.total)
+    request_queries.observe(view, len(profile.queries))
+    request_db_duration.observe(view, profile.db_time)
+    request_serialize_duration.observe(view, profile.serialize_time)
+
+
+def render_metrics():
+    """Return every histogram in the Prometheus text format"""
+    return '\n'.join(histogram.render() for histogram in histograms) + '\n'
+
+
+def clear_metrics():
+    for histogram in histograms:
+        histogram.clear()
+
+
+def view_name(request):
+    """Return the view that answered request as the class name and
+    viewset action, or the dotted path of a function view"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match._func_path
+    action = (getattr(match.func, 'actions', None) or {}).get(
+        request.method.lower()
+    )
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+def _time_query(execute, sql, params, many, context):
+    profile = current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, params, time.perf_counter() - started)
+
+
+def _add_query_timer(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _time_serialization(cls, name):
+    prop = getattr(cls, name)
+    if getattr(prop.fget, 'profiled', False):
+        return
+
+    def fget(self):
+        profile = current.get()
+        if profile is None:
+            return prop.fget(self)
+        with profile.serializing():
+            return prop.fget(self)
+
+    fget.profiled = True
+    setattr(cls, name, property(fget, doc=prop.__doc__))
+
+
+_instrumented = False
+_instrument_lock = threading.Lock()
+
+
+def instrument():
+    """Time the queries run on every connection, and serializer.data
+    and response rendering, for the requests being profiled. Called when
+    the app is ready, before any connection is opened."""
+    global _instrumented
+    with _instrument_lock:
+        if _instrumented:
+            return
+        connection_created.connect(_add_query_timer,
+                                   dispatch_uid='core.profiling')
+        _time_serialization(serializers.BaseSerializer, 'data')
+        _time_serialization(Response, 'rendered_content')
+        _instrumented = True
+
+
+def may_profile(request):
+    """Return whether request may see its own breakdown"""
+    return settings.DEBUG or getattr(request.user, 'is_staff', False)
+
+
+class ProfilingMiddleware:
+    """Record the profile of every request, and return it to requests
+    asking for it with X-Profile"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = asyncio.iscoroutinefunction(get_response)
+        if self.async_mode:
+            # Mark the instance as a coroutine function for the handler,
+            # the way django.utils.deprecation.MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = Profile()
+        token = current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        wanted = request.META.get(PROFILE_HEADER) and may_profile(request)
+        return self.finish(request, response, profile, wanted)
+
+    async def __acall__(self, request):
+        profile = Profile()
+        token = current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        # Checking the user may load it from the session
+        wanted = request.META.get(PROFILE_HEADER) and \
+            await sync_to_async(may_profile)(request)
+        return self.finish(request, response, profile, wanted)
+
+    def finish(self, request, response, profile, wanted):
+        profile.finish()
+        view = view_name(request)
+        record(view, profile)
+        if wanted:
+            breakdown = profile.breakdown(view)
+            response['X-Profile'] = json.dumps(breakdown)
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={breakdown["db_ms"]}',
+                f'serialize;dur={breakdown["serialize_ms"]}',
+                f'total;dur={breakdown["total_ms"]}',
+            ])
+        return response
@@ -0,0 +1,61 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from core.models import URLCollection, URLCollectionItems
+
+
+@receiver(post_save, sender=URLCollectionItems)
+@receiver(post_delete, sender=URLCollectionItems)
+def touch_collection(sender, instance, **kwargs):
+    """Mark a urlcollection as modified when one of its links changes"""
+    URLCollection.objects.filter(pk=instance.collection_id).touch()
+
+
+@receiver(m2m_changed, sender=URLCollectionItems)
+def touch_collections_on_membership_change(sender, instance, action,
+                                           pk_set, **kwargs):
+    """Mark urlcollections as modified when items are added or removed
+    through the many-to-many managers.
+
+    Both URLCollection.items and URLItem.collection use the same through
+    model, so the side that changed is told apart by the instance type."""
+    if isinstance(instance, URLCollection):
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            URLCollection.objects.filter(pk=instance.pk).touch()
+    elif action in ('post_add', 'post_remove'):
+        URLCollection.objects.filter(pk__in=pk_set).touch()
+    elif action == 'pre_clear':
+        URLCollection.objects.filter(items=instance).touch()
+
+
+@receiver(post_save, sender=URLCollectionItems)
+def count_saved_link(sender, instance, created, **kwargs):
+    """Count a link saved on its own into its urlcollection"""
+    if created:
+        URLCollection.objects.count_added([instance])
+    else:
+        URLCollection.objects.filter(pk=instance.collection_id).recount()
+
+
+@receiver(post_delete, sender=URLCollectionItems)
+def count_deleted_link(sender, instance, **kwargs):
+    """Take a deleted link off its urlcollection.
+
+    The many-to-many managers' remove() and clear() delete links one
+    model instance at a time as well, so they are counted here too."""
+    URLCollection.objects.count_removed([instance])
+
+
+@receiver(m2m_changed, sender=URLCollectionItems)
+def count_links_on_membership_change(sender, instance, action, pk_set,
+                                     **kwargs):
+    """Count links added through the many-to-many managers, which insert
+    them without sending post_save"""
+    if action != 'post_add' or not pk_set:
+        return
+    if isinstance(instance, URLCollection):
+        links = URLCollectionItems.objects.filter(collection=instance,
+                                                  item__in=pk_set)
+    else:
+        links = URLCollectionItems.objects.filter(item=instance,
+                                                  collection__in=pk_set)
+    URLCollection.objects.count_added(list(links))
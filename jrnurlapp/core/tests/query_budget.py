@@ -0,0 +1,144 @@
+"""Query budgets for API tests.
+
+QueryBudgetMixin.assertQueryBudget() calls an endpoint with datasets of
+growing size and checks how many queries each call ran against the
+budget checked in for that endpoint and size:
+
+    class URLCollectionQueryTests(QueryBudgetMixin, TestCase):
+        query_budget_file = os.path.join(os.path.dirname(__file__),
+                                         'query_budgets.json')
+
+        def test_list(self):
+            self.assertQueryBudget('urlcollection.list',
+                                   lambda: self.client.get(URL),
+                                   self.create_urlcollections)
+
+The test fails, showing the SQL, when a call runs more queries than its
+budget or when the count grows with the number of rows, the mark of a
+query per row. Run the tests with QUERY_BUDGET_UPDATE=1 to write the
+counts measured into the budget file, and review the diff.
+"""
+import json
+import os
+from collections import Counter
+from django.db import connection
+
+UPDATE = os.environ.get('QUERY_BUDGET_UPDATE') == '1'
+SIZES = (1, 10)
+MAX_SQL_LENGTH = 300
+
+
+class RecordedQueries:
+    """The statements run on the default connection within the block"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def __len__(self):
+        return len(self.statements)
+
+
+def format_statements(counts):
+    """List statements with how often they ran, most often first"""
+    return '\n'.join(
+        f'  {count} x {sql[:MAX_SQL_LENGTH]}'
+        for sql, count in counts.most_common()
+    )
+
+
+def load_budgets(path):
+    try:
+        with open(path) as budgets:
+            return json.load(budgets)
+    except FileNotFoundError:
+        return {}
+
+
+def save_budget(path, endpoint, counts):
+    budgets = load_budgets(path)
+    budgets[endpoint] = counts
+    with open(path, 'w') as output:
+        json.dump(budgets, output, indent=2, sort_keys=True)
+        output.write('\n')
+
+
+class QueryBudgetMixin:
+    """Check the number of queries of API calls against a budget file"""
+    query_budget_file = None
+
+    def record_queries(self, request):
+        """Return the response of request() and the queries it ran,
+        including those run while streaming the response"""
+        with RecordedQueries() as queries:
+            response = request()
+            if getattr(response, 'streaming', False):
+                for chunk in response.streaming_content:
+                    pass
+        return response, queries
+
+    def assertQueryBudget(self, endpoint, request, populate, sizes=SIZES,
+                          flat=True, count=None):
+        """Call request() after populate(count) grows the dataset to each
+        of sizes rows, and fail if a call runs more queries than the
+        budget of endpoint for that size, or, unless flat is false, if
+        the number of queries grows with the rows. When given, count(
+        response) must return the size, so that a response served from a
+        stale cache is not measured. Return the last response."""
+        runs = {}
+        rows = 0
+        for size in sizes:
+            # Writes invalidate cached responses once they are committed,
+            # which a TestCase only pretends to do
+            with self.captureOnCommitCallbacks(execute=True):
+                populate(size - rows)
+            rows = size
+            response, runs[size] = self.record_queries(request)
+            self.assertLess(response.status_code, 400,
+                            f'{endpoint} answered {response.status_code}')
+            if count is not None:
+                self.assertEqual(count(response), size,
+                                 f'{endpoint} answered with the wrong '
+                                 f'number of rows')
+
+        counts = {str(size): len(queries) for size, queries in runs.items()}
+        if UPDATE:
+            save_budget(self.query_budget_file, endpoint, counts)
+        budget = load_budgets(self.query_budget_file).get(endpoint)
+        if budget is None:
+            self.fail(f'{endpoint} has no query budget in '
+                      f'{self.query_budget_file}; run the test with '
+                      f'QUERY_BUDGET_UPDATE=1 to record one')
+
+        for size, queries in runs.items():
+            allowed = budget.get(str(size))
+            if allowed is None:
+                self.fail(f'{endpoint} has no query budget for {size} rows')
+            if len(queries) > allowed:
+                self.fail(
+                    f'{endpoint} ran {len(queries)} queries with {size} '
+                    f'rows, over its budget of {allowed}:\n'
+                    + format_statements(Counter(queries.statements))
+                )
+
+        first, last = runs[sizes[0]], runs[sizes[-1]]
+        if flat and len(last) > len(first):
+            grown = Counter(last.statements)
+            grown.subtract(Counter(first.statements))
+            self.fail(
+                f'{endpoint} ran {len(first)} queries with {sizes[0]} rows '
+                f'but {len(last)} with {sizes[-1]}, these ran more often:\n'
+                + format_statements(+grown)
+            )
+        return response
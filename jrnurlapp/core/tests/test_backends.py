@@ -0,0 +1,117 @@
+import threading
+from unittest import mock
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TransactionTestCase
+from psycopg2 import extensions
+from core.backends.postgresql.base import ConnectionPool, _pools
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, status=extensions.TRANSACTION_STATUS_IDLE):
+        self.info = mock.Mock(transaction_status=status)
+        self.rollback = mock.Mock()
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the process wide connection pool"""
+
+    def test_connections_reused(self):
+        """Test that a returned connection is handed out again"""
+        pool = ConnectionPool(max_size=2, timeout=0)
+        first = pool.get(FakeConnection)
+        pool.put(first)
+
+        self.assertIs(pool.get(FakeConnection), first)
+        self.assertEqual(pool.stats(), {'max_size': 2, 'in_use': 1,
+                                        'idle': 0, 'created': 1})
+
+    def test_pool_bounded(self):
+        """Test that no more than max_size connections are handed out"""
+        pool = ConnectionPool(max_size=1, timeout=0)
+        pool.get(FakeConnection)
+
+        with self.assertRaises(OperationalError):
+            pool.get(FakeConnection)
+
+    def test_open_transaction_rolled_back(self):
+        """Test that a connection is returned without a transaction"""
+        pool = ConnectionPool(max_size=1, timeout=0)
+        conn = pool.get(lambda: FakeConnection(
+            extensions.TRANSACTION_STATUS_INTRANS
+        ))
+        pool.put(conn)
+
+        conn.rollback.assert_called_once_with()
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_broken_connection_discarded(self):
+        """Test that broken and closed connections are not reused"""
+        pool = ConnectionPool(max_size=2, timeout=0)
+        broken = pool.get(lambda: FakeConnection(
+            extensions.TRANSACTION_STATUS_UNKNOWN
+        ))
+        closed = pool.get(FakeConnection)
+        pool.put(broken)
+        closed.close()
+        pool.put(closed)
+
+        self.assertTrue(broken.closed)
+        self.assertIsNot(pool.get(FakeConnection), closed)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+
+class HealthCheckTests(TransactionTestCase):
+    """Test health checks of persistent connections"""
+
+    def test_dropped_connection_replaced(self):
+        """Test that a connection lost between requests is reopened"""
+        connection.ensure_connection()
+        connection.connection.close()
+        connection.close_if_unusable_or_obsolete()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+
+class PooledRequestTests(TransactionTestCase):
+    """Test the pool serving requests of several threads"""
+
+    def test_more_threads_than_connections(self):
+        """Test that threads hand their connection back after each
+        request, so more threads than pool slots can serve requests"""
+        pool = {'MAX_SIZE': 2, 'TIMEOUT': 2}
+        barrier = threading.Barrier(3, timeout=10)
+        errors = []
+
+        def serve():
+            try:
+                request_started.send(sender=None)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                request_finished.send(sender=None)
+                # Finish only once every thread served its request
+                barrier.wait()
+            except Exception as error:
+                errors.append(error)
+                barrier.abort()
+            finally:
+                connection.close()
+
+        with mock.patch.dict(connection.settings_dict, POOL=pool):
+            self.addCleanup(lambda: _pools.pop(connection.alias).close())
+            threads = [threading.Thread(target=serve) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(_pools[connection.alias].stats()['in_use'], 0)
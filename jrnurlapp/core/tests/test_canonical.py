@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase
+from core.canonical import canonicalize_url, url_hash
+
+
+class CanonicalURLTests(SimpleTestCase):
+    """Test url canonicalization"""
+
+    def test_scheme_and_host_lower_cased(self):
+        """Test that the case of scheme and host is ignored, but not the
+        case of the path"""
+        self.assertEqual(canonicalize_url('HTTPS://Example.COM/Path'),
+                         'https://example.com/Path')
+
+    def test_default_ports_dropped(self):
+        """Test that default ports are dropped and others are kept"""
+        self.assertEqual(canonicalize_url('http://example.com:80/a'),
+                         'http://example.com/a')
+        self.assertEqual(canonicalize_url('https://example.com:443/a'),
+                         'https://example.com/a')
+        self.assertEqual(canonicalize_url('https://example.com:8443/a'),
+                         'https://example.com:8443/a')
+
+    def test_trailing_slashes(self):
+        """Test that trailing slashes are dropped and an empty path is
+        the root"""
+        self.assertEqual(canonicalize_url('https://example.com/a/'),
+                         'https://example.com/a')
+        self.assertEqual(canonicalize_url('https://example.com'),
+                         'https://example.com/')
+
+    def test_tracking_params_stripped(self):
+        """Test that utm_* and click id parameters are removed"""
+        self.assertEqual(
+            canonicalize_url('https://example.com/a?id=1&utm_source=x'
+                             '&UTM_Campaign=y&fbclid=z'),
+            'https://example.com/a?id=1'
+        )
+
+    def test_fragments(self):
+        """Test that fragments are dropped except for app routes"""
+        self.assertEqual(canonicalize_url('https://example.com/a#intro'),
+                         'https://example.com/a')
+        self.assertEqual(canonicalize_url('https://mail.app/#/inbox/1'),
+                         'https://mail.app/#/inbox/1')
+        self.assertEqual(canonicalize_url('https://twitter.com/#!/jack'),
+                         'https://twitter.com/#!/jack')
+
+    def test_credentials_and_ipv6_kept(self):
+        """Test that user info and IPv6 hosts survive canonicalization"""
+        self.assertEqual(canonicalize_url('ftp://me:pw@[::1]:21/f'),
+                         'ftp://me:pw@[::1]:21/f')
+
+    def test_unparseable_url(self):
+        """Test that invalid urls are only stripped"""
+        self.assertEqual(canonicalize_url(' http://example.com:x/ '),
+                         'http://example.com:x/')
+
+    def test_url_hash(self):
+        """Test that equivalent urls hash alike into 64 hex digits"""
+        self.assertEqual(url_hash('https://example.com/?utm_source=x'),
+                         url_hash('HTTPS://example.com'))
+        self.assertEqual(len(url_hash('https://example.com')), 64)
@@ -0,0 +1,43 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from core import checks
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}}
+DATABASE = {'default': {
+    'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+    'LOCATION': 'jrnurl_cache',
+}}
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Test the checks for a cache shared by every process"""
+
+    @override_settings(CACHES=LOCMEM)
+    def test_local_memory_cache_not_shared(self):
+        """Test that a local memory cache is reported by the deploy
+        check"""
+        self.assertFalse(checks.cache_is_shared())
+        self.assertEqual(
+            [error.id for error in checks.check_shared_cache(None)],
+            ['core.W001']
+        )
+
+    @override_settings(CACHES=DATABASE)
+    def test_database_cache_shared(self):
+        """Test that a cache kept in the database passes the deploy
+        check"""
+        self.assertTrue(checks.cache_is_shared())
+        self.assertEqual(checks.check_shared_cache(None), [])
+
+    @override_settings(CACHES=LOCMEM)
+    def test_run_workers_warns(self):
+        """Test that job workers warn about a cache of their own"""
+        err = StringIO()
+
+        call_command('run_workers', '--burst', '--concurrency', '0',
+                     stdout=StringIO(), stderr=err)
+
+        self.assertIn('local to this process', err.getvalue())
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.utils import OperationalError
+from django.test import TransactionTestCase
+
+
+@patch('core.management.commands.wait_for_db.time.sleep')
+class CommandTests(TransactionTestCase):
+    """Test the wait_for_db management command"""
+
+    def test_wait_for_db_ready(self, sleep):
+        """Test waiting for a database that is available"""
+        call_command('wait_for_db', stdout=open('/dev/null', 'w'))
+
+        sleep.assert_not_called()
+
+    def test_wait_for_db_retries_with_backoff(self, sleep):
+        """Test that the database is probed until a query succeeds"""
+        with patch('django.db.backends.utils.CursorWrapper.execute',
+                   side_effect=[OperationalError] * 4 + [None]) as execute:
+            call_command('wait_for_db', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(execute.call_count, 5)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list],
+                         [0.1, 0.2, 0.4, 0.8])
+
+    def test_wait_for_db_timeout(self, sleep):
+        """Test giving up on a database that stays unavailable"""
+        with patch('django.db.backends.utils.CursorWrapper.execute',
+                   side_effect=OperationalError):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0,
+                             stdout=open('/dev/null', 'w'))
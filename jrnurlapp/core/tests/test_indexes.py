@@ -0,0 +1,87 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from core import indexes
+from core.models import URLCollection, URLCollectionItems, URLItem
+
+
+class IndexReportTests(TestCase):
+    """Test the index audit and the indexes of the core models"""
+
+    def create_index(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def test_models_declare_no_redundant_index(self):
+        """Test that no index of the journal models is covered by
+        another"""
+        tables = {model._meta.db_table
+                  for model in (URLCollection, URLCollectionItems, URLItem)}
+        redundant = [index for index in indexes.redundant_indexes()
+                     if index.table in tables]
+
+        self.assertEqual(redundant, [])
+
+    def test_redundant_index(self):
+        """Test that an index leading another one is reported, unless its
+        order or kind differs"""
+        self.create_index('CREATE INDEX test_user_title ON core_urlitem '
+                          '(user_id, title)')
+        self.create_index('CREATE INDEX test_user_title_desc '
+                          'ON core_urlitem (user_id, title DESC)')
+        self.create_index('CREATE INDEX test_user_title_partial '
+                          'ON core_urlitem (user_id, title) '
+                          'WHERE fetched IS NULL')
+
+        redundant = {index.index: index.covered_by
+                     for index in indexes.redundant_indexes()
+                     if index.table == 'core_urlitem'}
+
+        self.assertEqual(redundant,
+                         {'test_user_title': 'core_urlitem_user_title_idx'})
+
+    def test_unused_indexes_leave_out_unique_ones(self):
+        """Test that indexes enforcing uniqueness are never reported as
+        unused"""
+        self.create_index('CREATE INDEX test_unused ON core_urlitem (url)')
+
+        unused = {index.index for index in indexes.unused_indexes()}
+
+        self.assertIn('test_unused', unused)
+        self.assertNotIn('core_urlitem_pkey', unused)
+        self.assertNotIn('core_urlitem_user_url_hash_uniq', unused)
+
+    def test_index_report_command(self):
+        """Test that the command reports every section"""
+        self.create_index('CREATE INDEX test_user_title ON core_urlitem '
+                          '(user_id, title)')
+        out = StringIO()
+
+        call_command('index_report', min_rows=0, stdout=out)
+
+        report = out.getvalue()
+        for heading in ('Invalid indexes', 'Unused indexes',
+                        'Redundant indexes', 'Sequential scans'):
+            self.assertIn(heading, report)
+        self.assertRegex(report, r'core_urlitem\.test_user_title \(.+\) '
+                                 r'is covered by core_urlitem_user_title_idx')
+
+    def test_links_are_unique(self):
+        """Test that a urlitem can only be linked to a urlcollection
+        once"""
+        user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        urlcollection = URLCollection.objects.create(name='Reading',
+                                                     user=user)
+        urlitem = URLItem.objects.create(title='Item',
+                                         url='https://example.com',
+                                         visits=0, user=user)
+        urlcollection.items.add(urlitem, through_defaults={'user': user})
+
+        with self.assertRaises(IntegrityError):
+            URLCollectionItems.objects.create(collection=urlcollection,
+                                              item=urlitem, user=user)
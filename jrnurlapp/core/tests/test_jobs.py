@@ -0,0 +1,269 @@
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.utils.timezone import now
+from core import jobs
+from core.models import Job
+
+calls = []
+failures = []
+
+
+@jobs.task(name='test.add')
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@jobs.task(name='test.flaky', max_attempts=2)
+def flaky():
+    raise RuntimeError('Temporary failure')
+
+
+@jobs.task(name='test.broken')
+def broken():
+    raise jobs.PermanentError('Cannot succeed')
+
+
+@jobs.task(name='test.slow')
+def slow(seconds):
+    time.sleep(seconds)
+
+
+@flaky.on_failure
+def flaky_failed():
+    failures.append('flaky')
+
+
+class FailingBroker(jobs.DatabaseBroker):
+    """A broker whose first claims fail"""
+
+    def __init__(self, errors):
+        self.errors = errors
+
+    def claim(self, timeout):
+        if self.errors:
+            self.errors -= 1
+            raise ConnectionError('Broker unavailable')
+        return super().claim(timeout)
+
+
+class JobTests(TestCase):
+    """Test queueing and running background jobs"""
+
+    def setUp(self):
+        calls.clear()
+        failures.clear()
+        self.worker = jobs.Worker(jobs.DatabaseBroker())
+
+    def test_delay_queues_job(self):
+        """Test that delaying a task queues a job instead of running it"""
+        job = add.delay(1, 2)
+
+        self.assertEqual(calls, [])
+        self.assertEqual((job.name, job.status, job.args),
+                         ('test.add', Job.QUEUED, [1, 2]))
+
+    def test_worker_runs_job(self):
+        """Test that a worker runs a queued job and records its result"""
+        job = add.delay(1, b=2)
+
+        self.assertEqual(self.worker.run_one().pk, job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.attempts),
+                         (Job.SUCCEEDED, 3, 1))
+        self.assertIsNotNone(job.finished)
+        self.assertIsNone(self.worker.run_one())
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Test that a failing job is queued again until it runs out of
+        attempts"""
+        job = flaky.delay()
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.worker.run_one()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, now())
+        self.assertIn('Temporary failure', job.error)
+        self.assertIsNone(self.worker.run_one())
+
+        Job.objects.filter(pk=job.pk).update(run_at=now())
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.worker.run_one()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_failure_handler(self):
+        """Test that the failure handler of a task runs once its job has
+        failed for good"""
+        job = flaky.delay()
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.worker.run_one()
+        self.assertEqual(failures, [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=now())
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.worker.run_one()
+        self.assertEqual(failures, ['flaky'])
+
+    def test_stalled_job_is_requeued(self):
+        """Test that a job whose lease expired is queued again, and fails
+        once it has used up its attempts"""
+        job = flaky.delay()
+        for attempt in (1, 2):
+            jobs._start(job.pk)
+            with self.settings(JOBS_LEASE=60):
+                self.assertEqual(jobs.requeue_stalled(), [])
+            Job.objects.filter(pk=job.pk).update(
+                heartbeat=now() - timedelta(seconds=61)
+            )
+
+            with self.settings(JOBS_LEASE=60), \
+                    self.assertLogs('core.jobs', 'WARNING'):
+                self.assertEqual(len(jobs.requeue_stalled()), 1)
+
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+            self.assertIn('LeaseExpired', job.error)
+            Job.objects.filter(pk=job.pk).update(run_at=now())
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(failures, ['flaky'])
+
+    def test_taken_over_attempt_not_recorded(self):
+        """Test that an attempt finishing after its job was taken over
+        for an expired lease leaves the job to the new attempt"""
+        flaky.delay()
+        job = jobs.DatabaseBroker().claim(0)
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat=now() - timedelta(seconds=61)
+        )
+        with self.settings(JOBS_LEASE=60), \
+                self.assertLogs('core.jobs', 'WARNING'):
+            jobs.requeue_stalled()
+        Job.objects.filter(pk=job.pk).update(run_at=now())
+        jobs.DatabaseBroker().claim(0)
+
+        with self.assertLogs('core.jobs', 'WARNING') as logs:
+            jobs.execute(job)
+
+        self.assertIn('taken over', logs.output[-1])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.RUNNING, 2))
+        self.assertIn('LeaseExpired', job.error)
+        self.assertEqual(failures, [])
+
+    def test_permanent_error_is_not_retried(self):
+        """Test that PermanentError fails a job straight away"""
+        job = broken.delay()
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.worker.run_one()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+
+    def test_jobs_run_in_due_order(self):
+        """Test that jobs that are not due yet wait for their turn"""
+        later = add.delay(3, 4)
+        Job.objects.filter(pk=later.pk).update(
+            run_at=now() + timedelta(hours=1)
+        )
+        sooner = add.delay(1, 2)
+
+        self.assertEqual(self.worker.run_one().pk, sooner.pk)
+        self.assertIsNone(self.worker.run_one())
+
+    def test_local_broker(self):
+        """Test queueing jobs through the in-memory broker"""
+        broker = jobs.LocalBroker()
+        worker = jobs.Worker(broker)
+        job = add.delay(2, 2)
+        self.assertIsNone(worker.run_one())
+
+        broker.enqueue(job)
+
+        self.assertEqual(worker.run_one().result, 4)
+        self.assertIsNone(worker.run_one(timeout=0.01))
+
+    def test_local_broker_requeues_retries(self):
+        """Test that the in-memory broker holds retries until they are
+        due"""
+        broker = jobs.LocalBroker()
+        worker = jobs.Worker(broker)
+        broker.enqueue(flaky.delay())
+
+        with patch.object(jobs, 'retry_delay', return_value=0.05), \
+                self.assertLogs('core.jobs', 'WARNING'):
+            worker.run_one()
+            self.assertIsNone(worker.run_one())
+
+            self.assertEqual(worker.run_one(timeout=1).status, Job.FAILED)
+
+
+class HeartbeatTests(TransactionTestCase):
+    """Test renewing the lease of running jobs"""
+
+    def test_job_outliving_its_lease(self):
+        """Test that a job running longer than its lease keeps it while
+        its worker is alive"""
+        job = slow.delay(1.5)
+        reaped = []
+
+        def reap():
+            time.sleep(1.2)
+            reaped.extend(jobs.requeue_stalled())
+            connections.close_all()
+
+        reaper = threading.Thread(target=reap)
+        with self.settings(JOBS_LEASE=1):
+            reaper.start()
+            jobs.Worker(jobs.DatabaseBroker()).run_one()
+            reaper.join()
+
+        self.assertEqual(reaped, [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.SUCCEEDED, 1))
+        self.assertGreater(job.heartbeat, job.started)
+
+
+class RunWorkersCommandTests(TransactionTestCase):
+    """Test the run_workers management command"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_workers_burst(self):
+        """Test that run_workers --burst runs the due jobs and exits"""
+        add.delay(1, 1)
+        add.delay(2, 2)
+        out = StringIO()
+
+        call_command('run_workers', '--burst', '--concurrency', '2',
+                     stdout=out, stderr=StringIO())
+
+        self.assertEqual(sorted(calls), [(1, 1), (2, 2)])
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 2)
+        self.assertIn('Workers stopped', out.getvalue())
+
+    def test_worker_survives_broker_errors(self):
+        """Test that a worker logs errors of the broker, backs off and
+        goes on"""
+        add.delay(1, 2)
+        worker = jobs.Worker(FailingBroker(errors=2), poll_interval=0)
+
+        with patch.object(jobs, 'WORKER_BACKOFF', 0.01), \
+                self.assertLogs('core.jobs', 'ERROR') as logs:
+            worker.run(burst=True)
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn('Broker unavailable', logs.output[0])
+        self.assertEqual(calls, [(1, 2)])
@@ -121,3 +121,49 @@ class ModelTests(TestCase):
         urlcollection.refresh_from_db()
 
         self.assertEqual(urlcollection.items.all().count(), 2)
+
+    def test_modified_advances_on_save(self):
+        """Test that saving a urlitem stamps it as modified"""
+        urlitem = models.URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=1,
+            user=sample_user()
+        )
+        created_modified = urlitem.modified
+
+        urlitem.visits = 2
+        urlitem.save(update_fields=['visits'])
+        urlitem.refresh_from_db()
+
+        self.assertGreater(urlitem.modified, created_modified)
+
+    def test_membership_change_touches_urlcollection(self):
+        """Test that adding and removing items modifies the urlcollection"""
+        user = sample_user()
+        urlcollection = models.URLCollection.objects.create(
+            name='Interesting URLs',
+            user=user
+        )
+        urlitem = models.URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=1,
+            user=user
+        )
+        stamps = [urlcollection.modified]
+
+        urlcollection.items.add(urlitem, through_defaults={'user': user})
+        urlcollection.refresh_from_db()
+        stamps.append(urlcollection.modified)
+
+        urlitem.collection.remove(urlcollection)
+        urlcollection.refresh_from_db()
+        stamps.append(urlcollection.modified)
+
+        urlitem.collection.add(urlcollection, through_defaults={'user': user})
+        urlitem.collection.clear()
+        urlcollection.refresh_from_db()
+        stamps.append(urlcollection.modified)
+
+        self.assertEqual(stamps, sorted(set(stamps)))
@@ -0,0 +1,155 @@
+import json
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core import profiling
+from core.models import URLItem
+
+METRICS_URL = reverse('metrics')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+TOKEN_URL = reverse('user:token')
+
+
+class HistogramTests(SimpleTestCase):
+    """Test rendering histograms in the Prometheus text format"""
+
+    def test_render(self):
+        """Test that buckets are cumulative and series sorted by view"""
+        histogram = profiling.Histogram('test_seconds', 'Test', (0.1, 1))
+        histogram.observe('b', 0.5)
+        histogram.observe('a"', 0.05)
+        histogram.observe('b', 2.0)
+
+        self.assertEqual(histogram.render().splitlines(), [
+            '# HELP test_seconds Test',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="a\\"",le="0.1"} 1',
+            'test_seconds_bucket{view="a\\"",le="1"} 1',
+            'test_seconds_bucket{view="a\\"",le="+Inf"} 1',
+            'test_seconds_sum{view="a\\""} 0.05',
+            'test_seconds_count{view="a\\""} 1',
+            'test_seconds_bucket{view="b",le="0.1"} 0',
+            'test_seconds_bucket{view="b",le="1"} 1',
+            'test_seconds_bucket{view="b",le="+Inf"} 2',
+            'test_seconds_sum{view="b"} 2.5',
+            'test_seconds_count{view="b"} 2',
+        ])
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Test profiling requests"""
+
+    def setUp(self):
+        profiling.clear_metrics()
+        self.addCleanup(profiling.clear_metrics)
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count(self, histogram, view):
+        for line in histogram.render().splitlines():
+            if line.startswith(f'{histogram.name}_count{{view="{view}"}}'):
+                return int(line.split()[-1])
+        return 0
+
+    def test_metrics_per_view(self):
+        """Test that requests are counted under their view and action"""
+        self.client.get(URLITEM_URL)
+        self.client.post(URLITEM_URL, {'title': 'Python',
+                                       'url': 'https://python.org'})
+        APIClient().post(TOKEN_URL, {'email': 'testuser@testdomain.com',
+                                     'password': 'test1234'})
+
+        with self.settings(METRICS_TOKEN='scrape'):
+            res = self.client.get(METRICS_URL,
+                                  HTTP_AUTHORIZATION='Bearer scrape')
+
+        self.assertEqual(res['Content-Type'], profiling.CONTENT_TYPE)
+        body = res.content.decode()
+        for view in ('URLItemViewSet.list', 'URLItemViewSet.create',
+                     'CreateTokenView'):
+            self.assertIn(
+                f'jrnurl_request_duration_seconds_count{{view="{view}"}} 1',
+                body
+            )
+        self.assertGreater(
+            self.count(profiling.request_serialize_duration,
+                       'URLItemViewSet.list'), 0
+        )
+
+    def test_metrics_restricted(self):
+        """Test that metrics are only served to staff users and to
+        scrapers with the metrics token"""
+        client = APIClient()
+        with self.settings(METRICS_TOKEN='scrape'):
+            for authorization in ('', 'Bearer wrong', 'Bearer '):
+                res = client.get(METRICS_URL,
+                                 HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(res.status_code, 403, authorization)
+        with self.settings(METRICS_TOKEN=''):
+            res = client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+            self.assertEqual(res.status_code, 403)
+
+        client.force_login(self.user)
+        self.assertEqual(client.get(METRICS_URL).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(client.get(METRICS_URL).status_code, 200)
+
+    def test_profile_header_for_staff(self):
+        """Test that staff users get the breakdown of their request"""
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(URLITEM_URL, HTTP_X_PROFILE='1')
+
+        breakdown = json.loads(res['X-Profile'])
+        self.assertEqual(breakdown['view'], 'URLItemViewSet.list')
+        self.assertGreater(breakdown['queries'], 0)
+        self.assertGreater(breakdown['total_ms'], 0)
+        self.assertIn('db;dur=', res['Server-Timing'])
+
+    def test_profile_header_withheld(self):
+        """Test that other users do not get the breakdown"""
+        res = self.client.get(URLITEM_URL, HTTP_X_PROFILE='1')
+
+        self.assertNotIn('X-Profile', res)
+        self.assertEqual(
+            self.count(profiling.request_duration, 'URLItemViewSet.list'), 1
+        )
+
+    def test_duplicate_queries(self):
+        """Test that statements run more than once are reported"""
+        profile = profiling.Profile()
+        token = profiling.current.set(profile)
+        try:
+            for title in ('a', 'b', 'b'):
+                URLItem.objects.filter(title=title).exists()
+            URLItem.objects.count()
+        finally:
+            profiling.current.reset(token)
+
+        duplicates = profile.duplicates()
+
+        self.assertEqual(len(profile.queries), 4)
+        self.assertEqual(len(duplicates), 1)
+        self.assertIn('"core_urlitem"."title" = %s', duplicates[0]['sql'])
+        self.assertEqual((duplicates[0]['count'],
+                          duplicates[0]['identical']), (3, 2))
+
+    async def test_async_requests(self):
+        """Test that requests served by the ASGI handler are profiled"""
+        with self.settings(DEBUG=True):
+            res = await AsyncClient().get(METRICS_URL,
+                                          **{'x-profile': '1'})
+
+        self.assertEqual(json.loads(res['X-Profile'])['view'],
+                         'core.views.metrics')
+        self.assertEqual(
+            self.count(profiling.request_duration, 'core.views.metrics'), 1
+        )
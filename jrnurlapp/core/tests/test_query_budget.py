@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import uuid
+from unittest import mock
+from django.http import HttpResponse
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from core.models import URLItem
+from core.tests import query_budget
+
+
+class QueryBudgetMixinTests(query_budget.QueryBudgetMixin, TestCase):
+    """Test checking API calls against query budgets"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.query_budget_file = os.path.join(directory.name, 'budgets.json')
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+
+    def set_budget(self, budget):
+        with open(self.query_budget_file, 'w') as budgets:
+            json.dump({'view': budget}, budgets)
+
+    def populate(self, rows):
+        for _ in range(rows):
+            URLItem.objects.create(title='Item',
+                                   url=f'https://example.com/{uuid.uuid4()}',
+                                   visits=0, user=self.user)
+
+    def view(self, per_row=False):
+        def request():
+            for urlitem in URLItem.objects.all():
+                if per_row:
+                    URLItem.objects.filter(pk=urlitem.pk).exists()
+            return HttpResponse()
+        return request
+
+    def test_within_budget(self):
+        """Test that calls within their budget pass"""
+        self.set_budget({'1': 1, '10': 1})
+
+        self.assertQueryBudget('view', self.view(), self.populate)
+
+    def test_over_budget(self):
+        """Test that calls over their budget fail with their SQL"""
+        self.set_budget({'1': 0, '10': 0})
+
+        with self.assertRaisesRegex(AssertionError,
+                                    r'view ran 1 queries with 1 rows, over '
+                                    r'its budget of 0:\n  1 x SELECT'):
+            self.assertQueryBudget('view', self.view(), self.populate)
+
+    def test_queries_growing_with_rows(self):
+        """Test that a query per row fails, naming the repeated query"""
+        self.set_budget({'1': 20, '10': 20})
+
+        with self.assertRaisesRegex(AssertionError,
+                                    r'view ran 2 queries with 1 rows but 11 '
+                                    r'with 10, these ran more often:\n'
+                                    r'  9 x SELECT \(1\) AS "a"'):
+            self.assertQueryBudget('view', self.view(per_row=True),
+                                   self.populate)
+
+    def test_missing_budget(self):
+        """Test that endpoints without a budget fail"""
+        self.set_budget({})
+
+        with self.assertRaisesRegex(AssertionError, 'no query budget'):
+            self.assertQueryBudget('other', self.view(), self.populate)
+
+    def test_update_budget(self):
+        """Test that QUERY_BUDGET_UPDATE records the counts measured"""
+        self.set_budget({'1': 0, '10': 0})
+
+        with mock.patch.object(query_budget, 'UPDATE', True):
+            self.assertQueryBudget('view', self.view(), self.populate)
+
+        with open(self.query_budget_file) as budgets:
+            self.assertEqual(json.load(budgets),
+                             {'view': {'1': 1, '10': 1}})
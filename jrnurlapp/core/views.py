@@ -1,3 +1,24 @@
-# from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from . import profiling
 
-# Create your views here.
+
+def _may_scrape(request):
+    """Return whether request presents METRICS_TOKEN as a bearer token or
+    comes from a staff user signed in to the admin"""
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return True
+    return settings.DEBUG or getattr(request.user, 'is_staff', False)
+
+
+def metrics(request):
+    """Serve the request histograms of this process in the Prometheus
+    text format"""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(profiling.render_metrics(),
+                        content_type=profiling.CONTENT_TYPE)
@@ -0,0 +1,42 @@
+"""Gunicorn settings for serving jrnurlapp.
+
+    gunicorn -c gunicorn.conf.py
+
+serves jrnurlapp.wsgi with sync workers, one request per process at a
+time. Set ASGI=1 to serve jrnurlapp.asgi with uvicorn workers instead,
+where each worker serves many connections from one event loop and runs
+the read views in a thread pool; set DB_POOL_SIZE along with it so those
+threads share a bounded number of connections. The sync workers were
+faster in CPU bound load tests (see loadtest.py), so ASGI only pays off
+with many slow clients.
+
+WEB_CONCURRENCY sets the number of worker processes and BIND the listen
+address. Several workers need a cache they all share (see CACHES in the
+settings), as invalidations would otherwise only reach the worker making
+them; gunicorn refuses to start them with a cache of one process."""
+import multiprocessing
+import os
+
+asgi = os.environ.get('ASGI') == '1'
+
+wsgi_app = 'jrnurlapp.asgi:application' if asgi \
+    else 'jrnurlapp.wsgi:application'
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY',
+                             multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'uvicorn.workers.UvicornWorker' if asgi else 'sync'
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+
+
+def on_starting(server):
+    if server.cfg.workers > 1:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jrnurlapp.settings')
+        import django
+        django.setup()
+        from core.checks import cache_is_shared
+        if not cache_is_shared():
+            raise RuntimeError(
+                f'{server.cfg.workers} workers cannot share a local memory '
+                f'cache; set CACHE_BACKEND and CACHE_LOCATION, or '
+                f'WEB_CONCURRENCY=1'
+            )
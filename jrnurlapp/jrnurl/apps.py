@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class JrnurlConfig(AppConfig):
     name = 'jrnurl'
+
+    def ready(self):
+        from . import signals  # noqa: F401
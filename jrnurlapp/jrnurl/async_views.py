@@ -0,0 +1,53 @@
+import functools
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _run_request(view, request, *args, **kwargs):
+    # Worker threads do not see the request_started/request_finished
+    # signals, so they manage their own connection the same way
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """Wrap a DRF view so that ASGI serves its reads concurrently.
+
+    Under ASGI, Django 3.2 runs every synchronous view in one shared
+    thread, so a single slow query holds up every other request of the
+    worker. The returned coroutine runs safe methods (the list and
+    retrieve paths) in the default thread pool instead, each thread
+    using its own database connection, while writes keep running in the
+    shared thread as before. Django 3.2 has no async ORM, so the queries
+    themselves still run synchronously in those threads."""
+    run_request = functools.partial(_run_request, view)
+    read = sync_to_async(run_request, thread_sensitive=False)
+    write = sync_to_async(run_request, thread_sensitive=True)
+
+    async def wrapped_view(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    # Carry over csrf_exempt and the attributes DRF routers inspect
+    return functools.update_wrapper(wrapped_view, view)
+
+
+class AsyncReadMixin:
+    """Serve the viewset's reads through async_read_view when the
+    project runs under ASGI (JRNURL_ASYNC_VIEWS)"""
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        view = super().as_view(*args, **kwargs)
+        if settings.JRNURL_ASYNC_VIEWS:
+            view = async_read_view(view)
+        return view
@@ -0,0 +1,324 @@
+"""Benchmark the API against a seeded database (see jrnurl.seed).
+
+run() sends every endpoint in ENDPOINTS a number of requests through
+Django's test client, so the whole stack below the web server is
+measured: middleware, authentication, views, serializers and the
+database. For each endpoint it reports latency percentiles, throughput
+and the number of queries per request. Requests are made as a sample of
+the benchmark users, with ids, urls and tags taken from their journals.
+
+Writes run in a transaction that is rolled back, so the dataset stays
+the same from run to run and results of different commits can be
+compared with compare().
+"""
+import json
+import math
+import random
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from core.models import URLCollection, URLCollectionItems, URLItem
+from . import seed
+
+REQUESTS = 200
+WARMUP = 10
+SAMPLE_USERS = 20
+SAMPLE_ROWS = 100
+PERCENTILES = (50, 90, 95, 99)
+
+Endpoint = namedtuple('Endpoint', 'name method request write')
+
+
+class Journal:
+    """What requests can be made as one benchmark user"""
+
+    def __init__(self, user, rng):
+        self.user = user
+        self.random = rng
+        self.token = Token.objects.get_or_create(user=user)[0].key
+        urlitems = URLItem.objects.filter(user=user).order_by('?')
+        self.urlitems = list(urlitems.values_list('id', 'url', 'tags')[
+            :SAMPLE_ROWS
+        ])
+        self.urlcollections = list(URLCollection.objects.filter(
+            user=user
+        ).order_by('?').values_list('id', flat=True)[:SAMPLE_ROWS])
+        self.tags = sorted({tag for pk, url, tags in self.urlitems
+                            for tag in tags or ()})
+
+    def urlitem(self):
+        return self.random.choice(self.urlitems)
+
+    def urlcollection_id(self):
+        return self.random.choice(self.urlcollections)
+
+    def tag(self):
+        return self.random.choice(self.tags or seed.WORDS)
+
+    def new_url(self):
+        return f'https://benchmark.invalid/{uuid.uuid4().hex}'
+
+
+def _get(name, *args, **params):
+    def request(journal):
+        url = reverse(name, args=[f(journal) for f in args])
+        return url, {key: f(journal) for key, f in params.items()}
+    return request
+
+
+def _post(name, data, *args):
+    def request(journal):
+        url = reverse(name, args=[f(journal) for f in args])
+        return url, data(journal)
+    return request
+
+
+def _urlitem_id(journal):
+    return journal.urlitem()[0]
+
+
+ENDPOINTS = (
+    Endpoint('user.token', 'post', _post('user:token', lambda journal: {
+        'email': journal.user.email, 'password': seed.PASSWORD,
+    }), False),
+    Endpoint('user.me', 'get', _get('user:me'), False),
+    Endpoint('urlcollection.list', 'get', _get('jrnurl:urlcollection-list'),
+             False),
+    Endpoint('urlcollection.retrieve', 'get',
+             _get('jrnurl:urlcollection-detail',
+                  lambda journal: journal.urlcollection_id()), False),
+    Endpoint('urlitem.list', 'get', _get('jrnurl:urlitem-list'), False),
+    Endpoint('urlitem.list_by_tag', 'get',
+             _get('jrnurl:urlitem-list', tags__any=Journal.tag), False),
+    Endpoint('urlitem.retrieve', 'get',
+             _get('jrnurl:urlitem-detail', _urlitem_id), False),
+    Endpoint('urlitem.search', 'get',
+             _get('jrnurl:urlitem-search', q=Journal.tag), False),
+    Endpoint('tags', 'get', _get('jrnurl:tags'), False),
+    Endpoint('lookup', 'get',
+             _get('jrnurl:lookup', url=lambda journal: journal.urlitem()[1]),
+             False),
+    Endpoint('export', 'get', _get('jrnurl:export'), False),
+    Endpoint('urlcollection.create', 'post',
+             _post('jrnurl:urlcollection-list', lambda journal: {
+                 'name': 'Benchmark collection', 'user': journal.user.id,
+             }), True),
+    Endpoint('urlitem.create', 'post',
+             _post('jrnurl:urlitem-list', lambda journal: {
+                 'title': 'Benchmark urlitem', 'url': journal.new_url(),
+                 'visits': 0, 'user': journal.user.id,
+             }), True),
+    Endpoint('urlitem.visit', 'post',
+             _post('jrnurl:urlitem-visit', lambda journal: {}, _urlitem_id),
+             True),
+    Endpoint('urlitem.bulk_import', 'post',
+             _post('jrnurl:urlitem-bulk-import', lambda journal: [
+                 {'title': 'Benchmark urlitem', 'url': journal.new_url()}
+                 for _ in range(100)
+             ]), True),
+)
+
+
+def _percentile(ordered, percent):
+    """Nearest rank percentile of an ordered list"""
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize(latencies, queries, statuses, elapsed):
+    """Return the statistics of one endpoint's requests. Latencies are
+    in seconds."""
+    ordered = sorted(latencies)
+    result = {
+        'requests': len(ordered),
+        'errors': sum(count for status, count in statuses.items()
+                      if status >= 400),
+        'statuses': {str(status): count
+                     for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0,
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'queries_mean': round(statistics.mean(queries), 2),
+        'queries_max': max(queries),
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(
+            _percentile(ordered, percent) * 1000, 3
+        )
+    return result
+
+
+class _QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _send(client, endpoint, journal):
+    path, data = endpoint.request(journal)
+    auth = {} if endpoint.name == 'user.token' else {
+        'HTTP_AUTHORIZATION': f'Token {journal.token}'
+    }
+    method = getattr(client, endpoint.method)
+    if endpoint.method == 'post':
+        response = method(path, json.dumps(data),
+                          content_type='application/json', **auth)
+    else:
+        response = method(path, data, **auth)
+    if response.streaming:
+        for chunk in response.streaming_content:
+            pass
+    return response.status_code
+
+
+def _run_requests(endpoint, journals, count, warmup, host, rng, results):
+    client = Client(SERVER_NAME=host)
+    counter = _QueryCounter()
+    latencies, queries, statuses = [], [], Counter()
+    try:
+        with connection.execute_wrapper(counter):
+            for index in range(warmup + count):
+                journal = rng.choice(journals)
+                counter.count = 0
+                started = time.perf_counter()
+                if endpoint.write:
+                    with transaction.atomic():
+                        status = _send(client, endpoint, journal)
+                        transaction.set_rollback(True)
+                else:
+                    status = _send(client, endpoint, journal)
+                latency = time.perf_counter() - started
+                if index >= warmup:
+                    latencies.append(latency)
+                    queries.append(counter.count)
+                    statuses[status] += 1
+    finally:
+        results.append((latencies, queries, statuses))
+
+
+def bench_endpoint(endpoint, journals, requests=REQUESTS, warmup=WARMUP,
+                   concurrency=1, host='localhost', seed_value=0):
+    """Send requests requests to endpoint from concurrency threads and
+    return their statistics"""
+    results = []
+    shares = [requests // concurrency + (index < requests % concurrency)
+              for index in range(concurrency)]
+    if concurrency == 1:
+        started = time.perf_counter()
+        _run_requests(endpoint, journals, requests, warmup, host,
+                      random.Random(seed_value), results)
+    else:
+        # Threads use connections of their own, closed when they are done
+        def run(share, index):
+            try:
+                _run_requests(endpoint, journals, share, warmup, host,
+                              random.Random(seed_value + index), results)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(share, index))
+                   for index, share in enumerate(shares)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies, queries, statuses = [], [], Counter()
+    for thread_latencies, thread_queries, thread_statuses in results:
+        latencies.extend(thread_latencies)
+        queries.extend(thread_queries)
+        statuses.update(thread_statuses)
+    return summarize(latencies, queries, statuses, elapsed)
+
+
+def dataset():
+    """Return the size of the benchmark dataset"""
+    users = seed.benchmark_users()
+    return {
+        'users': users.count(),
+        'urlcollections': URLCollection.objects.filter(
+            user__in=users
+        ).count(),
+        'urlitems': URLItem.objects.filter(user__in=users).count(),
+        'memberships': URLCollectionItems.objects.filter(
+            user__in=users
+        ).count(),
+    }
+
+
+def git_commit():
+    """Return the commit of the working tree, or None outside git"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(endpoints=None, requests=REQUESTS, warmup=WARMUP, concurrency=1,
+        users=SAMPLE_USERS, host='localhost', seed_value=0, progress=None):
+    """Benchmark endpoints, all of ENDPOINTS by default, returning the
+    results as a JSON serializable dict. progress, if given, is called
+    with the name and statistics of each endpoint as it finishes."""
+    rng = random.Random(seed_value)
+    sample = list(seed.benchmark_users().order_by('email')[:users])
+    journals = [journal for journal in
+                (Journal(user, rng) for user in sample)
+                if journal.urlitems and journal.urlcollections]
+    if not journals:
+        raise ValueError('There are no benchmark journals, '
+                         'run seed_benchmark first')
+    selected = [endpoint for endpoint in ENDPOINTS
+                if endpoints is None or endpoint.name in endpoints]
+
+    results = {}
+    for endpoint in selected:
+        results[endpoint.name] = bench_endpoint(
+            endpoint, journals, requests, warmup, concurrency, host,
+            seed_value
+        )
+        if progress is not None:
+            progress(endpoint.name, results[endpoint.name])
+    return {
+        'commit': git_commit(),
+        'date': now().isoformat(),
+        'debug': settings.DEBUG,
+        'dataset': dataset(),
+        'options': {'requests': requests, 'warmup': warmup,
+                    'concurrency': concurrency, 'users': len(journals)},
+        'endpoints': results,
+    }
+
+
+def compare(baseline, current, keys=('p50_ms', 'p95_ms', 'throughput_rps',
+                                     'queries_mean')):
+    """Return, for every endpoint in both results, the relative change of
+    each of keys from baseline to current"""
+    changes = {}
+    for name, stats in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        changes[name] = {
+            key: (stats[key] - before[key]) / before[key] if before[key]
+            else None
+            for key in keys
+        }
+    return changes
@@ -0,0 +1,455 @@
+"""Parsers for browser bookmark and history exports.
+
+Supported sources are Netscape bookmark HTML, which every browser can
+export, Chrome's Bookmarks JSON file, Firefox's JSON bookmark backups and
+the history databases of both browsers: Firefox's places.sqlite and
+Chrome's History file.
+
+Every source is read as a stream of (folder, raw entry) pairs, where
+folder is the tuple of folder names the entry was filed under. HTML is
+scanned a chunk at a time and the databases are read through a cursor,
+so memory use does not depend on the size of the export. Turning raw
+entries into urlitem rows is the expensive part, so it is done a batch at
+a time, across a process pool for large files.
+
+This module deliberately avoids importing models so that pool workers
+can load it without setting up Django.
+"""
+import codecs
+import html
+import json
+import os
+import re
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from core.canonical import url_hash
+
+NETSCAPE_HTML = 'html'
+CHROME_JSON = 'chrome'
+FIREFOX_JSON = 'firefox'
+FIREFOX_PLACES = 'places'
+CHROME_HISTORY = 'history'
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 256 * 1024
+# Files at least this large are parsed across a process pool
+PARALLEL_THRESHOLD = 16 * 1024 * 1024
+# An element that is still open after this many characters is dropped
+MAX_ELEMENT_SIZE = 1024 * 1024
+
+TITLE_MAX_LENGTH = 255
+URL_MAX_LENGTH = 2048
+TAG_MAX_LENGTH = 45
+COLLECTION_NAME_SEPARATOR = ' / '
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+WEBKIT_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+# Firefox names its root folders by guid; the tags root holds one folder
+# per tag rather than bookmarks
+FIREFOX_ROOTS = {
+    'root________': '',
+    'menu________': 'Bookmarks Menu',
+    'toolbar_____': 'Bookmarks Toolbar',
+    'unfiled_____': 'Other Bookmarks',
+    'mobile______': 'Mobile Bookmarks',
+}
+FIREFOX_TAGS_ROOT = 'tags________'
+
+_TAG_RE = re.compile(r'<(/?)(dl|h3|a)\b([^>]*)>', re.IGNORECASE)
+_END_TAG_RES = {
+    'h3': re.compile(r'</h3\s*>', re.IGNORECASE),
+    'a': re.compile(r'</a\s*>', re.IGNORECASE),
+}
+_ATTR_RE = re.compile(
+    r'''([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))'''
+)
+_MARKUP_RE = re.compile(r'<[^>]*>')
+
+_validate_url = URLValidator()
+
+
+class UnsupportedFormat(ValueError):
+    """The file is not a bookmark or history export this module reads"""
+
+
+def detect_source(path):
+    """Return the kind of export stored at path"""
+    with open(path, 'rb') as export:
+        head = export.read(len(SQLITE_HEADER))
+        if head == SQLITE_HEADER:
+            return _sqlite_source(path)
+        head += export.read(4096)
+
+    start = head.lstrip()[:1]
+    if start == b'{':
+        return _json_source(path)
+    if start == b'<' or head.startswith(codecs.BOM_UTF8):
+        return NETSCAPE_HTML
+    raise UnsupportedFormat('Not a bookmark HTML, JSON or history file')
+
+
+def _connect(path):
+    uri = Path(path).resolve().as_uri() + '?mode=ro&immutable=1'
+    return sqlite3.connect(uri, uri=True)
+
+
+def _sqlite_source(path):
+    try:
+        with _connect(path) as db:
+            tables = {name for name, in db.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            )}
+    except sqlite3.DatabaseError:
+        raise UnsupportedFormat('Malformed history database')
+    if {'moz_places', 'moz_bookmarks'} <= tables:
+        return FIREFOX_PLACES
+    if 'urls' in tables:
+        return CHROME_HISTORY
+    raise UnsupportedFormat('Not a Firefox or Chrome history database')
+
+
+def _load_json(path):
+    try:
+        with open(path, 'rb') as export:
+            return json.load(export)
+    except ValueError:
+        raise UnsupportedFormat('Malformed JSON bookmarks file')
+
+
+def _json_source(path):
+    document = _load_json(path)
+    if isinstance(document, dict):
+        if isinstance(document.get('roots'), dict):
+            return CHROME_JSON
+        if str(document.get('type', '')).startswith('text/x-moz-place'):
+            return FIREFOX_JSON
+    raise UnsupportedFormat('Not a Chrome or Firefox bookmarks file')
+
+
+def collection_name(folder):
+    """Return the name of the collection for a folder path"""
+    return COLLECTION_NAME_SEPARATOR.join(folder)[:TITLE_MAX_LENGTH]
+
+
+def _timestamp(epoch, microseconds):
+    try:
+        microseconds = int(microseconds or 0)
+    except (TypeError, ValueError):
+        return None
+    if microseconds <= 0:
+        return None
+    try:
+        return epoch + timedelta(microseconds=microseconds)
+    except OverflowError:
+        return None
+
+
+def _unix_time(seconds):
+    """Convert a Netscape ADD_DATE, in seconds or, from some exporters,
+    microseconds since the epoch"""
+    try:
+        seconds = int(seconds or 0)
+    except ValueError:
+        return None
+    if seconds > 10 ** 11:
+        return _timestamp(UNIX_EPOCH, seconds)
+    return _timestamp(UNIX_EPOCH, seconds * 10 ** 6)
+
+
+def _text(markup):
+    return html.unescape(_MARKUP_RE.sub('', markup)).strip()
+
+
+def _html_chunks(path, chunk_size):
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    with open(path, 'rb') as export:
+        while True:
+            data = export.read(chunk_size)
+            yield decoder.decode(data, final=not data)
+            if not data:
+                return
+
+
+def scan_netscape(chunks):
+    """Yield (folder, (attributes, title markup)) for every link in the
+    Netscape bookmark HTML read from the text chunks.
+
+    Only the tags that give the file its structure are matched: <H3>
+    names a folder, the <DL> after it holds the folder's entries and <A>
+    is a bookmark. Text that cannot contain the rest of an unfinished
+    element is dropped after every chunk, which keeps the buffer no
+    larger than a chunk plus one element."""
+    folders = []
+    heading = None
+    buffer = ''
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        final = chunk is None
+        buffer += chunk or ''
+        position = 0
+        unfinished = None
+        for match in _TAG_RE.finditer(buffer):
+            if match.start() < position:
+                continue
+            closing, tag, attributes = match.groups()
+            tag = tag.lower()
+            position = match.end()
+            if tag == 'dl':
+                if closing and folders:
+                    folders.pop()
+                elif not closing:
+                    folders.append(heading)
+                    heading = None
+                continue
+            if closing:
+                continue
+
+            end = _END_TAG_RES[tag].search(buffer, match.end())
+            if end is None:
+                if not final and \
+                        len(buffer) - match.end() < MAX_ELEMENT_SIZE:
+                    unfinished = match.start()
+                    break
+                continue
+            position = end.end()
+            markup = buffer[match.end():end.start()]
+            if tag == 'h3':
+                heading = _text(markup)
+            else:
+                yield tuple(filter(None, folders)), (attributes, markup)
+
+        if unfinished is None:
+            unfinished = buffer.rfind('<', position)
+        buffer = buffer[unfinished:] if unfinished >= 0 else ''
+
+
+def _netscape_entries(path, chunk_size=CHUNK_SIZE):
+    return scan_netscape(_html_chunks(path, chunk_size))
+
+
+def _chrome_entries(path):
+    # Chrome writes a folder's children before its name, so its file
+    # cannot be mapped to folders as it is read; bookmark files are small
+    # next to history databases, which are streamed
+    document = _load_json(path)
+
+    def walk(node, folder):
+        if not isinstance(node, dict):
+            return
+        if node.get('type') == 'url':
+            yield folder, {
+                'title': node.get('name'),
+                'url': node.get('url'),
+                'created': _timestamp(WEBKIT_EPOCH, node.get('date_added')),
+            }
+            return
+        name = node.get('name')
+        folder = folder + (name,) if name else folder
+        for child in node.get('children') or ():
+            yield from walk(child, folder)
+
+    for root in document['roots'].values():
+        yield from walk(root, ())
+
+
+def _firefox_entries(path):
+    document = _load_json(path)
+
+    def walk(node, folder):
+        if not isinstance(node, dict):
+            return
+        if node.get('type') == 'text/x-moz-place':
+            yield folder, {
+                'title': node.get('title'),
+                'url': node.get('uri'),
+                'created': _timestamp(UNIX_EPOCH, node.get('dateAdded')),
+                'tags': (node.get('tags') or '').split(','),
+            }
+            return
+        if node.get('type') != 'text/x-moz-place-container':
+            return
+        guid = node.get('guid')
+        if guid == FIREFOX_TAGS_ROOT:
+            return
+        name = FIREFOX_ROOTS.get(guid, node.get('title'))
+        folder = folder + (name,) if name else folder
+        for child in node.get('children') or ():
+            yield from walk(child, folder)
+
+    yield from walk(document, ())
+
+
+def _places_entries(path):
+    with _connect(path) as db:
+        parents = {}
+        names = {}
+        tags_root = None
+        for node, parent, title, guid in db.execute(
+            'SELECT id, parent, title, guid FROM moz_bookmarks WHERE type = 2'
+        ):
+            parents[node] = parent
+            names[node] = FIREFOX_ROOTS.get(guid, title)
+            if guid == FIREFOX_TAGS_ROOT:
+                tags_root = node
+
+        # Tagging a page files a bookmark of it in the tag's folder
+        tags = {}
+        for place, tag in db.execute(
+            'SELECT b.fk, t.title FROM moz_bookmarks b '
+            'JOIN moz_bookmarks t ON t.id = b.parent '
+            'WHERE b.type = 1 AND t.parent = ?', (tags_root,)
+        ):
+            tags.setdefault(place, []).append(tag)
+
+        folders = {}
+
+        def folder_of(parent):
+            """Return the folder path of parent, None under the tags root"""
+            if parent not in folders:
+                path, node = [], parent
+                while node in parents and node not in path:
+                    if node == tags_root:
+                        folders[parent] = None
+                        return None
+                    path.append(node)
+                    node = parents[node]
+                folders[parent] = tuple(
+                    filter(None, (names[node] for node in reversed(path)))
+                )
+            return folders[parent]
+
+        bookmarks = db.execute(
+            'SELECT b.parent, b.title, p.url, p.visit_count, b.dateAdded, '
+            'p.id FROM moz_bookmarks b JOIN moz_places p ON p.id = b.fk '
+            'WHERE b.type = 1'
+        )
+        for parent, title, url, visits, added, place in bookmarks:
+            folder = folder_of(parent)
+            if folder is None:
+                continue
+            yield folder, {
+                'title': title, 'url': url, 'visits': visits,
+                'created': _timestamp(UNIX_EPOCH, added),
+                'tags': tags.get(place),
+            }
+
+        # History for pages that are not bookmarked; the time of the last
+        # visit is the only one kept per page
+        history = db.execute(
+            'SELECT url, title, visit_count, last_visit_date FROM moz_places '
+            'WHERE visit_count > 0 AND hidden = 0 AND id NOT IN '
+            '(SELECT fk FROM moz_bookmarks WHERE fk IS NOT NULL)'
+        )
+        for url, title, visits, visited in history:
+            yield (), {'title': title, 'url': url, 'visits': visits,
+                       'created': _timestamp(UNIX_EPOCH, visited)}
+
+
+def _history_entries(path):
+    with _connect(path) as db:
+        history = db.execute(
+            'SELECT url, title, visit_count, last_visit_time FROM urls '
+            'WHERE hidden = 0'
+        )
+        for url, title, visits, visited in history:
+            yield (), {'title': title, 'url': url, 'visits': visits,
+                       'created': _timestamp(WEBKIT_EPOCH, visited)}
+
+
+READERS = {
+    NETSCAPE_HTML: _netscape_entries,
+    CHROME_JSON: _chrome_entries,
+    FIREFOX_JSON: _firefox_entries,
+    FIREFOX_PLACES: _places_entries,
+    CHROME_HISTORY: _history_entries,
+}
+
+
+def read_entries(path, source=None):
+    """Yield (folder, raw entry) for every bookmark or page in the export"""
+    return READERS[source or detect_source(path)](path)
+
+
+def _netscape_entry(attributes, markup):
+    values = {}
+    for name, double, single, bare in _ATTR_RE.findall(attributes):
+        values[name.lower()] = html.unescape(double or single or bare)
+    return {
+        'title': _text(markup),
+        'url': values.get('href'),
+        'created': _unix_time(values.get('add_date')),
+        'tags': values.get('tags', '').split(','),
+    }
+
+
+def clean_entry(entry):
+    """Return the urlitem row for a raw entry, or None if it has no usable
+    url. Bookmarklets and browser-internal urls are not importable."""
+    if isinstance(entry, tuple):
+        entry = _netscape_entry(*entry)
+
+    url = (entry.get('url') or '').strip()
+    if not url or len(url) > URL_MAX_LENGTH:
+        return None
+    try:
+        _validate_url(url)
+    except ValidationError:
+        return None
+
+    title = ' '.join(str(entry.get('title') or '').split())
+    tags = (str(tag).strip()[:TAG_MAX_LENGTH]
+            for tag in entry.get('tags') or ())
+    row = {
+        'title': (title or url)[:TITLE_MAX_LENGTH],
+        'url': url,
+        'url_hash': url_hash(url),
+        'visits': max(int(entry.get('visits') or 0), 0),
+        'tags': list(dict.fromkeys(filter(None, tags))) or None,
+    }
+    if entry.get('created'):
+        row['created'] = entry['created']
+    return row
+
+
+def clean_entries(entries):
+    """Return (folder, row or None) for a batch of raw entries"""
+    return [(folder, clean_entry(entry)) for folder, entry in entries]
+
+
+def default_workers(path):
+    """Return how many processes should parse the export at path"""
+    if os.path.getsize(path) < PARALLEL_THRESHOLD:
+        return 1
+    return os.cpu_count() or 1
+
+
+def parse(path, source=None, workers=1, batch_size=BATCH_SIZE):
+    """Yield batches of (folder, row or None) parsed from the export.
+
+    With more than one worker, batches are cleaned in a process pool.
+    Batches are submitted only a few ahead of the one being consumed, so
+    a slow consumer does not let parsed batches pile up in memory."""
+    entries = iter(read_entries(path, source))
+    batches = iter(lambda: list(islice(entries, batch_size)), [])
+    if workers <= 1:
+        yield from map(clean_entries, batches)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(clean_entries, batch))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,280 @@
+import io
+import uuid
+from collections import Counter, defaultdict
+from itertools import islice
+from django.db import connections, router
+from django.utils.timezone import now
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+from core.canonical import url_hash
+from core.models import URLCollection, URLItem, URLCollectionItems
+from . import bookmarks, cache, serializers
+
+BATCH_SIZE = 1000
+
+CREATED = 'created'
+EXISTS = 'exists'
+INVALID = 'invalid'
+
+
+def batched(iterable, size):
+    """Yield lists of up to size elements from iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy_literal(value):
+    """Format a prepared database value as a quoted COPY CSV field"""
+    if isinstance(value, (list, tuple)):
+        value = '{%s}' % ','.join(
+            'NULL' if element is None else
+            '"%s"' % str(element).replace('\\', '\\\\').replace('"', '\\"')
+            for element in value
+        )
+    return '"%s"' % str(value).replace('"', '""')
+
+
+def copy_insert(model, objs):
+    """Insert model instances with a single PostgreSQL COPY.
+
+    Like bulk_create this skips save() and signals, but it avoids
+    building a parameterised INSERT for every row. Other database
+    backends fall back to bulk_create."""
+    if not objs:
+        return
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(objs)
+        return
+
+    fields = model._meta.concrete_fields
+    buffer = io.StringIO()
+    for obj in objs:
+        values = (field.get_db_prep_save(getattr(obj, field.attname),
+                                         connection)
+                  for field in fields)
+        # An unquoted empty field is NULL in COPY's CSV format
+        buffer.write(','.join('' if value is None else _copy_literal(value)
+                              for value in values))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    sql = 'COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def upsert_urlitems(user, rows):
+    """Return (urlitem, created) for every row of validated urlitem data.
+
+    Urls the user has already saved, or that appear earlier in rows, are
+    reused; urls are compared in their canonical form through the indexed
+    url_hash, which rows may carry precomputed. Everything else is inserted
+    with one COPY and then indexed for search with one UPDATE."""
+    hashes = [row.get('url_hash') or url_hash(row['url']) for row in rows]
+    existing = {
+        urlitem.url_hash: urlitem
+        for urlitem in URLItem.objects.filter(user=user,
+                                              url_hash__in=set(hashes))
+    }
+
+    results = []
+    new_items = []
+    for row, row_hash in zip(rows, hashes):
+        urlitem = existing.get(row_hash)
+        if urlitem is not None:
+            results.append((urlitem, False))
+            continue
+        data = dict(row, user=user, url_hash=row_hash)
+        data.setdefault('visits', 0)
+        urlitem = URLItem(**data)
+        existing[row_hash] = urlitem
+        new_items.append(urlitem)
+        results.append((urlitem, True))
+
+    copy_insert(URLItem, new_items)
+    if new_items:
+        URLItem.objects.filter(
+            pk__in=[urlitem.pk for urlitem in new_items]
+        ).update_search_vector()
+        cache.bump_version(user.id)
+
+    return results
+
+
+def _insert_links(urlcollection, item_ids):
+    """Link item_ids to urlcollection in a single INSERT, returning the
+    URLCollectionItems inserted.
+
+    Links a concurrent request inserted since they were looked up are
+    left alone by the unique constraint on the pair instead of failing
+    the insert, and are not returned."""
+    if not item_ids:
+        return []
+    connection = connections[router.db_for_write(URLCollectionItems)]
+    table = connection.ops.quote_name(URLCollectionItems._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (id, collection_id, item_id, user_id, '
+            f'added) '
+            f'SELECT link.id, %s, link.item_id, %s, %s '
+            f'FROM unnest(%s::uuid[], %s::uuid[]) AS link (id, item_id) '
+            f'ON CONFLICT (collection_id, item_id) DO NOTHING '
+            f'RETURNING id, item_id, added',
+            [urlcollection.pk, urlcollection.user_id, now(),
+             [str(uuid.uuid4()) for item_id in item_ids],
+             [str(item_id) for item_id in item_ids]]
+        )
+        return [
+            URLCollectionItems(id=pk, collection_id=urlcollection.pk,
+                               item_id=item_id,
+                               user_id=urlcollection.user_id, added=added)
+            for pk, item_id, added in cursor.fetchall()
+        ]
+
+
+def set_collection_items(urlcollection, urlitems, replace=False):
+    """Link urlitems to urlcollection with set-based writes.
+
+    Only links that do not exist yet are inserted. With replace, links to
+    items that are not in urlitems are removed in a single delete. Neither
+    write sends per-row signals, so the collection's counters are updated,
+    it is marked as modified and the user's cached responses are
+    invalidated here, once."""
+    item_ids = list(dict.fromkeys(urlitem.id for urlitem in urlitems))
+    through = URLCollectionItems.objects.filter(collection=urlcollection)
+
+    linked = set(through.values_list('item_id', flat=True))
+    new_links = _insert_links(
+        urlcollection, [item_id for item_id in item_ids
+                        if item_id not in linked]
+    )
+
+    removed = 0
+    if replace and linked.difference(item_ids):
+        stale = through.exclude(item_id__in=item_ids)
+        removed = stale._raw_delete(stale.db)
+
+    if not (new_links or removed):
+        return
+    collections = URLCollection.objects.filter(pk=urlcollection.pk)
+    if removed:
+        collections.recount()
+    else:
+        URLCollection.objects.count_added(new_links)
+    urlcollection.modified = now()
+    collections.update(modified=urlcollection.modified)
+    urlcollection.refresh_from_db(fields=URLCollection.COUNTER_FIELDS)
+    cache.bump_version(urlcollection.user_id)
+
+
+def import_urlitems(user, rows, batch_size=BATCH_SIZE):
+    """Import urlitem rows for user, yielding one result per row.
+
+    Rows are validated and written a batch at a time. Each batch costs a
+    single query to find urls the user has already saved and one bulk
+    insert for the rest, so memory and round trips do not grow with the
+    size of the import. Rows are inserted with COPY."""
+    for start, batch in enumerate(batched(rows, batch_size)):
+        yield from _import_batch(user, batch, start * batch_size)
+
+
+def _import_batch(user, rows, offset):
+    # A single unbound serializer validates every row so its fields are
+    # only built once per batch
+    serializer = serializers.URLItemBulkSerializer()
+    results = []
+    valid = []
+    for index, row in enumerate(rows, start=offset):
+        if not isinstance(row, dict):
+            results.append({'row': index, 'status': INVALID,
+                            'errors': {'non_field_errors': ['Malformed row']}})
+            continue
+        try:
+            data = serializer.run_validation(row)
+        except ValidationError as exc:
+            results.append({'row': index, 'status': INVALID,
+                            'errors': as_serializer_error(exc)})
+            continue
+        result = {'row': index, 'status': CREATED}
+        results.append(result)
+        valid.append((result, data))
+
+    urlitems = upsert_urlitems(user, [data for result, data in valid])
+    for (result, data), (urlitem, created) in zip(valid, urlitems):
+        result['id'] = urlitem.id
+        if not created:
+            result['status'] = EXISTS
+
+    return results
+
+
+def _folder_collections(user, folders, collections):
+    """Add the collection for each folder path to collections, creating
+    the ones the user does not have yet. Return how many were created."""
+    names = defaultdict(list)
+    for folder in folders:
+        if folder not in collections:
+            names[bookmarks.collection_name(folder)].append(folder)
+    if not names:
+        return 0
+
+    # The oldest collection wins if the user has several by one name
+    existing = {
+        urlcollection.name: urlcollection
+        for urlcollection in URLCollection.objects.filter(
+            user=user, name__in=names
+        ).order_by('-created')
+    }
+    new_collections = [URLCollection(name=name, user=user)
+                       for name in names if name not in existing]
+    URLCollection.objects.bulk_create(new_collections)
+    for urlcollection in (*existing.values(), *new_collections):
+        for folder in names[urlcollection.name]:
+            collections[folder] = urlcollection
+    if new_collections:
+        cache.bump_version(user.id)
+    return len(new_collections)
+
+
+def import_bookmarks(user, path, source=None, workers=None,
+                     batch_size=BATCH_SIZE):
+    """Import a browser bookmark or history export for user.
+
+    Every folder becomes a collection, named after its path and reused if
+    the user already has one by that name, and every bookmark becomes a
+    urlitem in its folder's collection. The export is parsed and written
+    a batch at a time, so memory use does not grow with its size. Return
+    counts of created collections and of created, existing and invalid
+    urlitems."""
+    if workers is None:
+        workers = bookmarks.default_workers(path)
+
+    counts = Counter(collections=0)
+    collections = {}
+    for batch in bookmarks.parse(path, source, workers, batch_size):
+        entries = [(folder, row) for folder, row in batch if row is not None]
+        counts[INVALID] += len(batch) - len(entries)
+        counts['collections'] += _folder_collections(
+            user, {folder for folder, row in entries if folder}, collections
+        )
+
+        members = defaultdict(list)
+        urlitems = upsert_urlitems(user, [row for folder, row in entries])
+        for (folder, row), (urlitem, created) in zip(entries, urlitems):
+            counts[CREATED if created else EXISTS] += 1
+            if folder:
+                members[folder].append(urlitem)
+        for folder, urlitems in members.items():
+            set_collection_items(collections[folder], urlitems)
+
+    return {key: counts[key]
+            for key in ('collections', CREATED, EXISTS, INVALID)}
@@ -0,0 +1,63 @@
+import hashlib
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'jrnurl:version:{user_id}'
+RESPONSE_KEY = 'jrnurl:response:{user_id}:{version}:{digest}'
+
+
+def _new_version():
+    return f'{time.time():.6f}-{uuid.uuid4().hex[:12]}'
+
+
+def get_version(user_id):
+    """Return the current version stamp of a user's cached responses"""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def version_timestamp(version):
+    """Return the time, in seconds since the epoch, a stamp was issued"""
+    return float(version.split('-', 1)[0])
+
+
+def bump_version(*user_ids):
+    """Invalidate every cached response of the given users once the
+    current transaction commits.
+
+    Bumping before the commit would let a request that still reads the
+    old rows cache them under the new stamp. The stamp records when the
+    user's data last changed and carries a random suffix instead of a
+    counter, so an evicted version key can never bring back responses
+    cached under an older stamp."""
+    keys = [VERSION_KEY.format(user_id=user_id)
+            for user_id in set(user_ids) if user_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(
+            {key: _new_version() for key in keys}, timeout=None
+        ))
+
+
+def response_key(request, version):
+    """Return the cache key of a response for the user and query"""
+    query = sorted(request.query_params.lists())
+    digest = hashlib.sha1(
+        f'{request.path}?{query}'.encode('utf-8')
+    ).hexdigest()
+    return RESPONSE_KEY.format(user_id=request.user.id, version=version,
+                               digest=digest)
+
+
+def get_response(key):
+    return cache.get(key)
+
+
+def set_response(key, data):
+    cache.set(key, data, timeout=settings.JRNURL_CACHE_TIMEOUT)
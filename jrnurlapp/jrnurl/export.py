@@ -0,0 +1,135 @@
+"""Streaming export of a user's whole journal.
+
+Collections, urlitems and the links between them are read with
+server-side cursors a chunk at a time and encoded as they are read, so
+memory use does not depend on the size of the journal. All three are
+read in one REPEATABLE READ transaction, so an export is a consistent
+snapshot even while the journal is being written to.
+
+NDJSON exports have one record per line, told apart by their "type":
+
+    {"type": "collection", "id": ..., "name": ..., ...}
+    {"type": "item", "id": ..., "url": ..., ...}
+    {"type": "membership", "collection": ..., "item": ...}
+
+JSON exports are a single object with "collections", "items" and
+"memberships" lists of the same records, without "type".
+"""
+import tempfile
+import zlib
+from django.db import connection, transaction
+from rest_framework.utils.encoders import JSONEncoder
+from core.models import URLCollection, URLItem, URLCollectionItems
+
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+SPOOL_SIZE = 8 * 1024 * 1024
+
+NDJSON = 'ndjson'
+JSON = 'json'
+FORMATS = {NDJSON: 'application/x-ndjson', JSON: 'application/json'}
+
+COLLECTION_FIELDS = ('id', 'name', 'description', 'created', 'modified',
+                     'collection_type', 'favorite', 'tags')
+ITEM_FIELDS = ('id', 'title', 'url', 'visits', 'created', 'modified',
+               'tags')
+
+_encoder = JSONEncoder(ensure_ascii=False)
+
+
+def journal_sections(user, chunk_size=CHUNK_SIZE):
+    """Return (name, type, records) for each section of user's journal"""
+    collections = URLCollection.objects.filter(user=user).order_by('id')
+    items = URLItem.objects.filter(user=user).order_by('id')
+    memberships = URLCollectionItems.objects.filter(
+        user=user
+    ).order_by('id').values_list('collection_id', 'item_id')
+    return (
+        ('collections', 'collection',
+         collections.values(*COLLECTION_FIELDS).iterator(chunk_size)),
+        ('items', 'item',
+         items.values(*ITEM_FIELDS).iterator(chunk_size)),
+        ('memberships', 'membership',
+         ({'collection': collection_id, 'item': item_id}
+          for collection_id, item_id in memberships.iterator(chunk_size))),
+    )
+
+
+def _ndjson(sections):
+    for name, record_type, records in sections:
+        for record in records:
+            yield _encoder.encode({'type': record_type, **record})
+            yield '\n'
+
+
+def _json(sections):
+    yield '{'
+    for index, (name, record_type, records) in enumerate(sections):
+        yield f'{", " if index else ""}"{name}": ['
+        separator = ''
+        for record in records:
+            yield separator
+            yield _encoder.encode(record)
+            separator = ', '
+        yield ']'
+    yield '}\n'
+
+
+def _snapshot(pieces):
+    """Yield pieces from within a read only REPEATABLE READ transaction,
+    or from within the transaction already open"""
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(savepoint=False):
+        if outermost:
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL '
+                               'REPEATABLE READ, READ ONLY')
+        yield from pieces
+
+
+def _buffered(pieces):
+    """Join small pieces of text into chunks of about BUFFER_SIZE bytes"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_journal(user, output_format=NDJSON, gzip=False,
+                   chunk_size=CHUNK_SIZE):
+    """Yield the encoded export of user's journal as chunks of bytes"""
+    encode = _json if output_format == JSON else _ndjson
+    chunks = _buffered(_snapshot(encode(journal_sections(user, chunk_size))))
+    if gzip:
+        chunks = _gzipped(chunks)
+    return chunks
+
+
+def spooled(chunks):
+    """Return a temporary file holding chunks, read from the start.
+
+    Under ASGI, Django 3.2 iterates responses in the event loop, where the
+    database must not be used, so exports are written out by the view
+    and only the file is read from the loop. The file stays in memory up
+    to SPOOL_SIZE bytes."""
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    for chunk in chunks:
+        body.write(chunk)
+    body.seek(0)
+    return body
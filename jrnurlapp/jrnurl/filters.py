@@ -0,0 +1,46 @@
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+
+def _split_tags(value):
+    return [tag.strip() for tag in value.split(',') if tag.strip()]
+
+
+class TagFilter(BaseFilterBackend):
+    """Filter on the tags array with its GIN index.
+
+    ``?tags__all=a,b`` keeps rows tagged with every listed tag (array
+    containment) and ``?tags__any=a,b`` keeps rows tagged with at least
+    one of them (array overlap)."""
+
+    def filter_queryset(self, request, queryset, view):
+        tags_all = _split_tags(request.query_params.get('tags__all', ''))
+        if tags_all:
+            queryset = queryset.filter(tags__contains=tags_all)
+
+        tags_any = _split_tags(request.query_params.get('tags__any', ''))
+        if tags_any:
+            queryset = queryset.filter(tags__overlap=tags_any)
+
+        return queryset
+
+
+class LinkHealthFilter(BaseFilterBackend):
+    """Filter urlitems on the outcome of their last link check.
+
+    ``?link=broken`` keeps urlitems whose link could not be reached or
+    answered with an error, ``?link=ok`` those that answered without one
+    and ``?link=unchecked`` those that have not been checked yet."""
+    choices = {
+        'broken': Q(link_checked__isnull=False) & (
+            Q(link_status__isnull=True) | Q(link_status__gte=400)
+        ),
+        'ok': Q(link_status__lt=400),
+        'unchecked': Q(link_checked__isnull=True),
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        link = request.query_params.get('link')
+        if link in self.choices:
+            queryset = queryset.filter(self.choices[link])
+        return queryset
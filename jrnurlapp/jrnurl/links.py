@@ -0,0 +1,89 @@
+"""Link health checks for urlitems.
+
+Every urlitem has a next_check time. Checkers claim the urlitems due
+earliest through the index on next_check, a batch at a time, so a run
+only reads the rows it checks however large the table is. Claiming
+pushes next_check out by a lease, which lets several checkers run side
+by side and retries urlitems whose results never came back. Recording a
+result schedules the next check (see URLItemQuerySet.set_link_status),
+and visiting a urlitem brings its check forward.
+
+Links are checked with HEAD, falling back to GET for servers that answer
+HEAD with an error, by the same crawler that fetches page metadata, so
+the same per-host politeness and concurrency limits apply, and hosts
+that are not public, before or after redirects, are never connected to.
+"""
+import asyncio
+from datetime import timedelta
+from urllib.parse import urlsplit
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.db import connections
+from core.models import URLItem
+from . import cache, metadata
+
+CONCURRENCY = 100
+HOST_INTERVAL = 1.0
+CLAIM_SIZE = 1000
+BATCH_SIZE = 200
+LEASE = timedelta(hours=1)
+
+
+class LinkChecker(metadata.Fetcher):
+    """Fetch the HTTP status of many links concurrently"""
+
+    def __init__(self, concurrency=CONCURRENCY, host_interval=HOST_INTERVAL,
+                 **options):
+        super().__init__(concurrency=concurrency,
+                         host_interval=host_interval, **options)
+
+    async def fetch(self, session, limiter, url):
+        """Return the final HTTP status of url after redirects, or None if
+        it could not be reached"""
+        host = urlsplit(url).hostname
+        try:
+            await limiter.wait(host)
+            async with session.head(url, allow_redirects=True) as response:
+                status = response.status
+            if status >= 400:
+                await limiter.wait(host)
+                async with session.get(url) as response:
+                    status = response.status
+            return status
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return None
+
+
+def write_link_status(statuses):
+    """Store a batch of link check results"""
+    for user_id in URLItem.objects.set_link_status(statuses):
+        cache.bump_version(user_id)
+
+
+def check_links(queryset=None, limit=None, claim_size=CLAIM_SIZE,
+                lease=LEASE, **options):
+    """Check the links of urlitems in queryset that are due, up to limit,
+    returning how many were checked"""
+    queryset = URLItem.objects.all() if queryset is None else queryset
+    claim = sync_to_async(queryset.claim_link_checks)
+    write = sync_to_async(write_link_status)
+    checker = LinkChecker(**options)
+
+    async def run():
+        checked = 0
+        try:
+            async with checker.session() as session:
+                while limit is None or checked < limit:
+                    size = claim_size if limit is None \
+                        else min(claim_size, limit - checked)
+                    items = await claim(size, lease)
+                    if not items:
+                        break
+                    await checker.crawl(items, write, BATCH_SIZE, session)
+                    checked += len(items)
+        finally:
+            # Database work ran on a thread shared by later calls
+            await sync_to_async(connections.close_all)()
+        return checked
+
+    return asyncio.run(run())
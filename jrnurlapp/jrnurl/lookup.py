@@ -0,0 +1,49 @@
+"""Answer "have I saved this url, and where?" for a single url.
+
+Urls are matched on the hash of their canonical form through the unique
+(user, url_hash) index, and the collections holding the urlitem through
+the (item, collection) index on the membership table. Answers, including
+"not saved", are kept in a small in-process LRU cache under the user's
+version stamp, so a browser revisiting its hot set of pages is answered
+without touching the database, and any change to the user's journal
+retires the cached answers.
+"""
+from django.conf import settings
+from core.canonical import canonicalize_url, url_hash
+from core.models import URLCollection, URLItem
+from user.authentication import LRUCache
+from . import cache
+
+ITEM_FIELDS = ('id', 'title', 'url', 'visits', 'tags', 'link_status')
+
+local_lookups = LRUCache(settings.JRNURL_LOOKUP_CACHE_SIZE,
+                         settings.JRNURL_LOOKUP_CACHE_TIMEOUT)
+
+
+def lookup(user, url):
+    """Return the user's urlitem for url and the collections holding it"""
+    canonical = canonicalize_url(url)
+    digest = url_hash(canonical)
+    key = (user.id, cache.get_version(user.id), digest)
+    result = local_lookups.get(key)
+    if result is None:
+        result = _lookup(user, canonical, digest)
+        local_lookups.set(key, result)
+    return result
+
+
+def _lookup(user, canonical, digest):
+    item = URLItem.objects.filter(
+        user=user, url_hash=digest
+    ).values(*ITEM_FIELDS).first()
+    collections = []
+    if item is not None:
+        collections = list(URLCollection.objects.filter(
+            urlcollectionitems__item=item['id']
+        ).order_by('name').values('id', 'name'))
+    return {
+        'url': canonical,
+        'saved': item is not None,
+        'item': item,
+        'collections': collections,
+    }
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from jrnurl import links
+
+
+class Command(BaseCommand):
+    """Django command to check the links of urlitems that are due"""
+    help = 'Check saved links for errors, a batch of due urlitems at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int,
+                            help='Check at most this many links per run')
+        parser.add_argument('--claim-size', type=int,
+                            default=links.CLAIM_SIZE,
+                            help='Urlitems claimed from the database at once')
+        parser.add_argument('--concurrency', type=int,
+                            default=links.CONCURRENCY)
+        parser.add_argument('--per-host', type=int,
+                            default=links.metadata.PER_HOST)
+        parser.add_argument('--host-interval', type=float,
+                            default=links.HOST_INTERVAL,
+                            help='Seconds between requests to a host')
+        parser.add_argument('--timeout', type=float,
+                            default=links.metadata.TIMEOUT)
+        parser.add_argument('--forever', action='store_true',
+                            help='Keep checking, sleeping while none are due')
+        parser.add_argument('--sleep', type=float, default=60,
+                            help='Seconds to sleep while no links are due')
+
+    def handle(self, *args, **options):
+        while True:
+            checked = links.check_links(
+                limit=options['limit'],
+                claim_size=options['claim_size'],
+                concurrency=options['concurrency'],
+                per_host=options['per_host'],
+                host_interval=options['host_interval'],
+                timeout=options['timeout'],
+            )
+            self.stdout.write(f'Checked {checked} links')
+            if not options['forever']:
+                return
+            if not checked:
+                time.sleep(options['sleep'])
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from jrnurl import export
+
+
+class Command(BaseCommand):
+    """Django command to export a user's journal as NDJSON or JSON"""
+    help = "Export a user's collections, urlitems and their links"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email address of the user')
+        parser.add_argument('--format', dest='output_format',
+                            choices=sorted(export.FORMATS),
+                            default=export.NDJSON)
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the export with gzip')
+        parser.add_argument('--output', default='-',
+                            help='File to write to, - for stdout')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.CHUNK_SIZE,
+                            help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        chunks = export.export_journal(user, options['output_format'],
+                                       options['gzip'],
+                                       options['chunk_size'])
+        if options['output'] == '-':
+            # The export is bytes, so write to the stream under stdout
+            out = self.stdout._out
+            self._write(chunks, getattr(out, 'buffer', out))
+        else:
+            with open(options['output'], 'wb') as output:
+                self._write(chunks, output)
+
+    def _write(self, chunks, output):
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
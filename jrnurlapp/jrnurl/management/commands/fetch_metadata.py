@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.models import URLItem
+from jrnurl import metadata
+
+
+class Command(BaseCommand):
+    """Django command to fetch page metadata for new urlitems"""
+    help = 'Fetch titles, canonical urls, favicons and status of pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Only fetch for this user')
+        parser.add_argument('--limit', type=int,
+                            help='Fetch at most this many urlitems')
+        parser.add_argument('--concurrency', type=int,
+                            default=metadata.CONCURRENCY)
+        parser.add_argument('--per-host', type=int,
+                            default=metadata.PER_HOST)
+        parser.add_argument('--host-interval', type=float,
+                            default=metadata.HOST_INTERVAL,
+                            help='Seconds between requests to a host')
+        parser.add_argument('--timeout', type=float,
+                            default=metadata.TIMEOUT)
+
+    def handle(self, *args, **options):
+        urlitems = URLItem.objects.all()
+        if options['email']:
+            try:
+                user = get_user_model().objects.get(email=options['email'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user with email {options["email"]}')
+            urlitems = urlitems.filter(user=user)
+
+        fetched = metadata.fetch_metadata(
+            urlitems, options['limit'],
+            concurrency=options['concurrency'],
+            per_host=options['per_host'],
+            host_interval=options['host_interval'],
+            timeout=options['timeout'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Fetched {fetched} pages'))
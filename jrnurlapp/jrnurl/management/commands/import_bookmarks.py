@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from jrnurl import bookmarks, bulk
+
+
+class Command(BaseCommand):
+    """Django command to import a browser bookmark or history export"""
+    help = ('Import Netscape bookmark HTML, Chrome or Firefox bookmarks '
+            'JSON, or a Firefox places.sqlite or Chrome History database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email address of the user')
+        parser.add_argument('path', help='Export file to import')
+        parser.add_argument('--source', choices=sorted(bookmarks.READERS),
+                            help='Kind of export, detected if not given')
+        parser.add_argument('--workers', type=int,
+                            help='Parsing processes, by default one per CPU '
+                                 'for large files')
+        parser.add_argument('--batch-size', type=int,
+                            default=bookmarks.BATCH_SIZE,
+                            help='Entries parsed and written at a time')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        try:
+            counts = bulk.import_bookmarks(user, options['path'],
+                                           options['source'],
+                                           options['workers'],
+                                           options['batch_size'])
+        except (OSError, bookmarks.UnsupportedFormat) as exc:
+            raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {created} urlitems into {collections} new collections '
+            '({exists} already saved, {invalid} invalid)'.format(**counts)
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from core.models import URLCollection
+from jrnurl import cache
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Django command to repair the counters kept on urlcollections"""
+    help = 'Recompute the item count, total visits and last added time ' \
+           'of urlcollections from their links'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='emails',
+                            metavar='EMAIL',
+                            help='Only recount the collections of this user, '
+                                 'can be repeated')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Collections recounted per transaction')
+
+    def handle(self, *args, **options):
+        collections = URLCollection.objects.order_by('id')
+        if options['emails']:
+            users = get_user_model().objects.filter(
+                email__in=options['emails']
+            )
+            missing = set(options['emails']).difference(
+                users.values_list('email', flat=True)
+            )
+            if missing:
+                raise CommandError(f'No user {", ".join(sorted(missing))}')
+            collections = collections.filter(user__in=users)
+
+        counted = repaired = 0
+        last = None
+        while True:
+            batch = collections if last is None \
+                else collections.filter(id__gt=last)
+            batch = list(batch.values_list('id', 'user_id')[
+                :options['batch_size']
+            ])
+            if not batch:
+                break
+            last = batch[-1][0]
+            with transaction.atomic():
+                changed = URLCollection.objects.filter(
+                    pk__in=[pk for pk, user_id in batch]
+                ).recount()
+            if changed:
+                cache.bump_version(*{user_id for pk, user_id in batch})
+            counted += len(batch)
+            repaired += changed
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {counted} collections, repaired {repaired}'
+        ))
@@ -0,0 +1,78 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from jrnurl import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API against the seeded journals"""
+    help = ('Measure latency percentiles, throughput and query counts of '
+            'every endpoint')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', dest='endpoints', action='append',
+                            choices=[endpoint.name for endpoint
+                                     in benchmark.ENDPOINTS],
+                            help='Only benchmark this endpoint, repeatable')
+        parser.add_argument('--requests', type=int,
+                            default=benchmark.REQUESTS,
+                            help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=benchmark.WARMUP,
+                            help='Unmeasured requests sent first')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Threads sending requests at once')
+        parser.add_argument('--users', type=int,
+                            default=benchmark.SAMPLE_USERS,
+                            help='Benchmark users to send requests as')
+        parser.add_argument('--host', default='localhost',
+                            help='Host header of the requests')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON')
+        parser.add_argument('--compare', metavar='RESULTS',
+                            help='Show changes from earlier results')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('Need at least one request and one thread')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as results:
+                baseline = json.load(results)
+
+        self.stdout.write(f'{"endpoint":<24}{"p50 ms":>10}{"p95 ms":>10}'
+                          f'{"p99 ms":>10}{"req/s":>10}{"queries":>9}'
+                          f'{"errors":>8}')
+
+        def progress(name, stats):
+            self.stdout.write(
+                f'{name:<24}{stats["p50_ms"]:>10.2f}{stats["p95_ms"]:>10.2f}'
+                f'{stats["p99_ms"]:>10.2f}{stats["throughput_rps"]:>10.1f}'
+                f'{stats["queries_mean"]:>9.1f}{stats["errors"]:>8}'
+            )
+
+        try:
+            results = benchmark.run(
+                endpoints=options['endpoints'],
+                requests=options['requests'], warmup=options['warmup'],
+                concurrency=options['concurrency'], users=options['users'],
+                host=options['host'], seed_value=options['seed'],
+                progress=progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if results['debug']:
+            self.stderr.write('DEBUG is on, which slows every query down')
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+        if baseline is not None:
+            self._write_changes(benchmark.compare(baseline, results))
+
+    def _write_changes(self, changes):
+        self.stdout.write(f'\n{"change":<24}{"p50":>10}{"p95":>10}'
+                          f'{"req/s":>10}{"queries":>10}')
+        for name, change in changes.items():
+            self.stdout.write(f'{name:<24}' + ''.join(
+                f'{"n/a":>10}' if value is None else f'{value:>+10.1%}'
+                for value in change.values()
+            ))
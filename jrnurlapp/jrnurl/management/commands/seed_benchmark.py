@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from jrnurl import seed
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with synthetic journals"""
+    help = 'Create benchmark users with collections and urlitems'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--items', type=int, default=10000,
+                            help='Urlitems shared between the users')
+        parser.add_argument('--collections-per-user', type=int,
+                            default=seed.COLLECTIONS_PER_USER)
+        parser.add_argument('--collections-per-item', type=float,
+                            default=seed.COLLECTIONS_PER_ITEM,
+                            help='Collections each urlitem is in on average')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random content')
+        parser.add_argument('--batch-size', type=int,
+                            default=seed.BATCH_SIZE,
+                            help='Rows written to the database at a time')
+        parser.add_argument('--clear', action='store_true',
+                            help='Remove existing benchmark users first')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['items'] < 0:
+            raise CommandError('Need at least one user and no negative '
+                               'item count')
+        if options['clear']:
+            self.stdout.write(f'Removed {seed.clear()} benchmark users')
+        elif seed.benchmark_users().exists():
+            raise CommandError('Benchmark users exist already, '
+                               'pass --clear to replace them')
+
+        started = time.monotonic()
+
+        def progress(counts):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{counts["urlitems"]} urlitems '
+                f'({counts["urlitems"] / elapsed:.0f}/s)'
+            )
+
+        counts = seed.seed(
+            options['users'], options['items'],
+            collections_per_user=options['collections_per_user'],
+            collections_per_item=options['collections_per_item'],
+            seed=options['seed'], batch_size=options['batch_size'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {counts["users"]} users, {counts["urlcollections"]} '
+            f'collections, {counts["urlitems"]} urlitems and '
+            f'{counts["memberships"]} collection links in '
+            f'{time.monotonic() - started:.1f}s'
+        ))
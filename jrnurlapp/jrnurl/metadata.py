@@ -0,0 +1,285 @@
+"""Concurrent fetching of the pages behind urlitems.
+
+For every urlitem that has not been fetched yet, the page title, the
+canonical url and the favicon declared in the page head are stored
+together with the HTTP status of the response.
+
+Pages are fetched by an asyncio crawler over one aiohttp session, so
+connections to a host are reused. Requests run at most CONCURRENCY at a
+time overall and PER_HOST at a time to any one host, each host sees at
+most one new request every HOST_INTERVAL seconds, and every request
+gives up after TIMEOUT seconds. Only the first MAX_BYTES of a page are
+read. Results are written back a batch at a time while the crawl goes
+on.
+
+Fetches claim the urlitems they crawl CLAIM_SIZE at a time for a LEASE
+(see URLItemQuerySet.claim_metadata_fetches), so fetches running side by
+side never crawl the same urlitem and ones whose results never came back
+are fetched again once their lease runs out.
+
+Urls are saved by users, so pages are only fetched from public
+addresses: every host, including the hosts redirects lead to, is
+resolved and refused if it is loopback, private, link-local (such as
+cloud metadata services) or otherwise reserved, before connecting.
+"""
+import asyncio
+import ipaddress
+from datetime import timedelta
+from collections import defaultdict, deque
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.db import connections
+from core.models import URLItem
+from . import cache
+
+CONCURRENCY = 50
+PER_HOST = 4
+HOST_INTERVAL = 0.25
+TIMEOUT = 10
+MAX_BYTES = 256 * 1024
+BATCH_SIZE = 200
+CLAIM_SIZE = 1000
+LEASE = timedelta(minutes=30)
+USER_AGENT = 'jrnurl-metadata/1.0'
+TITLE_MAX_LENGTH = 255
+URL_MAX_LENGTH = 2048
+
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+NO_METADATA = {'page_title': '', 'canonical_url': '', 'favicon_url': '',
+               'fetch_status': None}
+
+
+class _HeadParsed(Exception):
+    pass
+
+
+class HeadParser(HTMLParser):
+    """Collect the title, canonical link and icon link of an HTML head"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.canonical = None
+        self.icon = None
+        self._title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag == 'link':
+            attrs = dict(attrs)
+            rel = (attrs.get('rel') or '').lower().split()
+            href = (attrs.get('href') or '').strip()
+            if not href:
+                return
+            if 'canonical' in rel and self.canonical is None:
+                self.canonical = href
+            elif 'icon' in rel and self.icon is None:
+                self.icon = href
+        elif tag == 'body':
+            raise _HeadParsed()
+
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts)
+            self._title_parts = None
+        elif tag == 'head':
+            raise _HeadParsed()
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+
+def parse_head(html, base_url):
+    """Return the page title, canonical url and favicon url declared in
+    the head of html, resolved against base_url"""
+    parser = HeadParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except _HeadParsed:
+        pass
+    # A title cut off by the end of what was read is kept as far as it goes
+    title = parser.title if parser.title is not None \
+        else ''.join(parser._title_parts or ())
+    return {
+        'page_title': ' '.join(title.split())[:TITLE_MAX_LENGTH],
+        'canonical_url': _absolute(base_url, parser.canonical),
+        # Browsers fall back to /favicon.ico when a page declares no icon
+        'favicon_url': _absolute(base_url, parser.icon or '/favicon.ico'),
+    }
+
+
+def _absolute(base_url, href):
+    if not href:
+        return ''
+    url = urljoin(base_url, href)
+    if urlsplit(url).scheme not in ('http', 'https') or \
+            len(url) > URL_MAX_LENGTH:
+        return ''
+    return url
+
+
+class HostLimiter:
+    """Space out the start of requests to each host"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next = {}
+
+    async def wait(self, host):
+        loop = asyncio.get_running_loop()
+        start = max(self._next.get(host, 0), loop.time())
+        # Reserve the slot before sleeping so concurrent callers queue up
+        self._next[host] = start + self.interval
+        delay = start - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def interleave_hosts(items):
+    """Yield (id, url) items taking turns between hosts, so requests
+    waiting on one host's rate limit leave others to the rest"""
+    hosts = defaultdict(deque)
+    for pk, url in items:
+        hosts[urlsplit(url).hostname].append((pk, url))
+    queues = deque(hosts.values())
+    while queues:
+        queue = queues.popleft()
+        yield queue.popleft()
+        if queue:
+            queues.append(queue)
+
+
+def is_public_address(host):
+    """Return whether the IP address host is reachable on the internet"""
+    address = ipaddress.ip_address(host.split('%')[0])
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+class PublicConnector(aiohttp.TCPConnector):
+    """A connector that only connects to public addresses"""
+
+    async def _resolve_host(self, host, port, traces=None):
+        # Connections are made to the addresses returned here, so a host
+        # cannot resolve to another address once checked
+        hosts = [info for info in await super()._resolve_host(
+            host, port, traces=traces
+        ) if is_public_address(info['host'])]
+        if not hosts:
+            raise OSError(f'{host} has no public address')
+        return hosts
+
+
+class Fetcher:
+    """Fetch page metadata for many urls concurrently. Hosts that are not
+    public are refused unless allow_private is set."""
+
+    def __init__(self, concurrency=CONCURRENCY, per_host=PER_HOST,
+                 host_interval=HOST_INTERVAL, timeout=TIMEOUT,
+                 max_bytes=MAX_BYTES, allow_private=False):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.host_interval = host_interval
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.allow_private = allow_private
+
+    def session(self):
+        connector = aiohttp.TCPConnector if self.allow_private \
+            else PublicConnector
+        return aiohttp.ClientSession(
+            connector=connector(limit=self.concurrency,
+                                limit_per_host=self.per_host),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': USER_AGENT},
+        )
+
+    async def fetch(self, session, limiter, url):
+        """Return the metadata of the page at url. Pages that cannot be
+        fetched get no status."""
+        await limiter.wait(urlsplit(url).hostname)
+        try:
+            async with session.get(url) as response:
+                metadata = dict(NO_METADATA, fetch_status=response.status)
+                if response.content_type not in HTML_TYPES:
+                    return metadata
+                body = b''
+                async for chunk in response.content.iter_chunked(65536):
+                    body += chunk
+                    if len(body) >= self.max_bytes:
+                        break
+                html = body[:self.max_bytes].decode(
+                    response.charset or 'utf-8', 'replace'
+                )
+                metadata.update(parse_head(html, str(response.url)))
+                return metadata
+        except (aiohttp.ClientError, asyncio.TimeoutError, LookupError,
+                ValueError):
+            return dict(NO_METADATA)
+
+    async def crawl(self, items, write, batch_size=BATCH_SIZE,
+                    session=None):
+        """Fetch every (id, url) in items, awaiting write with each batch
+        of (id, result) pairs. A session is opened for the crawl unless
+        one is given."""
+        if session is None:
+            async with self.session() as session:
+                return await self.crawl(items, write, batch_size, session)
+
+        items = interleave_hosts(items)
+        results = []
+        limiter = HostLimiter(self.host_interval)
+
+        async def worker():
+            for pk, url in items:
+                results.append((pk, await self.fetch(session, limiter, url)))
+                if len(results) >= batch_size:
+                    batch = results[:]
+                    results.clear()
+                    await write(batch)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        if results:
+            await write(results)
+
+
+def write_metadata(pages):
+    """Store a batch of fetched metadata"""
+    for user_id in URLItem.objects.set_metadata(pages):
+        cache.bump_version(user_id)
+
+
+def fetch_metadata(queryset=None, limit=None, batch_size=BATCH_SIZE,
+                   claim_size=CLAIM_SIZE, lease=LEASE, **options):
+    """Fetch metadata for the urlitems in queryset that have not been
+    fetched yet, oldest first and up to limit, returning how many were
+    fetched"""
+    queryset = URLItem.objects.all() if queryset is None else queryset
+    claim = sync_to_async(queryset.claim_metadata_fetches)
+    write = sync_to_async(write_metadata)
+    fetcher = Fetcher(**options)
+
+    async def run():
+        fetched = 0
+        try:
+            async with fetcher.session() as session:
+                while limit is None or fetched < limit:
+                    size = claim_size if limit is None \
+                        else min(claim_size, limit - fetched)
+                    items = await claim(size, lease)
+                    if not items:
+                        break
+                    await fetcher.crawl(items, write, batch_size, session)
+                    fetched += len(items)
+        finally:
+            # Writes ran on a thread shared by later calls
+            await sync_to_async(connections.close_all)()
+        return fetched
+
+    return asyncio.run(run())
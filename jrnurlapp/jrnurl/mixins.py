@@ -0,0 +1,93 @@
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from . import cache
+
+
+def _make_etag(*parts):
+    digest = hashlib.sha1(':'.join(map(str, parts)).encode('utf-8'))
+    return quote_etag(digest.hexdigest())
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _not_modified(request, etag, last_modified):
+    """Return the response answering a satisfied conditional request,
+    or None if the representation has to be sent"""
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is not None:
+        _set_validators(response, etag, last_modified)
+    return response
+
+
+class CachedListMixin:
+    """Serve list responses from the per-user response cache.
+
+    Cached responses are keyed by the user's version stamp, which the
+    signal handlers in jrnurl.signals replace on every write. The stamp
+    also drives the ETag and Last-Modified of the list, so conditional
+    requests are answered without touching the database."""
+
+    def list(self, request, *args, **kwargs):
+        version = cache.get_version(request.user.id)
+        key = cache.response_key(request, version)
+        etag = _make_etag(key, request.accepted_renderer.format)
+        last_modified = int(cache.version_timestamp(version))
+
+        response = _not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        data = cache.get_response(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set_response(key, response.data)
+        return _set_validators(response, etag, last_modified)
+
+
+class ConditionalRetrieveMixin:
+    """Answer conditional detail requests from modified timestamps.
+
+    The ETag covers the object's own modified stamp and that of every
+    related object in conditional_relations, which should be prefetched
+    by get_queryset, as well as the query, since ?fields= and ?expand=
+    change the representation. A matching If-None-Match or If-Modified-Since is
+    answered with 304 before anything is serialized."""
+    conditional_relations = ()
+
+    def get_validators(self, instance):
+        """Return the (etag, last_modified) pair for instance"""
+        stamps = [(instance.pk, instance.modified)]
+        for relation in self.conditional_relations:
+            stamps.extend(sorted(
+                (related.pk, related.modified)
+                for related in getattr(instance, relation).all()
+            ))
+        modified = [stamp for pk, stamp in stamps if stamp is not None]
+        last_modified = int(max(modified).timestamp()) if modified else None
+        query = sorted(self.request.query_params.lists())
+        etag = _make_etag(self.request.accepted_renderer.format, query,
+                          *stamps)
+        return etag, last_modified
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_validators(instance)
+
+        response = _not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(instance)
+        return _set_validators(Response(serializer.data), etag,
+                               last_modified)
@@ -0,0 +1,201 @@
+import datetime
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class _PositionEncoder(DjangoJSONEncoder):
+    """Keep the microseconds of datetimes, which DjangoJSONEncoder drops,
+    so a position compares equal to the row it was taken from"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _reverse_ordering(ordering):
+    """Flip the direction of every field in an ordering tuple"""
+    return tuple(field[1:] if field.startswith('-') else f'-{field}'
+                 for field in ordering)
+
+
+def _seek_filter(ordering, position, nullable=(), nulls_first=False):
+    """Build the filter selecting the rows that sort after position.
+
+    This is the expanded form of the row comparison
+    ``(a, b, c) > (x, y, z)`` that also works for mixed directions. The
+    leading field is bounded on its own as well so the database can turn
+    the condition into a range scan over the ordering index.
+
+    NULLs of the nullable fields sort after every value, or before every
+    value with nulls_first, whatever the direction of the field."""
+    first = ordering[0]
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        if name not in nullable:
+            after = Q(**{f'{name}__{lookup}': value})
+        elif value is None:
+            # Only values sort after NULLs, when they go first
+            after = Q(**{f'{name}__isnull': False}) if nulls_first \
+                else Q(pk__in=[])
+        else:
+            after = Q(**{f'{name}__{lookup}': value})
+            if not nulls_first:
+                after |= Q(**{f'{name}__isnull': True})
+        condition |= equal & after
+        equal &= Q(**{f'{name}__isnull': True}) if value is None \
+            else Q(**{name: value})
+    name = first.lstrip('-')
+    if name in nullable:
+        return condition
+    bound = 'lte' if first.startswith('-') else 'gte'
+    return Q(**{f'{name}__{bound}': position[0]}) & condition
+
+
+def _order_by(ordering, nullable, nulls_first):
+    """Return the order_by() arguments of ordering, placing the NULLs of
+    nullable fields as _seek_filter() expects"""
+    return [
+        field if field.lstrip('-') not in nullable else
+        OrderBy(F(field.lstrip('-')), descending=field.startswith('-'),
+                nulls_first=nulls_first, nulls_last=not nulls_first)
+        for field in ordering
+    ]
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination that seeks on the full ordering.
+
+    DRF's CursorPagination only stores the first ordering field in the
+    cursor and skips over ties with an OFFSET. Here the cursor holds the
+    value of every ordering field and the last field must be unique, so
+    each page is fetched with a WHERE clause on the ordering index and
+    page N costs the same as page 1."""
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('id',)
+    ordering_param = 'ordering'
+    # Orderings that can be asked for with ?ordering=, by name
+    orderings = {}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, position = False, None
+        else:
+            reverse, position = self.cursor.reverse, self.cursor.position
+
+        ordering = _reverse_ordering(self.ordering) if reverse \
+            else self.ordering
+        # NULLs go last, so they come first when paging backwards
+        nullable = {field.name for field in queryset.model._meta.fields
+                    if field.null}
+        queryset = queryset.order_by(*_order_by(ordering, nullable, reverse))
+        try:
+            # The values of a forged position fail their fields' lookups
+            # here, or when the query is run
+            if position is not None:
+                queryset = queryset.filter(
+                    _seek_filter(ordering, position, nullable, reverse)
+                )
+            results = list(queryset[:self.page_size + 1])
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if self.page:
+            self.next_position = self._get_position(self.page[-1])
+            self.previous_position = self._get_position(self.page[0])
+        else:
+            self.next_position = self.previous_position = position
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """Return the ordering named by the ordering query parameter, or
+        the default one"""
+        return self.orderings.get(
+            request.query_params.get(self.ordering_param), self.ordering
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=True, position=self.previous_position)
+        )
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        position = cursor.position
+        if position is not None:
+            position = json.dumps(position, cls=_PositionEncoder)
+        return super().encode_cursor(cursor._replace(position=position))
+
+    def _get_position(self, instance):
+        """Return the ordering values of instance as a cursor position"""
+        return [getattr(instance, field.lstrip('-'))
+                for field in self.ordering]
+
+
+class URLCollectionPagination(KeysetPagination):
+    """Paginate urlcollections by name, or by size or last activity,
+    each over an index of its own"""
+    ordering = ('name', 'id')
+    orderings = {
+        'name': ordering,
+        'item_count': ('item_count', 'id'),
+        '-item_count': ('-item_count', '-id'),
+        '-last_item_added': ('-last_item_added', '-id'),
+    }
+
+
+class URLItemPagination(KeysetPagination):
+    """Paginate urlitems by title"""
+    ordering = ('title', 'id')
@@ -0,0 +1,57 @@
+import codecs
+import csv
+import json
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+
+def _iter_lines(stream, encoding):
+    """Decode a byte stream line by line without reading it all"""
+    if stream is None:
+        return iter(())
+    return codecs.iterdecode(stream, encoding)
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline delimited JSON into a lazy iterator of rows.
+
+    Blank lines are skipped and lines that are not valid JSON are
+    yielded as None so the caller can report them per row."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return self._rows(_iter_lines(stream, encoding))
+
+    def _rows(self, lines):
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+class CSVParser(BaseParser):
+    """Parse CSV with a header row into a lazy iterator of rows.
+
+    Empty cells are dropped so field defaults apply and the tags column
+    is split on commas."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return self._rows(csv.DictReader(_iter_lines(stream, encoding)))
+
+    def _rows(self, reader):
+        for row in reader:
+            row = {key: value for key, value in row.items()
+                   if key and value not in (None, '')}
+            if 'tags' in row:
+                row['tags'] = [tag.strip() for tag in row['tags'].split(',')
+                               if tag.strip()]
+            yield row
@@ -0,0 +1,232 @@
+"""Synthetic journals for benchmarks.
+
+seed() creates users with collections, urlitems and collection links
+that look like real journals: urlitems spread over a few hundred hosts
+of uneven popularity, a long tail of tags, most urlitems visited a few
+times and some many times, and users of very different sizes (the
+first user saves the most, the item counts follow Zipf's law). Content
+is derived from a random seed, so a dataset can be rebuilt exactly.
+
+Rows are written a batch at a time with COPY, so seeding scales to
+millions of urlitems in flat memory. Benchmark users are recognised by
+the domain of their email address and removed by clear().
+"""
+import random
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from core.models import URLCollection, URLCollectionItems, URLItem
+from . import cache
+from .bulk import copy_insert
+
+DOMAIN = 'benchmark.invalid'
+PASSWORD = 'benchmark'
+BATCH_SIZE = 10000
+COLLECTIONS_PER_USER = 20
+COLLECTIONS_PER_ITEM = 1.5
+HOST_COUNT = 500
+MAX_AGE = timedelta(days=3 * 365)
+
+WORDS = (
+    'python django postgres index query cache latency async thread pool '
+    'release guide tutorial reference design pattern review notes talk '
+    'paper benchmark profile memory network server client browser linux '
+    'kernel compiler rust golang javascript typescript react vue css html '
+    'search vector ranking storage backup cloud deploy docker compose '
+    'security token session cookie api rest graph schema migration test '
+    'coverage debug logging metrics tracing alert incident postmortem '
+    'recipe travel music film book history science space climate energy '
+    'finance market startup career remote hiring interview team product '
+    'roadmap strategy'
+).split()
+TLDS = ('com', 'org', 'net', 'io', 'dev')
+
+
+def email(number):
+    return f'user{number}@{DOMAIN}'
+
+
+def benchmark_users():
+    return get_user_model().objects.filter(email__endswith='@' + DOMAIN)
+
+
+def clear():
+    """Remove every benchmark user and their journal, returning how many
+    users were removed"""
+    users = benchmark_users()
+    # Raw deletes skip collecting millions of rows for the cascade
+    for model in (URLCollectionItems, URLItem, URLCollection, Token):
+        rows = model.objects.filter(user__in=users)
+        rows._raw_delete(rows.db)
+    return users.delete()[1].get(users.model._meta.label, 0)
+
+
+def zipf_counts(total, size, exponent=1.0):
+    """Split total into size counts following Zipf's law, largest
+    first"""
+    weights = [1 / (rank + 1) ** exponent for rank in range(size)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in range(total - sum(counts)):
+        counts[index % size] += 1
+    return counts
+
+
+class Generator:
+    """Make journal rows from a seeded random number generator"""
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.now = now()
+        self.hosts = [
+            '{}{}.{}'.format(*self.random.sample(WORDS, 2),
+                             self.random.choice(TLDS))
+            for _ in range(HOST_COUNT)
+        ]
+        self.host_weights = [1 / (rank + 1) for rank in range(HOST_COUNT)]
+        self.tags = WORDS[:60]
+        self.tag_weights = [1 / (rank + 1) for rank in range(len(self.tags))]
+
+    def words(self, low, high):
+        return self.random.sample(WORDS, self.random.randint(low, high))
+
+    def timestamp(self):
+        return self.now - self.random.random() * MAX_AGE
+
+    def pick_tags(self, high):
+        count = self.random.randint(0, high)
+        return sorted(set(self.random.choices(self.tags, self.tag_weights,
+                                              k=count)))
+
+    def collection(self, user):
+        created = self.timestamp()
+        return URLCollection(
+            name=' '.join(self.words(1, 3)).capitalize(),
+            description=' '.join(self.words(0, 12)) or None,
+            created=created, modified=created,
+            collection_type=self.random.choice(
+                URLCollection.COLLECTION_TYPE_CHOICES
+            )[0],
+            favorite=self.random.random() < 0.1,
+            tags=self.pick_tags(3), user=user,
+        )
+
+    def urlitem(self, user, number):
+        host = self.random.choices(self.hosts, self.host_weights)[0]
+        path = '/'.join(self.words(1, 3))
+        created = self.timestamp()
+        # Most urlitems are visited a few times, a few very often
+        visits = int(self.random.paretovariate(1.2)) - 1
+        last_visited = None
+        if visits:
+            last_visited = created + self.random.random() * \
+                (self.now - created)
+        urlitem = URLItem(
+            title=' '.join(self.words(2, 8)).capitalize(),
+            # The number keeps the urls of a user distinct
+            url=f'https://{host}/{path}-{number}',
+            visits=visits, created=created,
+            modified=last_visited or created, tags=self.pick_tags(4),
+            user=user, last_visited=last_visited,
+        )
+        urlitem.set_url_hash()
+        return urlitem
+
+    def membership_count(self, mean):
+        whole = int(mean)
+        return whole + (self.random.random() < mean - whole)
+
+
+def _create_users(count, password, batch_size):
+    User = get_user_model()
+    # Hashing once keeps seeding thousands of users fast
+    hashed = make_password(password)
+    users = [User(email=email(number), name=f'Benchmark user {number}',
+                  password=hashed)
+             for number in range(count)]
+    User.objects.bulk_create(users, batch_size=batch_size)
+    return users
+
+
+class _Batch:
+    """Rows waiting to be copied into the database"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.collections = []
+        self.urlitems = []
+        self.links = []
+
+    def __len__(self):
+        return len(self.urlitems) + len(self.collections)
+
+    def write(self):
+        with transaction.atomic():
+            # Collections go first for the links to reference them
+            copy_insert(URLCollection, self.collections)
+            copy_insert(URLItem, self.urlitems)
+            copy_insert(URLCollectionItems, self.links)
+            URLCollection.objects.count_added(self.links)
+            URLItem.objects.filter(
+                pk__in=[urlitem.pk for urlitem in self.urlitems]
+            ).update_search_vector()
+        counts = (len(self.collections), len(self.urlitems), len(self.links))
+        self.clear()
+        return counts
+
+
+def seed(users, items, collections_per_user=COLLECTIONS_PER_USER,
+         collections_per_item=COLLECTIONS_PER_ITEM, seed=0,
+         batch_size=BATCH_SIZE, password=PASSWORD, progress=None):
+    """Create users benchmark users holding items urlitems between them.
+
+    Every user gets collections_per_user collections, and urlitems are
+    linked to collections_per_item of their user's collections on
+    average. progress, if given, is called with the running counts after
+    every batch. Return the counts of created rows."""
+    generator = Generator(seed)
+    counts = {'users': users, 'urlcollections': 0, 'urlitems': 0,
+              'memberships': 0}
+    batch = _Batch()
+
+    def flush():
+        written = batch.write()
+        for key, count in zip(('urlcollections', 'urlitems', 'memberships'),
+                              written):
+            counts[key] += count
+        if progress is not None:
+            progress(counts)
+
+    created_users = _create_users(users, password, batch_size)
+    for user, item_count in zip(created_users, zipf_counts(items, users)):
+        collections = [generator.collection(user)
+                       for _ in range(collections_per_user)]
+        batch.collections.extend(collections)
+        for number in range(item_count):
+            urlitem = generator.urlitem(user, number)
+            batch.urlitems.append(urlitem)
+            linked = min(generator.membership_count(collections_per_item),
+                         len(collections))
+            batch.links.extend(
+                URLCollectionItems(collection=collection, item=urlitem,
+                                   user=user)
+                for collection in generator.random.sample(collections,
+                                                          linked)
+            )
+            if len(batch) >= batch_size:
+                flush()
+    if len(batch):
+        flush()
+
+    with connection.cursor() as cursor:
+        for model in (URLCollection, URLItem, URLCollectionItems):
+            cursor.execute(f'ANALYZE {model._meta.db_table}')
+    for start in range(0, users, batch_size):
+        cache.bump_version(*(user.id for user in
+                             created_users[start:start + batch_size]))
+    return counts
@@ -1,25 +1,115 @@
+from django.db import transaction
+from django.utils.html import escape
 from rest_framework import serializers
-from drf_writable_nested.serializers import WritableNestedModelSerializer
-from core.models import URLCollection, URLItem, URLCollectionItems
+from rest_framework.permissions import SAFE_METHODS
+from core.canonical import url_hash
+from core.models import Job, URLCollection, URLItem, URLCollectionItems
+from . import bulk
 
 
-class URLItemSerializer(serializers.ModelSerializer):
+def query_param_list(request, name):
+    """Return the comma separated values of a query parameter as a set"""
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class SparseFieldsMixin:
+    """Serialize only the fields named in the ?fields= parameter of read
+    requests, e.g. ?fields=id,name"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        fields = query_param_list(request, 'fields')
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class URLItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for URLItem objects"""
 
     class Meta:
         model = URLItem
         fields = ('id', 'title', 'url', 'visits', 'created', 'modified',
-                  'tags', 'user',)
-        read_only_fields = ('id',)
+                  'tags', 'user', 'page_title', 'canonical_url',
+                  'favicon_url', 'fetch_status', 'fetched', 'link_status',
+                  'link_checked')
+        read_only_fields = ('id', 'modified', 'page_title', 'canonical_url',
+                            'favicon_url', 'fetch_status', 'fetched',
+                            'link_status', 'link_checked')
+
+    def validate(self, attrs):
+        """Reject changing the url of a urlitem to one the user has
+        already saved"""
+        attrs = super().validate(attrs)
+        if self.instance is not None and 'url' in attrs:
+            user = attrs.get('user', self.instance.user)
+            duplicate = URLItem.objects.filter(
+                user=user, url_hash=url_hash(attrs['url'])
+            ).exclude(pk=self.instance.pk)
+            if duplicate.exists():
+                raise serializers.ValidationError(
+                    {'url': 'This URL has already been saved.'}
+                )
+        return attrs
 
     def create(self, validated_data):
-        """Create new urlitem if it does not yet exist"""
-        urlitem, created = URLItem.objects.get_or_create(**validated_data)
-        if created:
-            urlitem.save()
+        """Create new urlitem unless the user already saved its url"""
+        user = validated_data.pop('user')
+        urlitem, created = URLItem.objects.get_or_create(
+            user=user,
+            url_hash=url_hash(validated_data['url']),
+            defaults=validated_data
+        )
         return urlitem
 
 
+class HeadlineField(serializers.CharField):
+    """Title headline with the matches between the HEADLINE_START and
+    HEADLINE_STOP control characters that SearchHeadline put around them.
+
+    Titles are written by users and taken from arbitrary pages, so they
+    are escaped before the matches are wrapped in <mark>."""
+    HEADLINE_START = '\x02'
+    HEADLINE_STOP = '\x03'
+
+    def to_representation(self, value):
+        return escape(value).replace(
+            self.HEADLINE_START, '<mark>'
+        ).replace(self.HEADLINE_STOP, '</mark>')
+
+
+class URLItemSearchSerializer(URLItemSerializer):
+    """Serializer for ranked urlitem search results"""
+    rank = serializers.FloatField(read_only=True)
+    headline = HeadlineField(read_only=True)
+
+    class Meta(URLItemSerializer.Meta):
+        fields = URLItemSerializer.Meta.fields + ('rank', 'headline')
+
+
+class NestedURLItemSerializer(URLItemSerializer):
+    """Serializer for urlitems nested in a urlcollection, which always
+    belong to the collection's user"""
+
+    class Meta(URLItemSerializer.Meta):
+        read_only_fields = URLItemSerializer.Meta.read_only_fields + ('user',)
+
+
+class URLItemBulkSerializer(serializers.ModelSerializer):
+    """Serializer for validating rows of a urlitem bulk import"""
+
+    class Meta:
+        model = URLItem
+        fields = ('title', 'url', 'visits', 'created', 'modified', 'tags')
+        extra_kwargs = {'visits': {'required': False}}
+
+
 class URLCollectionItemSerializer(serializers.ModelSerializer):
     """Serializer for the URLCollectionItem many-to-many objects"""
     class Meta:
@@ -27,10 +117,10 @@ class URLCollectionItemSerializer(serializers.ModelSerializer):
         fields = ('collection', 'item')
 
 
-class URLCollectionSerializer(WritableNestedModelSerializer,
+class URLCollectionSerializer(SparseFieldsMixin,
                               serializers.ModelSerializer):
     """Serializer for URLCollection objects"""
-    items = URLItemSerializer(many=True, required=False)
+    items = NestedURLItemSerializer(many=True, required=False)
     # items = serializers.PrimaryKeyRelatedField(
     #     many=True,
     #     queryset=URLItem.objects.all()
@@ -39,29 +129,70 @@ class URLCollectionSerializer(WritableNestedModelSerializer,
     class Meta:
         model = URLCollection
         fields = ('id', 'name', 'description', 'created', 'modified',
-                  'collection_type', 'tags', 'items', 'user')
+                  'collection_type', 'tags', 'items', 'user', 'item_count',
+                  'total_visits', 'last_item_added')
+        read_only_fields = ('modified',)
         extra_kwargs = {'items': {'required': False}}
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a new urlcollection if it does not exist
             and new urlitem tree if defined"""
 
-        items = []
-        if 'items' in validated_data:
-            items = validated_data.pop('items')
+        items = validated_data.pop('items', [])
 
         urlcollection, created = \
             URLCollection.objects.get_or_create(**validated_data)
 
-        for item in items:
-            item_obj = URLItem.objects.create(title=item['title'],
-                                              url=item['url'],
-                                              visits=item['visits'],
-                                              user=item['user'])
-            urlcollection.items.add(item_obj,
-                                    through_defaults={'user': item['user']})
+        if items:
+            urlitems = bulk.upsert_urlitems(urlcollection.user, items)
+            bulk.set_collection_items(
+                urlcollection, [urlitem for urlitem, new in urlitems]
+            )
 
-        if created:
-            urlcollection.save()
+        return urlcollection
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Update a urlcollection, replacing its urlitems if defined"""
+        items = validated_data.pop('items', None)
+
+        urlcollection = super().update(instance, validated_data)
+
+        if items is not None:
+            urlitems = bulk.upsert_urlitems(urlcollection.user, items)
+            bulk.set_collection_items(
+                urlcollection, [urlitem for urlitem, new in urlitems],
+                replace=True
+            )
 
         return urlcollection
+
+
+class URLCollectionListSerializer(URLCollectionSerializer):
+    """Compact serializer for lists of urlcollections.
+
+    Collections carry their item_count instead of their urlitems, unless
+    those are asked for with ?expand=items or by naming items in
+    ?fields=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.expands_items(self.context.get('request')):
+            self.fields.pop('items', None)
+
+    @staticmethod
+    def expands_items(request):
+        """Return whether request asks for the urlitems to be embedded"""
+        return 'items' in (query_param_list(request, 'expand') |
+                           query_param_list(request, 'fields'))
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of background jobs"""
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'max_attempts',
+                  'result', 'error', 'created', 'started', 'finished')
+        read_only_fields = fields
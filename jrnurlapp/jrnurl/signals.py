@@ -0,0 +1,22 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from core.models import URLCollection, URLItem, URLCollectionItems
+from . import cache
+
+
+@receiver(post_save, sender=URLCollection)
+@receiver(post_save, sender=URLItem)
+@receiver(post_save, sender=URLCollectionItems)
+@receiver(post_delete, sender=URLCollection)
+@receiver(post_delete, sender=URLItem)
+@receiver(post_delete, sender=URLCollectionItems)
+def invalidate_user_responses(sender, instance, **kwargs):
+    """Drop the cached responses of the owner of a saved/deleted row"""
+    cache.bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=URLCollectionItems)
+def invalidate_user_membership_responses(sender, instance, action, **kwargs):
+    """Drop the cached responses when collection membership changes"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cache.bump_version(instance.user_id)
@@ -0,0 +1,39 @@
+import os
+from django.contrib.auth import get_user_model
+from core.jobs import PermanentError, task
+from core.models import URLItem
+from . import bookmarks, bulk, metadata
+
+
+@task(name='jrnurl.import_bookmarks')
+def import_bookmarks(user_id, path, source=None):
+    """Import an uploaded bookmark export, removing the upload once it has
+    been imported"""
+    user = get_user_model().objects.get(pk=user_id)
+    try:
+        counts = bulk.import_bookmarks(user, path, source)
+    except bookmarks.UnsupportedFormat as exc:
+        raise PermanentError(str(exc))
+    os.remove(path)
+    if counts[bulk.CREATED]:
+        fetch_metadata.delay(user_id, user=user)
+    return counts
+
+
+@import_bookmarks.on_failure
+def remove_failed_upload(user_id, path, source=None):
+    """Remove the upload of an import that will not be tried again"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@task(name='jrnurl.fetch_metadata')
+def fetch_metadata(user_id=None, limit=None):
+    """Fetch page metadata for urlitems that have none yet, of one user
+    or of everyone"""
+    urlitems = URLItem.objects.all()
+    if user_id is not None:
+        urlitems = urlitems.filter(user_id=user_id)
+    return {'fetched': metadata.fetch_metadata(urlitems, limit)}
@@ -0,0 +1,88 @@
+import asyncio
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.models import URLItem
+from jrnurl import views
+from jrnurl.async_views import async_read_view
+
+
+class AsyncReadViewTests(TransactionTestCase):
+    """Test serving viewset reads from the thread pool under ASGI.
+
+    Reads run in other threads with their own database connections, so
+    these tests need committed data. Persistent connections are turned
+    off so the worker threads do not keep the test database open."""
+
+    def setUp(self):
+        patcher = mock.patch.dict(connection.settings_dict,
+                                  {'CONN_MAX_AGE': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.urlitem = URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=1,
+            user=self.user
+        )
+        self.list_view = async_read_view(views.URLItemViewSet.as_view(
+            {'get': 'list', 'post': 'create'}
+        ))
+        self.detail_view = async_read_view(views.URLItemViewSet.as_view(
+            {'get': 'retrieve'}
+        ))
+
+    def request(self, method, *args, **kwargs):
+        request = getattr(self.factory, method)(*args, **kwargs)
+        force_authenticate(request, user=self.user)
+        return request
+
+    def test_wrapped_view_is_coroutine(self):
+        """Test that Django's ASGI handler sees an async view"""
+        self.assertTrue(asyncio.iscoroutinefunction(self.list_view))
+        self.assertTrue(self.list_view.csrf_exempt)
+        self.assertEqual(self.list_view.actions,
+                         {'get': 'list', 'post': 'create'})
+
+    def test_concurrent_reads(self):
+        """Test that concurrent list and retrieve requests are served"""
+        async def read_many():
+            return await asyncio.gather(*(
+                self.detail_view(self.request('get', '/'),
+                                 pk=self.urlitem.pk)
+                if index % 2 else
+                self.list_view(self.request('get', '/'))
+                for index in range(8)
+            ))
+
+        responses = async_to_sync(read_many)()
+
+        for index, res in enumerate(responses):
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            data = res.data if index % 2 else res.data['results'][0]
+            self.assertEqual(data['title'], 'Google Search')
+
+    def test_write_through_async_view(self):
+        """Test that writes still work through the wrapped view"""
+        request = self.request('post', '/', {
+            'title': 'HTML5test',
+            'url': 'https://html5test.com',
+            'visits': 1,
+            'user': self.user.id,
+        }, format='json')
+
+        res = async_to_sync(self.list_view)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(URLItem.objects.filter(title='HTML5test').exists())
@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from core.models import URLCollection, URLCollectionItems, URLItem
+from jrnurl import benchmark, seed
+
+
+class SeedTests(TestCase):
+    """Test generating synthetic journals"""
+
+    def test_zipf_counts(self):
+        """Test that counts add up and fall off with rank"""
+        counts = seed.zipf_counts(1000, 10)
+
+        self.assertEqual(sum(counts), 1000)
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertGreater(counts[0], 3 * counts[-1])
+
+    def test_seed(self):
+        """Test that users, collections, urlitems and links are created in
+        batches and are searchable"""
+        counts = seed.seed(3, 50, collections_per_user=4,
+                           collections_per_item=1.5, batch_size=7)
+
+        self.assertEqual(counts['urlitems'], 50)
+        self.assertEqual(counts['urlcollections'], 12)
+        self.assertEqual(seed.benchmark_users().count(), 3)
+        self.assertEqual(URLItem.objects.count(), 50)
+        self.assertEqual(URLCollectionItems.objects.count(),
+                         counts['memberships'])
+        self.assertTrue(50 <= counts['memberships'] <= 100)
+        self.assertFalse(URLItem.objects.filter(search_vector=None).exists())
+        self.assertFalse(URLCollectionItems.objects.exclude(
+            collection__user=F('item__user')
+        ).exists())
+
+    def test_seed_is_reproducible(self):
+        """Test that the same seed gives the same content"""
+        seed.seed(2, 20, seed=7)
+        first = sorted(URLItem.objects.values_list('title', 'url'))
+        seed.clear()
+
+        seed.seed(2, 20, seed=7)
+
+        self.assertEqual(sorted(URLItem.objects.values_list('title', 'url')),
+                         first)
+
+    def test_clear(self):
+        """Test that clearing removes the benchmark users' journals"""
+        seed.seed(2, 20)
+
+        self.assertEqual(seed.clear(), 2)
+
+        self.assertFalse(URLItem.objects.exists())
+        self.assertFalse(URLCollection.objects.exists())
+
+    def test_seed_command(self):
+        """Test the seed_benchmark management command"""
+        out = StringIO()
+
+        call_command('seed_benchmark', users=2, items=30, stdout=out)
+
+        self.assertIn('Created 2 users, 40 collections, 30 urlitems',
+                      out.getvalue())
+
+
+class BenchmarkTests(TestCase):
+    """Test benchmarking the API"""
+
+    def setUp(self):
+        seed.seed(2, 40, collections_per_user=3)
+
+    def run_benchmark(self, **options):
+        return benchmark.run(requests=3, warmup=1, host='testserver',
+                             **options)
+
+    def test_run(self):
+        """Test that every endpoint answers and is measured"""
+        results = self.run_benchmark()
+
+        self.assertEqual(set(results['endpoints']),
+                         {endpoint.name for endpoint in benchmark.ENDPOINTS})
+        for name, stats in results['endpoints'].items():
+            self.assertEqual((name, stats['requests'], stats['errors']),
+                             (name, 3, 0))
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertGreater(
+            results['endpoints']['urlitem.retrieve']['queries_max'], 0
+        )
+        self.assertEqual(results['dataset']['urlitems'], 40)
+
+    def test_writes_are_rolled_back(self):
+        """Test that benchmarked writes leave the dataset as it was"""
+        self.run_benchmark(endpoints=['urlitem.create', 'urlitem.visit'])
+
+        self.assertEqual(URLItem.objects.count(), 40)
+        self.assertEqual(
+            URLItem.objects.filter(title='Benchmark urlitem').count(), 0
+        )
+
+    def test_percentiles(self):
+        """Test nearest rank percentiles"""
+        stats = benchmark.summarize([i / 1000 for i in range(1, 101)],
+                                    [1] * 100, {200: 100}, 1.0)
+
+        self.assertEqual((stats['p50_ms'], stats['p95_ms'], stats['p99_ms']),
+                         (50, 95, 99))
+        self.assertEqual(stats['throughput_rps'], 100)
+
+    def test_command_writes_and_compares_results(self):
+        """Test the run_benchmark management command"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'results.json')
+        options = {'endpoints': ['lookup'], 'requests': 2, 'warmup': 0,
+                   'host': 'testserver', 'stdout': StringIO()}
+
+        call_command('run_benchmark', output=path, **options)
+        out = StringIO()
+        call_command('run_benchmark', **dict(options, compare=path,
+                                             stdout=out))
+
+        with open(path) as results:
+            self.assertEqual(json.load(results)['endpoints']['lookup']
+                             ['requests'], 2)
+        self.assertIn('change', out.getvalue())
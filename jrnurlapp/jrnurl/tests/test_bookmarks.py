@@ -0,0 +1,300 @@
+import json
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.jobs import DatabaseBroker, Worker
+from core.models import Job, URLCollection, URLItem
+from jrnurl import bookmarks, bulk
+
+IMPORT_BOOKMARKS_URL = reverse('jrnurl:import-bookmarks')
+
+NETSCAPE_HTML = '''<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks</H1>
+<DL><p>
+    <DT><H3 ADD_DATE="1600000000">Bookmarks bar</H3>
+    <DL><p>
+        <DT><A HREF="https://docs.python.org/3/" ADD_DATE="1600000000"
+            TAGS="python,docs">Python &amp; friends</A>
+        <DT><H3>Django</H3>
+        <DL><p>
+            <DT><A HREF="https://www.djangoproject.com/">Django</A>
+            <DT><A HREF="javascript:alert(1)">Bookmarklet</A>
+        </DL><p>
+    </DL><p>
+    <DT><A HREF="https://example.com/?a=1&amp;b=2">Unfiled</A>
+</DL><p>
+'''
+
+
+class BookmarkImportTests(TestCase):
+    """Test importing browser bookmark and history exports"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(path, mode) as export:
+            export.write(content)
+        return path
+
+    def sqlite(self, name, script):
+        path = os.path.join(self.directory.name, name)
+        with sqlite3.connect(path) as db:
+            db.executescript(script)
+        db.close()
+        return path
+
+    def collection_titles(self):
+        return {
+            urlcollection.name: sorted(item.title for item in
+                                       urlcollection.items.all())
+            for urlcollection in URLCollection.objects.filter(user=self.user)
+        }
+
+    def test_scan_netscape_across_chunk_boundaries(self):
+        """Test that elements split between chunks are still parsed"""
+        chunks = [NETSCAPE_HTML[start:start + 7]
+                  for start in range(0, len(NETSCAPE_HTML), 7)]
+
+        entries = list(bookmarks.scan_netscape(chunks))
+
+        self.assertEqual(entries, list(bookmarks.scan_netscape(
+            [NETSCAPE_HTML]
+        )))
+        self.assertEqual([folder for folder, entry in entries], [
+            ('Bookmarks bar',),
+            ('Bookmarks bar', 'Django'),
+            ('Bookmarks bar', 'Django'),
+            (),
+        ])
+
+    def test_clean_entry(self):
+        """Test that entries are turned into urlitem rows"""
+        folder, entry = next(bookmarks.scan_netscape([NETSCAPE_HTML]))
+
+        row = bookmarks.clean_entry(entry)
+
+        self.assertEqual(row['title'], 'Python & friends')
+        self.assertEqual(row['url'], 'https://docs.python.org/3/')
+        self.assertEqual(row['tags'], ['python', 'docs'])
+        self.assertEqual(row['created'].timestamp(), 1600000000)
+        self.assertIsNone(bookmarks.clean_entry({'url': 'place:sort=8'}))
+
+    def test_import_netscape_html(self):
+        """Test that folders become collections and links urlitems"""
+        path = self.write('bookmarks.html', NETSCAPE_HTML)
+
+        counts = bulk.import_bookmarks(self.user, path)
+
+        self.assertEqual(counts, {'collections': 2, 'created': 3,
+                                  'exists': 0, 'invalid': 1})
+        self.assertEqual(self.collection_titles(), {
+            'Bookmarks bar': ['Python & friends'],
+            'Bookmarks bar / Django': ['Django'],
+        })
+        self.assertTrue(URLItem.objects.filter(
+            user=self.user, url='https://example.com/?a=1&b=2'
+        ).exists())
+
+    def test_import_again_reuses_collections_and_urlitems(self):
+        """Test that importing the same file twice creates nothing new"""
+        path = self.write('bookmarks.html', NETSCAPE_HTML)
+        bulk.import_bookmarks(self.user, path)
+
+        counts = bulk.import_bookmarks(self.user, path, batch_size=2)
+
+        self.assertEqual(counts, {'collections': 0, 'created': 0,
+                                  'exists': 3, 'invalid': 1})
+        self.assertEqual(URLCollection.objects.count(), 2)
+        self.assertEqual(URLItem.objects.count(), 3)
+
+    def test_import_in_process_pool(self):
+        """Test that parsing across worker processes gives the same
+        result"""
+        path = self.write('bookmarks.html', NETSCAPE_HTML)
+
+        counts = bulk.import_bookmarks(self.user, path, workers=2,
+                                       batch_size=1)
+
+        self.assertEqual(counts['created'], 3)
+        self.assertEqual(self.collection_titles()['Bookmarks bar / Django'],
+                         ['Django'])
+
+    def test_import_chrome_json(self):
+        """Test importing Chrome's Bookmarks file"""
+        path = self.write('Bookmarks', json.dumps({'roots': {
+            'bookmark_bar': {'type': 'folder', 'name': 'Bookmarks bar',
+                             'children': [
+                                 {'type': 'url', 'name': 'Python',
+                                  'url': 'https://python.org',
+                                  'date_added': '13245000000000000'},
+                             ]},
+            'other': {'type': 'folder', 'name': 'Other bookmarks',
+                      'children': []},
+        }}))
+
+        counts = bulk.import_bookmarks(self.user, path)
+
+        self.assertEqual(counts['created'], 1)
+        self.assertEqual(self.collection_titles(),
+                         {'Bookmarks bar': ['Python']})
+        urlitem = URLItem.objects.get(user=self.user)
+        self.assertEqual(urlitem.created.year, 2020)
+
+    def test_import_firefox_json(self):
+        """Test importing a Firefox bookmarks backup"""
+        path = self.write('bookmarks.json', json.dumps({
+            'guid': 'root________', 'title': '',
+            'type': 'text/x-moz-place-container', 'children': [
+                {'guid': 'toolbar_____', 'title': 'toolbar',
+                 'type': 'text/x-moz-place-container', 'children': [
+                     {'title': 'MDN', 'type': 'text/x-moz-place',
+                      'uri': 'https://developer.mozilla.org',
+                      'tags': 'web,docs'},
+                 ]},
+                {'guid': 'tags________', 'title': 'tags',
+                 'type': 'text/x-moz-place-container', 'children': [
+                     {'title': 'web', 'type': 'text/x-moz-place-container',
+                      'children': [{'type': 'text/x-moz-place',
+                                    'uri': 'https://developer.mozilla.org'}]},
+                 ]},
+            ],
+        }))
+
+        counts = bulk.import_bookmarks(self.user, path)
+
+        self.assertEqual(counts['created'], 1)
+        self.assertEqual(self.collection_titles(),
+                         {'Bookmarks Toolbar': ['MDN']})
+        self.assertEqual(URLItem.objects.get(user=self.user).tags,
+                         ['web', 'docs'])
+
+    def test_import_firefox_places(self):
+        """Test importing bookmarks, tags and history from places.sqlite"""
+        path = self.sqlite('places.sqlite', '''
+            CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT,
+                title TEXT, visit_count INTEGER, hidden INTEGER,
+                last_visit_date INTEGER);
+            CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER,
+                fk INTEGER, parent INTEGER, title TEXT, dateAdded INTEGER,
+                guid TEXT);
+            INSERT INTO moz_places VALUES
+                (1, 'https://python.org/', 'Python', 4, 0, 0),
+                (2, 'https://example.com/', 'Example', 2, 0,
+                 1600000000000000),
+                (3, 'https://hidden.example.com/', 'Hidden', 1, 1, 0),
+                (4, 'https://unvisited.example.com/', 'Unvisited', 0, 0, 0);
+            INSERT INTO moz_bookmarks VALUES
+                (1, 2, NULL, 0, '', 0, 'root________'),
+                (2, 2, NULL, 1, 'menu', 0, 'menu________'),
+                (3, 2, NULL, 1, 'tags', 0, 'tags________'),
+                (4, 2, NULL, 2, 'Reading', 0, 'reading_____'),
+                (5, 1, 1, 4, 'Python home', 1600000000000000, 'a'),
+                (6, 2, NULL, 3, 'python', 0, 'tag_________'),
+                (7, 1, 1, 6, NULL, 0, 'b');
+        ''')
+
+        counts = bulk.import_bookmarks(self.user, path)
+
+        self.assertEqual(counts['created'], 2)
+        self.assertEqual(self.collection_titles(),
+                         {'Bookmarks Menu / Reading': ['Python home']})
+        python = URLItem.objects.get(url='https://python.org/')
+        self.assertEqual((python.visits, python.tags), (4, ['python']))
+        self.assertEqual(URLItem.objects.get(title='Example').visits, 2)
+
+    def test_import_chrome_history(self):
+        """Test importing Chrome's History database"""
+        path = self.sqlite('History', '''
+            CREATE TABLE urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT,
+                visit_count INTEGER, last_visit_time INTEGER,
+                hidden INTEGER);
+            INSERT INTO urls VALUES
+                (1, 'https://python.org/', 'Python', 3, 13245000000000000, 0),
+                (2, 'chrome://settings/', 'Settings', 1, 0, 0);
+        ''')
+
+        counts = bulk.import_bookmarks(self.user, path)
+
+        self.assertEqual((counts['created'], counts['invalid']), (1, 1))
+        self.assertEqual(URLItem.objects.get(user=self.user).visits, 3)
+
+    def test_unsupported_file(self):
+        """Test that files that are not exports are rejected"""
+        path = self.write('notes.txt', 'Just some notes')
+
+        with self.assertRaises(bookmarks.UnsupportedFormat):
+            bulk.import_bookmarks(self.user, path)
+
+    def test_import_command(self):
+        """Test the import_bookmarks management command"""
+        path = self.write('bookmarks.html', NETSCAPE_HTML)
+        out = StringIO()
+
+        call_command('import_bookmarks', self.user.email, path, stdout=out)
+
+        self.assertIn('Imported 3 urlitems into 2 new collections',
+                      out.getvalue())
+
+    def upload(self, name, content):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.settings(JRNURL_IMPORT_DIR=self.directory.name):
+            return client.post(IMPORT_BOOKMARKS_URL, {
+                'file': SimpleUploadedFile(name, content)
+            })
+
+    def test_upload_endpoint(self):
+        """Test that an uploaded export is imported by a background job"""
+        res = self.upload('bookmarks.html', NETSCAPE_HTML.encode())
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res['Location'],
+                         reverse('jrnurl:job-detail', args=[res.data['id']]))
+        self.assertFalse(URLItem.objects.filter(user=self.user).exists())
+
+        Worker(DatabaseBroker()).run_one()
+
+        job = Job.objects.get(pk=res.data['id'])
+        self.assertEqual((job.status, job.result['created']),
+                         (Job.SUCCEEDED, 3))
+        self.assertEqual(URLItem.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_upload_of_unsupported_file_fails_job(self):
+        """Test that a file that is not an export fails its job"""
+        res = self.upload('notes.txt', b'Just some notes')
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            Worker(DatabaseBroker()).run_one()
+
+        job = Job.objects.get(pk=res.data['id'])
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 1))
+        self.assertIn('Not a bookmark', job.error)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_upload_requires_file(self):
+        """Test that an upload without a file is rejected"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.post(IMPORT_BOOKMARKS_URL, {})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,158 @@
+import json
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import URLItem
+
+URLITEM_BULK_URL = reverse('jrnurl:urlitem-bulk-import')
+
+
+class BulkImportApiTests(TestCase):
+    """Test the urlitem bulk import endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def post_ndjson(self, rows):
+        body = '\n'.join(
+            row if isinstance(row, str) else json.dumps(row) for row in rows
+        )
+        return self.client.post(URLITEM_BULK_URL, body,
+                                content_type='application/x-ndjson')
+
+    def test_import_ndjson(self):
+        """Test importing urlitems from newline delimited JSON"""
+        res = self.post_ndjson([
+            {'title': 'Google Search', 'url': 'http://google.com',
+             'visits': 3},
+            {'title': 'HTML5test', 'url': 'https://html5test.com',
+             'tags': ['html', 'test']},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        urlitem = URLItem.objects.get(user=self.user,
+                                      url='https://html5test.com')
+        self.assertEqual(urlitem.visits, 0)
+        self.assertEqual(urlitem.tags, ['html', 'test'])
+        self.assertEqual(res.data['results'][1]['id'], urlitem.id)
+
+    def test_import_csv(self):
+        """Test importing urlitems from CSV with a header row"""
+        body = ('title,url,visits,tags\n'
+                'Google Search,http://google.com,2,"search,web"\n'
+                'HTML5test,https://html5test.com,,\n')
+        res = self.client.post(URLITEM_BULK_URL, body,
+                               content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        urlitem = URLItem.objects.get(user=self.user,
+                                      url='http://google.com')
+        self.assertEqual(urlitem.visits, 2)
+        self.assertEqual(urlitem.tags, ['search', 'web'])
+
+    def test_import_dedupes_existing_urls(self):
+        """Test that urls already saved by the user are not duplicated"""
+        urlitem = URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=1,
+            user=self.user
+        )
+
+        res = self.post_ndjson([
+            {'title': 'Google', 'url': 'http://google.com'},
+            {'title': 'HTML5test', 'url': 'https://html5test.com'},
+            {'title': 'HTML5test again', 'url': 'https://html5test.com'},
+        ])
+
+        statuses = [result['status'] for result in res.data['results']]
+        self.assertEqual(statuses, ['exists', 'created', 'exists'])
+        self.assertEqual(res.data['results'][0]['id'], urlitem.id)
+        self.assertEqual(res.data['results'][1]['id'],
+                         res.data['results'][2]['id'])
+        self.assertEqual(URLItem.objects.filter(user=self.user).count(), 2)
+
+    def test_import_dedupes_canonical_urls(self):
+        """Test that urls differing only in tracking params, case, ports
+        or fragments are imported once"""
+        res = self.post_ndjson([
+            {'title': 'Page', 'url': 'https://example.com/page'},
+            {'title': 'Page', 'url': 'https://Example.com:443/page/'},
+            {'title': 'Page', 'url': 'https://example.com/page?utm_medium=x'},
+            {'title': 'Page', 'url': 'https://example.com/page#section'},
+        ])
+
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['exists'], 3)
+        self.assertEqual(URLItem.objects.filter(user=self.user).count(), 1)
+
+    def test_import_reports_invalid_rows(self):
+        """Test that invalid rows are reported without failing the import"""
+        res = self.post_ndjson([
+            {'title': 'No url'},
+            '{not json',
+            {'title': 'Google Search', 'url': 'http://google.com'},
+        ])
+
+        self.assertEqual(res.data['invalid'], 2)
+        self.assertEqual(res.data['created'], 1)
+        self.assertIn('url', res.data['results'][0]['errors'])
+        self.assertEqual(res.data['results'][1]['status'], 'invalid')
+
+    def test_import_rejects_body_that_is_not_rows(self):
+        """Test that a JSON body other than a list or an object is a bad
+        request"""
+        for body in ('5', '"http://google.com"', 'null', 'true'):
+            res = self.client.post(URLITEM_BULK_URL, body,
+                                   content_type='application/json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST,
+                             body)
+            self.assertIn('non_field_errors', res.data)
+        self.assertFalse(URLItem.objects.exists())
+
+    def test_import_query_count_independent_of_rows(self):
+        """Test that a batch is deduped and inserted set-based"""
+        def rows(prefix, count):
+            return [{'title': f'Item {index}',
+                     'url': f'https://example.com/{prefix}/{index}'}
+                    for index in range(count)]
+
+        with CaptureQueriesContext(connection) as small:
+            self.post_ndjson(rows('small', 2))
+        with CaptureQueriesContext(connection) as large:
+            res = self.post_ndjson(rows('large', 50))
+
+        self.assertEqual(res.data['created'], 50)
+        self.assertEqual(len(small.captured_queries),
+                         len(large.captured_queries))
+        self.assertEqual(
+            URLItem.objects.filter(user=self.user).count(), 52
+        )
+
+    def test_import_preserves_special_characters(self):
+        """Test that quotes, commas and newlines survive the COPY insert"""
+        title = 'He said "hi", then\nleft \\o/'
+        res = self.post_ndjson([
+            {'title': title, 'url': 'https://example.com/?q="a,b"',
+             'tags': ['with "quote"', 'back\\slash', 'comma,tag']},
+        ])
+
+        self.assertEqual(res.data['created'], 1)
+        urlitem = URLItem.objects.get(user=self.user)
+        self.assertEqual(urlitem.title, title)
+        self.assertEqual(urlitem.url, 'https://example.com/?q="a,b"')
+        self.assertEqual(urlitem.tags,
+                         ['with "quote"', 'back\\slash', 'comma,tag'])
+        self.assertIsNotNone(urlitem.created)
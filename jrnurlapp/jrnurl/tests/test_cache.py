@@ -0,0 +1,144 @@
+import json
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+from jrnurl import cache as response_cache
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+URLITEM_BULK_URL = reverse('jrnurl:urlitem-bulk-import')
+
+
+class ResponseCacheTests(TransactionTestCase):
+    """Test the per-user list response cache and its invalidation, which
+    happens when writes commit"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.urlcollection = URLCollection.objects.create(
+            name='Interesting HTML URLs',
+            user=self.user
+        )
+        self.urlitem = URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=1,
+            user=self.user
+        )
+
+    def test_list_served_from_cache(self):
+        """Test that repeating a list request does not hit the database"""
+        first = self.client.get(URLCOLLECTION_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(URLCOLLECTION_URL)
+
+        self.assertEqual(first.data, second.data)
+
+    def test_query_parameters_cached_separately(self):
+        """Test that different queries do not share a cache entry"""
+        self.client.get(URLITEM_URL)
+        res = self.client.get(URLITEM_URL, {'tags__all': 'missing'})
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_users_cached_separately(self):
+        """Test that users never see each other's cached responses"""
+        self.client.get(URLITEM_URL)
+        other_user = get_user_model().objects.create_user(
+            'otheruser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(URLITEM_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_save_invalidates_cache(self):
+        """Test that saving a urlitem invalidates the cached lists"""
+        self.client.get(URLITEM_URL)
+        self.urlitem.title = 'Search engine'
+        self.urlitem.save()
+
+        res = self.client.get(URLITEM_URL)
+
+        self.assertEqual(res.data['results'][0]['title'], 'Search engine')
+
+    def test_invalidated_on_commit(self):
+        """Test that responses are invalidated once a transaction
+        commits, and not by one that rolls back"""
+        version = response_cache.get_version(self.user.id)
+
+        with transaction.atomic():
+            self.urlitem.title = 'Search engine'
+            self.urlitem.save()
+            self.assertEqual(response_cache.get_version(self.user.id),
+                             version)
+        self.assertNotEqual(response_cache.get_version(self.user.id),
+                            version)
+
+        version = response_cache.get_version(self.user.id)
+        with transaction.atomic():
+            self.urlitem.delete()
+            transaction.set_rollback(True)
+        self.assertEqual(response_cache.get_version(self.user.id), version)
+
+    def test_delete_invalidates_cache(self):
+        """Test that deleting a urlitem invalidates the cached lists"""
+        self.client.get(URLITEM_URL)
+        self.urlitem.delete()
+
+        self.assertEqual(self.client.get(URLITEM_URL).data['results'], [])
+
+    def test_membership_change_invalidates_cache(self):
+        """Test that adding and removing collection items invalidates the
+        cached collection list"""
+        self.client.get(URLCOLLECTION_URL)
+        self.urlcollection.items.add(self.urlitem,
+                                     through_defaults={'user': self.user})
+
+        res = self.client.get(URLCOLLECTION_URL)
+        self.assertEqual(res.data['results'][0]['item_count'], 1)
+
+        self.urlcollection.items.remove(self.urlitem)
+
+        res = self.client.get(URLCOLLECTION_URL)
+        self.assertEqual(res.data['results'][0]['item_count'], 0)
+
+    def test_bulk_import_invalidates_cache(self):
+        """Test that urlitems inserted by the bulk import show up"""
+        self.client.get(URLITEM_URL)
+        self.client.post(URLITEM_BULK_URL,
+                         json.dumps({'title': 'Bulk imported page',
+                                     'url': 'https://example.com/imported'}),
+                         content_type='application/x-ndjson')
+
+        res = self.client.get(URLITEM_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_nested_collection_create_invalidates_cache(self):
+        """Test that links written by a nested collection create show up"""
+        self.client.get(URLCOLLECTION_URL)
+        self.client.put(
+            f'{URLCOLLECTION_URL}{self.urlcollection.id}/',
+            {'name': self.urlcollection.name, 'user': self.user.id,
+             'items': [{'title': 'Google Search', 'url': 'http://google.com',
+                        'visits': 1}]},
+            format='json'
+        )
+
+        res = self.client.get(URLCOLLECTION_URL)
+
+        self.assertEqual(res.data['results'][0]['item_count'], 1)
@@ -0,0 +1,161 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+
+
+def detail_url(base, pk):
+    return f'{base}{pk}/'
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling of the list and detail views"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.urlcollection = URLCollection.objects.create(
+            name='Interesting HTML URLs',
+            user=self.user
+        )
+        self.urlitem = URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=1,
+            user=self.user
+        )
+        self.urlcollection.items.add(self.urlitem,
+                                     through_defaults={'user': self.user})
+
+    def test_detail_not_modified(self):
+        """Test that a matching If-None-Match is answered with 304"""
+        url = detail_url(URLITEM_URL, self.urlitem.id)
+        res = self.client.get(url)
+        self.assertIn('Last-Modified', res)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_detail_not_modified_since(self):
+        """Test that If-Modified-Since is honoured"""
+        url = detail_url(URLITEM_URL, self.urlitem.id)
+        res = self.client.get(url)
+
+        res = self.client.get(url,
+                              HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_on_update(self):
+        """Test that a changed urlitem is sent again"""
+        url = detail_url(URLITEM_URL, self.urlitem.id)
+        etag = self.client.get(url)['ETag']
+        self.urlitem.title = 'Search engine'
+        self.urlitem.save()
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Search engine')
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_detail_etag_depends_on_query(self):
+        """Test that the ETag of a detail differs between the fields and
+        expansions requested"""
+        url = detail_url(URLCOLLECTION_URL, self.urlcollection.id)
+        etag = self.client.get(url)['ETag']
+
+        for params in ({'fields': 'name'}, {'expand': 'items'}):
+            res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(res['ETag'], etag)
+
+    def test_collection_etag_covers_items(self):
+        """Test that editing a nested urlitem changes the collection ETag"""
+        url = detail_url(URLCOLLECTION_URL, self.urlcollection.id)
+        etag = self.client.get(url)['ETag']
+        self.urlitem.title = 'Search engine'
+        self.urlitem.save()
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_detail_etag_changes_on_metadata(self):
+        """Test that a urlitem is sent again once its page metadata has
+        been fetched"""
+        url = detail_url(URLITEM_URL, self.urlitem.id)
+        etag = self.client.get(url)['ETag']
+        URLItem.objects.set_metadata([(self.urlitem.id, {
+            'page_title': 'Google', 'canonical_url': '',
+            'favicon_url': '', 'fetch_status': 200,
+        })])
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['page_title'], 'Google')
+
+    def test_detail_etag_changes_on_link_check(self):
+        """Test that a urlitem is sent again once its link has been
+        checked"""
+        url = detail_url(URLITEM_URL, self.urlitem.id)
+        etag = self.client.get(url)['ETag']
+        URLItem.objects.set_link_status([(self.urlitem.id, 404)])
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['link_status'], 404)
+
+    def test_list_not_modified_without_queries(self):
+        """Test that a list revalidation does not hit the database"""
+        etag = self.client.get(URLITEM_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(URLITEM_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_on_write(self):
+        """Test that writes invalidate list ETags"""
+        etag = self.client.get(URLCOLLECTION_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.urlcollection.items.remove(self.urlitem)
+
+        res = self.client.get(URLCOLLECTION_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['item_count'], 0)
+
+    def test_list_etag_depends_on_query(self):
+        """Test that different queries of the list have different ETags"""
+        etag = self.client.get(URLITEM_URL)['ETag']
+
+        res = self.client.get(URLITEM_URL, {'tags__any': 'web'},
+                              HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_modified_is_read_only(self):
+        """Test that clients cannot set the modified timestamp"""
+        res = self.client.patch(detail_url(URLITEM_URL, self.urlitem.id),
+                                {'modified': '2000-01-01T00:00:00Z'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.urlitem.refresh_from_db()
+        self.assertGreater(self.urlitem.modified.year, 2000)
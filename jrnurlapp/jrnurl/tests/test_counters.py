@@ -0,0 +1,255 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLCollectionItems, URLItem
+from jrnurl import bulk, visits
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+
+
+class CollectionCounterTests(TestCase):
+    """Test the item count, total visits and last added time kept on
+    urlcollections"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.urlcollection = self.create_urlcollection('Reading')
+        self.urlitems = [self.create_urlitem(index, visits=index + 1)
+                         for index in range(3)]
+
+    def create_urlcollection(self, name):
+        return URLCollection.objects.create(name=name, user=self.user)
+
+    def create_urlitem(self, index, visits=0):
+        return URLItem.objects.create(
+            title=f'Item {index}', url=f'https://example.com/{index}',
+            visits=visits, user=self.user
+        )
+
+    def link(self, urlcollection, *urlitems):
+        urlcollection.items.add(*urlitems,
+                                through_defaults={'user': self.user})
+
+    def assertCounters(self, urlcollection, item_count, total_visits):
+        """Assert the counters of urlcollection and that recounting finds
+        nothing to repair"""
+        urlcollection.refresh_from_db()
+        self.assertEqual((urlcollection.item_count,
+                          urlcollection.total_visits),
+                         (item_count, total_visits))
+        self.assertEqual(URLCollection.objects.recount(), 0)
+        return urlcollection
+
+    def test_add_and_remove_through_managers(self):
+        """Test that adding, removing and clearing links from either side
+        keeps the counters"""
+        first, second, third = self.urlitems
+        other = self.create_urlcollection('Other')
+
+        self.link(self.urlcollection, first, second)
+        third.collection.add(self.urlcollection, other,
+                             through_defaults={'user': self.user})
+        self.assertCounters(self.urlcollection, 3, 6)
+        self.assertCounters(other, 1, 3)
+
+        self.urlcollection.items.remove(second)
+        self.assertCounters(self.urlcollection, 2, 4)
+
+        third.collection.clear()
+        self.assertCounters(self.urlcollection, 1, 1)
+        self.assertCounters(other, 0, 0)
+
+    def test_last_item_added(self):
+        """Test that last_item_added follows the newest link, and goes
+        back to the one before when that link is removed"""
+        first, second = self.urlitems[:2]
+        self.link(self.urlcollection, first)
+        added = self.assertCounters(self.urlcollection, 1, 1).last_item_added
+        self.link(self.urlcollection, second)
+
+        newest = self.assertCounters(self.urlcollection, 2, 3)
+        self.assertGreater(newest.last_item_added, added)
+
+        self.urlcollection.items.remove(second)
+        self.assertEqual(
+            self.assertCounters(self.urlcollection, 1, 1).last_item_added,
+            added
+        )
+        self.urlcollection.items.clear()
+        self.assertIsNone(
+            self.assertCounters(self.urlcollection, 0, 0).last_item_added
+        )
+
+    def test_link_saved_and_deleted_directly(self):
+        """Test that links created and deleted as models are counted"""
+        link = URLCollectionItems.objects.create(
+            collection=self.urlcollection, item=self.urlitems[2],
+            user=self.user
+        )
+        self.assertCounters(self.urlcollection, 1, 3)
+
+        link.delete()
+        self.assertCounters(self.urlcollection, 0, 0)
+
+    def test_deleting_urlitem(self):
+        """Test that deleting a urlitem takes it off its urlcollections"""
+        self.link(self.urlcollection, *self.urlitems)
+
+        self.urlitems[1].delete()
+
+        self.assertCounters(self.urlcollection, 2, 4)
+
+    def test_set_collection_items(self):
+        """Test that the set-based writes of bulk.set_collection_items,
+        which send no signals, keep the counters"""
+        first, second, third = self.urlitems
+
+        bulk.set_collection_items(self.urlcollection, [first, second])
+        self.assertEqual(self.urlcollection.item_count, 2)
+        self.assertCounters(self.urlcollection, 2, 3)
+
+        bulk.set_collection_items(self.urlcollection, [second, third],
+                                  replace=True)
+        self.assertEqual(self.urlcollection.item_count, 2)
+        self.assertCounters(self.urlcollection, 2, 5)
+
+    def test_set_collection_items_linked_meanwhile(self):
+        """Test that links inserted by a concurrent request after they
+        were looked up are skipped instead of failing, and counted once"""
+        first, second = self.urlitems[:2]
+        insert_links = bulk._insert_links
+
+        def link_first_meanwhile(urlcollection, item_ids):
+            self.link(urlcollection, first)
+            return insert_links(urlcollection, item_ids)
+
+        with mock.patch.object(bulk, '_insert_links',
+                               link_first_meanwhile):
+            bulk.set_collection_items(self.urlcollection, [first, second])
+
+        self.assertEqual(self.urlcollection.item_count, 2)
+        self.assertCounters(self.urlcollection, 2, 3)
+        self.assertEqual(URLCollectionItems.objects.count(), 2)
+
+    def test_visits(self):
+        """Test that visits of urlitems count towards every urlcollection
+        they are in, whether written at once, buffered or saved"""
+        first, second = self.urlitems[:2]
+        other = self.create_urlcollection('Other')
+        self.link(self.urlcollection, first, second)
+        self.link(other, first)
+
+        with self.settings(JRNURL_VISIT_FLUSH_INTERVAL=0):
+            visits.record_visit(self.user, first.id)
+        URLItem.objects.add_visits({first.id: 2, second.id: 5})
+        first.refresh_from_db()
+        first.visits = 10
+        first.save()
+
+        self.assertCounters(self.urlcollection, 2, 17)
+        self.assertCounters(other, 1, 10)
+
+    def test_saving_stale_urlcollection(self):
+        """Test that saving a urlcollection loaded before links were added
+        does not reset its counters"""
+        self.link(URLCollection.objects.get(pk=self.urlcollection.pk),
+                  self.urlitems[0])
+
+        self.urlcollection.name = 'Renamed'
+        self.urlcollection.save()
+
+        urlcollection = self.assertCounters(self.urlcollection, 1, 1)
+        self.assertEqual(urlcollection.name, 'Renamed')
+
+    def test_recount_collections_command(self):
+        """Test that the repair command fixes counters that drifted"""
+        self.link(self.urlcollection, *self.urlitems)
+        other = self.create_urlcollection('Other')
+        URLCollection.objects.update(item_count=99, total_visits=0)
+        out = StringIO()
+
+        call_command('recount_collections', user=[self.user.email],
+                     batch_size=1, stdout=out)
+
+        self.assertIn('Recounted 2 collections, repaired 2', out.getvalue())
+        self.assertCounters(self.urlcollection, 3, 6)
+        self.assertCounters(other, 0, 0)
+
+
+class CollectionOrderingTests(TestCase):
+    """Test listing urlcollections by size and by activity"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.names = {}
+        for index, size in enumerate((2, 0, 3, 1, 0)):
+            urlcollection = URLCollection.objects.create(
+                name=f'Collection {index}', user=self.user
+            )
+            self.names[urlcollection.id] = urlcollection.name
+            urlcollection.items.add(*(
+                URLItem.objects.create(
+                    title=f'{index}.{number}',
+                    url=f'https://example.com/{index}/{number}',
+                    visits=0, user=self.user
+                ) for number in range(size)
+            ), through_defaults={'user': self.user})
+
+    def walk(self, ordering):
+        """Return the names of every page of ordering, two at a time,
+        after checking that following the previous links walks back
+        over the same names"""
+        names = []
+        url = URLCOLLECTION_URL
+        params = {'ordering': ordering, 'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            names.extend(row['name'] for row in res.data['results'])
+            url, params = res.data['next'], None
+
+        backwards = []
+        url = res.data['previous']
+        while url:
+            res = self.client.get(url)
+            backwards[:0] = [row['name'] for row in res.data['results']]
+            url = res.data['previous']
+        self.assertEqual(backwards, names[:len(backwards)])
+        return names
+
+    def ordered(self, *fields):
+        return [self.names[pk] for pk in URLCollection.objects.filter(
+            user=self.user
+        ).order_by(*fields).values_list('id', flat=True)]
+
+    def test_order_by_size(self):
+        """Test paging through urlcollections largest first"""
+        names = self.walk('-item_count')
+
+        self.assertEqual(names, self.ordered('-item_count', '-id'))
+        self.assertEqual(names[:3], ['Collection 2', 'Collection 0',
+                                     'Collection 3'])
+
+    def test_order_by_activity(self):
+        """Test paging through urlcollections most recently added to
+        first, with empty ones last"""
+        names = self.walk('-last_item_added')
+
+        self.assertEqual(names[:3], ['Collection 3', 'Collection 2',
+                                     'Collection 0'])
+        self.assertEqual(set(names[3:]), {'Collection 1', 'Collection 4'})
+
+    def test_unknown_ordering(self):
+        """Test that an unknown ordering lists by name"""
+        self.assertEqual(self.walk('-user'), sorted(self.names.values()))
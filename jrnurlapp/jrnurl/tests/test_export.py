@@ -0,0 +1,158 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+from jrnurl import export
+
+EXPORT_URL = reverse('jrnurl:export')
+
+
+class JournalExportTests(TestCase):
+    """Test the streaming journal export endpoint and command"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.urlcollection = URLCollection.objects.create(
+            name='Interesting HTML URLs',
+            tags=['html'],
+            user=self.user
+        )
+        self.urlitems = [
+            URLItem.objects.create(title=f'Page "{index}" ✓',
+                                   url=f'https://example.com/{index}',
+                                   visits=index, user=self.user)
+            for index in range(5)
+        ]
+        self.urlcollection.items.add(*self.urlitems[:2],
+                                     through_defaults={'user': self.user})
+        other_user = get_user_model().objects.create_user(
+            'otheruser@testdomain.com',
+            'test1234'
+        )
+        URLItem.objects.create(title='Other', url='https://example.org',
+                               visits=1, user=other_user)
+
+    def read(self, res):
+        return b''.join(res.streaming_content)
+
+    def test_export_ndjson(self):
+        """Test exporting every record of the user as NDJSON"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line)
+                   for line in self.read(res).decode().splitlines()]
+        types = [record['type'] for record in records]
+        self.assertEqual(types, ['collection'] + ['item'] * 5 +
+                         ['membership'] * 2)
+        self.assertEqual(records[0]['tags'], ['html'])
+        self.assertEqual(
+            {record['title'] for record in records[1:6]},
+            {urlitem.title for urlitem in self.urlitems}
+        )
+        self.assertEqual(
+            {record['item'] for record in records[6:]},
+            {str(urlitem.id) for urlitem in self.urlitems[:2]}
+        )
+
+    def test_export_json_gzip(self):
+        """Test exporting a single gzipped JSON document"""
+        res = self.client.get(EXPORT_URL, {'output': 'json', 'gzip': '1'})
+
+        self.assertEqual(res['Content-Type'], 'application/gzip')
+        self.assertIn('journal.json.gz', res['Content-Disposition'])
+        journal = json.loads(gzip.decompress(self.read(res)))
+        self.assertEqual(len(journal['collections']), 1)
+        self.assertEqual(len(journal['items']), 5)
+        self.assertEqual(len(journal['memberships']), 2)
+
+    def test_export_in_chunks(self):
+        """Test that records are fetched a chunk at a time"""
+        sections = export.journal_sections(self.user, chunk_size=2)
+        items = dict((name, records) for name, _, records in sections)
+
+        self.assertEqual(len(list(items['items'])), 5)
+
+    def test_export_invalid_output(self):
+        """Test that unknown output formats are rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_journal_command(self):
+        """Test writing the export to a file with the command"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'journal.ndjson.gz')
+            call_command('export_journal', self.user.email, '--gzip',
+                         '--output', path, '--chunk-size', '2')
+            with gzip.open(path, 'rt') as journal:
+                lines = journal.read().splitlines()
+
+        self.assertEqual(len(lines), 8)
+
+
+class ExportSnapshotTests(TransactionTestCase):
+    """Test exports reading committed data as the server would, from one
+    snapshot and off the event loop under ASGI"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        URLCollection.objects.create(name='Reading', user=self.user)
+        URLItem.objects.create(title='First', url='https://example.com/1',
+                               visits=0, user=self.user)
+        self.token = Token.objects.create(user=self.user)
+
+    def test_export_is_a_snapshot(self):
+        """Test that records written while an export runs are left out of
+        every section"""
+        def write():
+            try:
+                URLItem.objects.create(title='Late',
+                                       url='https://example.com/late',
+                                       visits=0, user=self.user)
+            finally:
+                connection.close()
+
+        with mock.patch.object(export, 'BUFFER_SIZE', 1):
+            chunks = export.export_journal(self.user)
+            first = next(chunks)
+            writer = threading.Thread(target=write)
+            writer.start()
+            writer.join()
+            lines = (first + b''.join(chunks)).decode().splitlines()
+
+        self.assertEqual([json.loads(line)['type'] for line in lines],
+                         ['collection', 'item'])
+        self.assertEqual(URLItem.objects.count(), 2)
+
+    async def test_export_under_asgi(self):
+        """Test that the ASGI handler serves the export without reading
+        the database in the event loop"""
+        with mock.patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0}):
+            res = await AsyncClient().get(
+                EXPORT_URL, **{'authorization': f'Token {self.token.key}'}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(b''.join(res).splitlines()), 2)
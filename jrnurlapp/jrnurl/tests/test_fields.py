@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+
+
+class SparseFieldsTests(TestCase):
+    """Test compact collection lists, ?fields= and ?expand="""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.urlcollection = URLCollection.objects.create(
+            name='Interesting HTML URLs',
+            collection_type=URLCollection.OTHER,
+            user=self.user
+        )
+        URLCollection.objects.create(name='Empty', user=self.user)
+        self.urlitems = [
+            URLItem.objects.create(title=f'Page {index}',
+                                   url=f'https://example.com/{index}',
+                                   visits=1, user=self.user)
+            for index in range(3)
+        ]
+        self.urlcollection.items.add(*self.urlitems,
+                                     through_defaults={'user': self.user})
+
+    def test_list_counts_items_in_one_query(self):
+        """Test that lists carry item counts instead of the urlitems"""
+        with self.assertNumQueries(1):
+            res = self.client.get(URLCOLLECTION_URL)
+
+        counts = {c['name']: c['item_count'] for c in res.data['results']}
+        self.assertEqual(counts, {'Empty': 0, 'Interesting HTML URLs': 3})
+        self.assertNotIn('items', res.data['results'][0])
+
+    def test_list_expand_items(self):
+        """Test that ?expand=items embeds the urlitems"""
+        with self.assertNumQueries(2):
+            res = self.client.get(URLCOLLECTION_URL, {'expand': 'items'})
+
+        collection = res.data['results'][1]
+        self.assertEqual(collection['item_count'], 3)
+        self.assertEqual(len(collection['items']), 3)
+
+    def test_list_fields(self):
+        """Test that ?fields= limits the fields of every collection"""
+        res = self.client.get(URLCOLLECTION_URL,
+                              {'fields': 'id,name,item_count'})
+
+        self.assertEqual(set(res.data['results'][0]),
+                         {'id', 'name', 'item_count'})
+
+    def test_list_fields_naming_items(self):
+        """Test that naming items in ?fields= embeds them"""
+        res = self.client.get(URLCOLLECTION_URL, {'fields': 'name,items'})
+
+        self.assertEqual(set(res.data['results'][1]), {'name', 'items'})
+        self.assertEqual(set(res.data['results'][1]['items'][0]),
+                         {'id', 'title', 'url', 'visits', 'created',
+                          'modified', 'tags', 'user', 'page_title',
+                          'canonical_url', 'favicon_url', 'fetch_status',
+                          'fetched', 'link_status', 'link_checked'})
+
+    def test_detail_embeds_items(self):
+        """Test that the detail view still embeds the urlitems"""
+        res = self.client.get(f'{URLCOLLECTION_URL}{self.urlcollection.id}/')
+
+        self.assertEqual(len(res.data['items']), 3)
+
+    def test_urlitem_fields(self):
+        """Test ?fields= on urlitem lists and details"""
+        res = self.client.get(URLITEM_URL, {'fields': 'title,url'})
+        self.assertEqual(set(res.data['results'][0]), {'title', 'url'})
+
+        res = self.client.get(f'{URLITEM_URL}{self.urlitems[0].id}/',
+                              {'fields': 'visits'})
+        self.assertEqual(res.data, {'visits': 1})
+
+    def test_fields_ignored_for_writes(self):
+        """Test that ?fields= does not drop fields that are written"""
+        res = self.client.patch(
+            f'{URLITEM_URL}{self.urlitems[0].id}/?fields=id',
+            {'title': 'Renamed'}
+        )
+
+        self.assertEqual(res.data['title'], 'Renamed')
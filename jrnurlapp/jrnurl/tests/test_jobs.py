@@ -0,0 +1,57 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Job
+
+
+def job_url(job):
+    return reverse('jrnurl:job-detail', args=[job.id])
+
+
+class JobApiTests(TestCase):
+    """Test the background job status endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_job(self):
+        """Test retrieving the status of a job"""
+        job = Job.objects.create(name='jrnurl.import_bookmarks',
+                                 status=Job.SUCCEEDED, attempts=1,
+                                 result={'created': 3}, user=self.user)
+
+        res = self.client.get(job_url(job))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.SUCCEEDED)
+        self.assertEqual(res.data['result'], {'created': 3})
+        self.assertNotIn('args', res.data)
+
+    def test_jobs_limited_to_user(self):
+        """Test that other users' jobs are not found"""
+        other_user = get_user_model().objects.create_user(
+            'otheruser@testdomain.com',
+            'test1234'
+        )
+        job = Job.objects.create(name='jrnurl.import_bookmarks',
+                                 user=other_user)
+
+        res = self.client.get(job_url(job))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_jobs_require_authentication(self):
+        """Test that job status requires authentication"""
+        job = Job.objects.create(name='jrnurl.import_bookmarks',
+                                 user=self.user)
+
+        res = APIClient().get(job_url(job))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
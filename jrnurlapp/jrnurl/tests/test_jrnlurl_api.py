@@ -1,10 +1,13 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from core.models import URLCollection, URLItem
-from jrnurl.serializers import URLCollectionSerializer, URLItemSerializer
+from jrnurl.serializers import URLCollectionListSerializer, \
+    URLCollectionSerializer, URLItemSerializer
 
 URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
 URLITEM_URL = reverse('jrnurl:urlitem-list')
@@ -49,11 +52,14 @@ class PrivateApiTests(TestCase):
         )
 
         res = self.client.get(URLCOLLECTION_URL)
-        urlcollections = URLCollection.objects.filter(user=self.user)
-        serializer = URLCollectionSerializer(urlcollections, many=True)
+        urlcollections = URLCollection.objects.filter(
+            user=self.user
+        ).order_by('name')
+        serializer = URLCollectionListSerializer(urlcollections, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertNotIn('items', res.data['results'][0])
 
     def test_retrieve_urlitem_list(self):
         """Test retrieving a list of urlitems"""
@@ -76,8 +82,8 @@ class PrivateApiTests(TestCase):
         urlitems = URLItem.objects.filter(user=self.user)
         serializer = URLItemSerializer(urlitems, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrieve_complex_urlcollection(self):
         """Test retrieving a complex urlcollection
@@ -111,12 +117,14 @@ class PrivateApiTests(TestCase):
         urlcollection.items.add(urlitem2, through_defaults={'user': self.user})
         urlcollection.keywords = ['html', 'web', 'browser']
 
-        res = self.client.get(URLCOLLECTION_URL)
+        res = self.client.get(URLCOLLECTION_URL, {'expand': 'items'})
         urlcollections = URLCollection.objects.filter(user=self.user)
         serializer = URLCollectionSerializer(urlcollections, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['item_count'], 2)
+        self.assertEqual(res.data['results'][0]['total_visits'], 2)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_create_simple_urlcollection_successful(self):
         """Test creating a new simple urlcollection
@@ -214,6 +222,38 @@ class PrivateApiTests(TestCase):
         ).exists()
         self.assertTrue(exists)
 
+    def test_create_urlitem_reuses_canonical_url(self):
+        """Test that saving the same page again returns the saved urlitem"""
+        urlitem = URLItem.objects.create(title='Google Search',
+                                         url='https://google.com/search',
+                                         visits=1, user=self.user)
+        payload = {
+            'title': 'Google',
+            'url': 'HTTPS://Google.com:443/search/?utm_source=feed#results',
+            'visits': 3,
+            'user': self.user.id
+        }
+
+        res = self.client.post(URLITEM_URL, payload)
+
+        self.assertEqual(res.data['id'], str(urlitem.id))
+        self.assertEqual(URLItem.objects.filter(user=self.user).count(), 1)
+
+    def test_update_urlitem_to_saved_url_rejected(self):
+        """Test that a urlitem cannot be changed into a duplicate"""
+        URLItem.objects.create(title='Google Search',
+                               url='http://google.com', visits=1,
+                               user=self.user)
+        urlitem = URLItem.objects.create(title='HTML5test',
+                                         url='https://html5test.com',
+                                         visits=1, user=self.user)
+
+        res = self.client.patch(f'{URLITEM_URL}{urlitem.id}/',
+                                {'url': 'http://google.com/'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('url', res.data)
+
     def test_create_urlitem_unsuccessful(self):
         """Test creating a urlitem is unsuccessful"""
         payload = {
@@ -301,6 +341,164 @@ class PrivateApiTests(TestCase):
         self.assertEqual(compare_urlcollection.description,
                          payload['description'])
 
+    def test_retrieve_urlcollection_list_limited_to_user(self):
+        """Test that only the authenticated user's urlcollections
+        are returned"""
+        other_user = get_user_model().objects.create_user(
+            'otheruser@testdomain.com',
+            'test1234'
+        )
+        URLCollection.objects.create(
+            name='Other users URLs',
+            collection_type=URLCollection.OTHER,
+            user=other_user
+        )
+        urlcollection = URLCollection.objects.create(
+            name='Interesting HTML URLs',
+            collection_type=URLCollection.OTHER,
+            user=self.user
+        )
+
+        res = self.client.get(URLCOLLECTION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['id'], str(urlcollection.id))
+
+    def test_urlcollection_list_query_count_is_constant(self):
+        """Test that listing urlcollections does not issue a query
+        per collection or per urlitem"""
+        def create_collection(index, item_count):
+            urlcollection = URLCollection.objects.create(
+                name=f'Collection {index}',
+                collection_type=URLCollection.OTHER,
+                user=self.user
+            )
+            for item_index in range(item_count):
+                urlitem = URLItem.objects.create(
+                    title=f'Item {index}-{item_index}',
+                    url=f'https://example.com/{index}/{item_index}',
+                    visits=1,
+                    user=self.user
+                )
+                urlcollection.items.add(urlitem,
+                                        through_defaults={'user': self.user})
+
+        create_collection(0, 1)
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.get(URLCOLLECTION_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(1, 6):
+                create_collection(index, 3)
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.get(URLCOLLECTION_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 6)
+
+        self.assertEqual(len(small.captured_queries),
+                         len(large.captured_queries))
+
+    def test_create_complex_urlcollection_reuses_urlitems(self):
+        """Test that nested urlitems with urls the user already saved
+        are linked instead of duplicated"""
+        urlitem = URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=4,
+            user=self.user
+        )
+        payload = {
+            'name': 'Complex URL Collection',
+            'collection_type': 400,
+            'user': self.user.id,
+            'items': [
+                {'title': 'Google', 'url': 'http://google.com',
+                 'visits': 1, 'user': self.user.id},
+                {'title': 'HTML5test', 'url': 'https://html5test.com',
+                 'visits': 1, 'user': self.user.id},
+                {'title': 'HTML5test', 'url': 'https://html5test.com',
+                 'visits': 1, 'user': self.user.id},
+            ]
+        }
+        res = self.client.post(URLCOLLECTION_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        urlcollection = URLCollection.objects.get(id=res.data['id'])
+        self.assertEqual(urlcollection.items.count(), 2)
+        self.assertIn(urlitem, urlcollection.items.all())
+        self.assertEqual(URLItem.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(len(res.data['items']), 2)
+
+    def test_create_large_batch_complex_urlcollection(self):
+        """Test that nested urlitems are written set-based so the query
+        count does not grow with the number of items"""
+        def payload(name, count):
+            return {
+                'name': name,
+                'collection_type': 400,
+                'user': self.user.id,
+                'items': [
+                    {'title': f'Item {index}',
+                     'url': f'https://example.com/{name}/{index}',
+                     'visits': 1, 'user': self.user.id}
+                    for index in range(count)
+                ]
+            }
+
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.post(URLCOLLECTION_URL, payload('small', 2),
+                                   format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.post(URLCOLLECTION_URL, payload('large', 200),
+                                   format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        urlcollection = URLCollection.objects.get(id=res.data['id'])
+        self.assertEqual(urlcollection.items.count(), 200)
+        self.assertEqual(len(small.captured_queries),
+                         len(large.captured_queries))
+
+    def test_update_complex_urlcollection_replaces_urlitems(self):
+        """Test that a put with urlitems replaces the collection's links"""
+        urlcollection = URLCollection.objects.create(
+            name='Complex URL Collection',
+            collection_type=URLCollection.RESEARCH,
+            user=self.user
+        )
+        kept, dropped = [
+            URLItem.objects.create(title=title, url=url, visits=1,
+                                   user=self.user)
+            for title, url in (('Google', 'http://google.com'),
+                               ('HTML5test', 'https://html5test.com'))
+        ]
+        urlcollection.items.add(kept, dropped,
+                                through_defaults={'user': self.user})
+
+        payload = {
+            'name': 'Complex URL Collection',
+            'collection_type': 400,
+            'user': self.user.id,
+            'items': [
+                {'title': 'Google', 'url': 'http://google.com',
+                 'visits': 1, 'user': self.user.id},
+                {'title': 'W3Schools', 'url': 'https://www.w3schools.com',
+                 'visits': 1, 'user': self.user.id},
+            ]
+        }
+        res = self.client.put(f'{URLCOLLECTION_URL}{urlcollection.id}/',
+                              payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        urls = set(urlcollection.items.values_list('url', flat=True))
+        self.assertEqual(urls, {'http://google.com',
+                                'https://www.w3schools.com'})
+        self.assertTrue(URLItem.objects.filter(id=dropped.id).exists())
+        self.assertEqual(
+            {item['url'] for item in res.data['items']}, urls
+        )
+
 # TODO Add tests for updating URLItems
-# TODO Add tests for updating complex URLCollections
-# TODO Add test for creating large batch complex URLCollection
@@ -0,0 +1,211 @@
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from core.models import URLItem
+from jrnurl import links, visits
+
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answer /ok, refuse HEAD on /no-head and 404 anything else"""
+
+    def respond(self):
+        self.server.paths.append(self.path)
+        if self.path == '/ok' or \
+                self.path == '/no-head' and self.command == 'GET':
+            status = 200
+        elif self.path == '/no-head':
+            status = 405
+        else:
+            status = 404
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_HEAD = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkScheduleTests(TestCase):
+    """Test claiming urlitems for link checks and scheduling the next
+    check"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+
+    def create_urlitem(self, name, next_check=None, **fields):
+        return URLItem.objects.create(
+            title=name, url=f'https://example.com/{name}', visits=0,
+            next_check=next_check or now(), user=self.user, **fields
+        )
+
+    def test_claim_due_urlitems_earliest_first(self):
+        """Test that only due urlitems are claimed, and only once, starting
+        with the ones due earliest"""
+        later = self.create_urlitem('later', now() - timedelta(minutes=1))
+        earlier = self.create_urlitem('earlier', now() - timedelta(hours=1))
+        self.create_urlitem('future', now() + timedelta(days=1))
+
+        claimed = URLItem.objects.claim_link_checks(10, timedelta(hours=1))
+
+        self.assertEqual(set(claimed), {
+            (earlier.id, 'https://example.com/earlier'),
+            (later.id, 'https://example.com/later'),
+        })
+        later.refresh_from_db()
+        self.assertGreater(later.next_check, now() + timedelta(minutes=59))
+        self.assertEqual(
+            URLItem.objects.claim_link_checks(10, timedelta(hours=1)), []
+        )
+
+    def test_claim_limit(self):
+        """Test that at most limit urlitems are claimed"""
+        for index in range(3):
+            self.create_urlitem(f'item{index}',
+                                now() - timedelta(minutes=index))
+
+        claimed = URLItem.objects.claim_link_checks(2, timedelta(hours=1))
+
+        self.assertEqual({url for pk, url in claimed},
+                         {'https://example.com/item1',
+                          'https://example.com/item2'})
+
+    def test_schedule_after_check(self):
+        """Test that recently visited links are re-checked sooner and
+        broken links back off"""
+        working = self.create_urlitem('working')
+        visited = self.create_urlitem('visited', last_visited=now())
+        broken = self.create_urlitem('broken')
+
+        URLItem.objects.set_link_status([(working.id, 200),
+                                         (visited.id, 301),
+                                         (broken.id, None)])
+
+        for urlitem in (working, visited, broken):
+            urlitem.refresh_from_db()
+        self.assertEqual((working.link_status, working.link_failures),
+                         (200, 0))
+        self.assertAlmostEqual(working.next_check - working.link_checked,
+                               timedelta(days=30),
+                               delta=timedelta(seconds=1))
+        self.assertAlmostEqual(visited.next_check - visited.link_checked,
+                               timedelta(days=1),
+                               delta=timedelta(seconds=1))
+        self.assertEqual((broken.link_status, broken.link_failures),
+                         (None, 1))
+        self.assertAlmostEqual(broken.next_check - broken.link_checked,
+                               timedelta(days=1),
+                               delta=timedelta(seconds=1))
+
+        URLItem.objects.set_link_status([(broken.id, 500)])
+
+        broken.refresh_from_db()
+        self.assertEqual(broken.link_failures, 2)
+        self.assertAlmostEqual(broken.next_check - broken.link_checked,
+                               timedelta(days=2),
+                               delta=timedelta(seconds=1))
+
+    def test_visit_brings_check_forward(self):
+        """Test that a visit schedules a check within a day"""
+        urlitem = self.create_urlitem('item', now() + timedelta(days=20))
+
+        with self.settings(JRNURL_VISIT_FLUSH_INTERVAL=0):
+            visits.record_visit(self.user, urlitem.id)
+
+        urlitem.refresh_from_db()
+        self.assertIsNotNone(urlitem.last_visited)
+        self.assertLess(urlitem.next_check, now() + timedelta(days=1))
+
+    def test_filter_by_link_health(self):
+        """Test filtering urlitems on the result of their last check"""
+        self.create_urlitem('ok', link_status=200, link_checked=now())
+        self.create_urlitem('gone', link_status=404, link_checked=now())
+        self.create_urlitem('down', link_status=None, link_checked=now())
+        self.create_urlitem('new')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def titles(link):
+            res = client.get(URLITEM_URL, {'link': link})
+            return [item['title'] for item in res.data['results']]
+
+        self.assertEqual(titles('broken'), ['down', 'gone'])
+        self.assertEqual(titles('ok'), ['ok'])
+        self.assertEqual(titles('unchecked'), ['new'])
+
+
+class CheckLinksTests(TransactionTestCase):
+    """Test checking links against a local stand-in server"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.paths = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+
+    def create_urlitem(self, url):
+        return URLItem.objects.create(title=url, url=url, visits=0,
+                                      user=self.user)
+
+    def check(self, **options):
+        options = dict({'host_interval': 0, 'timeout': 5,
+                        'allow_private': True}, **options)
+        return links.check_links(**options)
+
+    def test_check_links(self):
+        """Test that link statuses are recorded, falling back to GET for
+        servers that refuse HEAD"""
+        ok = self.create_urlitem(self.base + '/ok')
+        no_head = self.create_urlitem(self.base + '/no-head')
+        gone = self.create_urlitem(self.base + '/gone')
+        down = self.create_urlitem('http://127.0.0.1:9/')
+
+        self.assertEqual(self.check(claim_size=3), 4)
+
+        statuses = dict(URLItem.objects.values_list('id', 'link_status'))
+        self.assertEqual(statuses, {ok.id: 200, no_head.id: 200,
+                                    gone.id: 404, down.id: None})
+        self.assertFalse(URLItem.objects.filter(link_checked=None).exists())
+        self.assertEqual(self.check(), 0)
+
+    def test_check_links_limit(self):
+        """Test that a run stops after limit links"""
+        for index in range(5):
+            self.create_urlitem(f'{self.base}/ok?{index}')
+
+        self.assertEqual(self.check(limit=3, claim_size=2), 3)
+        self.assertEqual(
+            URLItem.objects.filter(link_checked__isnull=False).count(), 3
+        )
+
+    def test_private_addresses_refused(self):
+        """Test that links to hosts that are not public are recorded as
+        unreachable without connecting to them"""
+        urlitem = self.create_urlitem(self.base + '/ok')
+
+        self.assertEqual(self.check(allow_private=False), 1)
+
+        urlitem.refresh_from_db()
+        self.assertIsNotNone(urlitem.link_checked)
+        self.assertIsNone(urlitem.link_status)
+        self.assertEqual(self.server.paths, [])
@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+from jrnurl import lookup
+
+LOOKUP_URL = reverse('jrnurl:lookup')
+
+
+class URLLookupTests(TestCase):
+    """Test looking up a saved url and its collections"""
+
+    def setUp(self):
+        lookup.local_lookups.clear()
+        self.addCleanup(lookup.local_lookups.clear)
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.urlitem = URLItem.objects.create(
+            title='Python', url='https://www.python.org/downloads/',
+            visits=0, user=self.user
+        )
+
+    def get(self, url):
+        return self.client.get(LOOKUP_URL, {'url': url})
+
+    def test_lookup_canonical_url(self):
+        """Test that a url differing only in non canonical parts matches"""
+        res = self.get('HTTPS://www.python.org/downloads?utm_source=x#top')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['url'], 'https://www.python.org/downloads')
+        self.assertTrue(res.data['saved'])
+        self.assertEqual(res.data['item']['id'], self.urlitem.id)
+        self.assertEqual(res.data['collections'], [])
+
+    def test_lookup_lists_collections(self):
+        """Test that the collections holding the urlitem are returned"""
+        names = ['Reading', 'Languages']
+        for name in names:
+            urlcollection = URLCollection.objects.create(name=name,
+                                                         user=self.user)
+            urlcollection.items.add(self.urlitem,
+                                    through_defaults={'user': self.user})
+
+        res = self.get(self.urlitem.url)
+
+        self.assertEqual([c['name'] for c in res.data['collections']],
+                         sorted(names))
+
+    def test_lookup_unsaved_url(self):
+        """Test that urls that were not saved are reported as such"""
+        res = self.get('https://example.com/')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.data['saved'])
+        self.assertIsNone(res.data['item'])
+
+    def test_lookup_other_users_urlitem(self):
+        """Test that other users' urlitems are not found"""
+        other = get_user_model().objects.create_user('other@testdomain.com',
+                                                     'test1234')
+        self.client.force_authenticate(other)
+
+        res = self.get(self.urlitem.url)
+
+        self.assertFalse(res.data['saved'])
+
+    def test_lookup_requires_url(self):
+        """Test that a lookup without a url is rejected"""
+        res = self.client.get(LOOKUP_URL, {'url': ' '})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lookup_cached_until_journal_changes(self):
+        """Test that a repeated lookup is answered without queries until
+        the user's journal changes"""
+        self.get('https://example.com/')
+
+        with self.assertNumQueries(0):
+            res = self.get('https://example.com/')
+        self.assertFalse(res.data['saved'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            URLItem.objects.create(title='Example',
+                                   url='https://example.com/',
+                                   visits=0, user=self.user)
+
+        self.assertTrue(self.get('https://example.com/').data['saved'])
@@ -0,0 +1,357 @@
+import asyncio
+import threading
+from datetime import timedelta
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.models import Job, URLCollection, URLItem
+from jrnurl import metadata
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+URLITEM_BULK_URL = reverse('jrnurl:urlitem-bulk-import')
+
+PAGES = {
+    '/page': (200, 'text/html; charset=utf-8',
+              '<html><head><title> Example\n page </title>'
+              '<link rel="canonical" href="/canonical">'
+              '<link rel="shortcut icon" href="static/icon.png">'
+              '</head><body>Body</body></html>'),
+    '/untitled': (200, 'text/html',
+                  '<title>Page without a saved title</title>'),
+    '/notes.txt': (200, 'text/plain', 'Not HTML'),
+}
+REDIRECTS = {
+    '/moved': 'http://localhost:{port}/page',
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serve PAGES, and 404 for anything else"""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path in REDIRECTS:
+            self.send_response(302)
+            self.send_header('Location', REDIRECTS[self.path].format(
+                port=self.server.server_port
+            ))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        status, content_type, body = PAGES.get(
+            self.path, (404, 'text/html', '<title>Not found</title>')
+        )
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HeadParserTests(SimpleTestCase):
+    """Test extracting metadata from a page head"""
+
+    def test_parse_head(self):
+        """Test that the title, canonical url and icon are found"""
+        page = metadata.parse_head(PAGES['/page'][2],
+                                   'https://example.com/dir/page')
+
+        self.assertEqual(page, {
+            'page_title': 'Example page',
+            'canonical_url': 'https://example.com/canonical',
+            'favicon_url': 'https://example.com/dir/static/icon.png',
+        })
+
+    def test_parse_head_defaults(self):
+        """Test that pages without links get the default favicon"""
+        page = metadata.parse_head('<p>No head', 'https://example.com/a')
+
+        self.assertEqual(page, {
+            'page_title': '',
+            'canonical_url': '',
+            'favicon_url': 'https://example.com/favicon.ico',
+        })
+
+    def test_interleave_hosts(self):
+        """Test that consecutive urls take turns between hosts"""
+        items = [(1, 'https://a.com/1'), (2, 'https://a.com/2'),
+                 (3, 'https://a.com/3'), (4, 'https://b.com/1')]
+
+        self.assertEqual([pk for pk, url in metadata.interleave_hosts(items)],
+                         [1, 4, 2, 3])
+
+    def test_host_limiter_spaces_requests(self):
+        """Test that requests to one host are spaced out"""
+        async def start_times():
+            limiter = metadata.HostLimiter(0.05)
+            loop = asyncio.get_running_loop()
+            started = []
+
+            async def request(host):
+                await limiter.wait(host)
+                started.append((host, loop.time()))
+
+            await asyncio.gather(request('a'), request('a'), request('b'))
+            return started
+
+        started = asyncio.run(start_times())
+
+        times = {host: [time for name, time in started if name == host]
+                 for host in ('a', 'b')}
+        self.assertGreaterEqual(times['a'][1] - times['a'][0], 0.04)
+        self.assertLess(times['b'][0] - times['a'][0], 0.04)
+
+    def test_public_addresses(self):
+        """Test that only addresses reachable on the internet are
+        public"""
+        for address in ('93.184.216.34', '2606:2800:220:1::1'):
+            self.assertTrue(metadata.is_public_address(address), address)
+        for address in ('127.0.0.1', '10.1.2.3', '172.16.0.1',
+                        '192.168.1.1', '169.254.169.254', '100.64.0.1',
+                        '0.0.0.0', '224.0.0.1', '::1', 'fe80::1%eth0',
+                        'fd00::1', '::ffff:127.0.0.1'):
+            self.assertFalse(metadata.is_public_address(address), address)
+
+
+class FetchMetadataTests(TransactionTestCase):
+    """Test fetching metadata from a local stand-in server"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.paths = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+
+    def create_urlitem(self, path, title='Saved title'):
+        return URLItem.objects.create(title=title or self.base + path,
+                                      url=self.base + path, visits=0,
+                                      user=self.user)
+
+    def fetch(self, **options):
+        options = dict({'host_interval': 0, 'timeout': 5,
+                        'allow_private': True}, **options)
+        return metadata.fetch_metadata(URLItem.objects.all(), **options)
+
+    def test_fetch_metadata(self):
+        """Test that page metadata is fetched and stored"""
+        urlitem = self.create_urlitem('/page')
+
+        self.assertEqual(self.fetch(), 1)
+
+        urlitem.refresh_from_db()
+        self.assertEqual(urlitem.page_title, 'Example page')
+        self.assertEqual(urlitem.canonical_url, self.base + '/canonical')
+        self.assertEqual(urlitem.favicon_url, self.base + '/static/icon.png')
+        self.assertEqual(urlitem.fetch_status, 200)
+        self.assertEqual(urlitem.title, 'Saved title')
+        self.assertIsNotNone(urlitem.fetched)
+        self.assertEqual(self.fetch(), 0)
+
+    def test_fetch_titles_untitled_urlitems(self):
+        """Test that urlitems saved with their url as title take the page
+        title and are searchable by it"""
+        urlitem = self.create_urlitem('/untitled', title=None)
+
+        self.fetch()
+
+        urlitem.refresh_from_db()
+        self.assertEqual(urlitem.title, 'Page without a saved title')
+        self.assertTrue(URLItem.objects.filter(
+            pk=urlitem.pk, search_vector='saved'
+        ).exists())
+
+    def test_fetch_failures(self):
+        """Test that missing, non-HTML and unreachable pages are recorded
+        without metadata"""
+        missing = self.create_urlitem('/missing')
+        text = self.create_urlitem('/notes.txt')
+        unreachable = URLItem.objects.create(
+            title='Closed port', url='http://127.0.0.1:9/', visits=0,
+            user=self.user
+        )
+
+        self.assertEqual(self.fetch(batch_size=2), 3)
+
+        for urlitem in (missing, text, unreachable):
+            urlitem.refresh_from_db()
+            self.assertIsNotNone(urlitem.fetched)
+        self.assertEqual(missing.fetch_status, 404)
+        self.assertEqual(missing.page_title, 'Not found')
+        self.assertEqual((text.fetch_status, text.page_title), (200, ''))
+        self.assertIsNone(unreachable.fetch_status)
+
+    def test_fetch_many_in_batches(self):
+        """Test that results are written back in batches"""
+        for index in range(7):
+            self.create_urlitem(f'/missing/{index}')
+
+        self.assertEqual(self.fetch(concurrency=3, batch_size=2), 7)
+
+        self.assertFalse(URLItem.objects.filter(fetched=None).exists())
+
+    def test_fetch_in_claims(self):
+        """Test that urlitems are claimed a chunk at a time and up to
+        limit"""
+        for index in range(5):
+            self.create_urlitem(f'/missing/{index}')
+
+        self.assertEqual(self.fetch(claim_size=2, limit=3), 3)
+        self.assertEqual(URLItem.objects.filter(fetched=None).count(), 2)
+        self.assertEqual(self.fetch(claim_size=2), 2)
+
+    def test_claimed_urlitems_skipped(self):
+        """Test that urlitems claimed by another fetch are left to it
+        until its lease runs out"""
+        claimed = self.create_urlitem('/page')
+        other = self.create_urlitem('/untitled')
+        self.assertEqual(
+            URLItem.objects.claim_metadata_fetches(1, timedelta(hours=1)),
+            [(claimed.id, claimed.url)]
+        )
+
+        self.assertEqual(self.fetch(), 1)
+
+        claimed.refresh_from_db()
+        other.refresh_from_db()
+        self.assertIsNone(claimed.fetched)
+        self.assertIsNotNone(other.fetched)
+        self.assertEqual(self.server.paths, ['/untitled'])
+
+        URLItem.objects.update(
+            fetch_claimed=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.fetch(), 1)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.page_title, 'Example page')
+
+    def test_private_addresses_refused(self):
+        """Test that hosts that are not public are never connected to"""
+        urlitem = self.create_urlitem('/page')
+
+        self.assertEqual(self.fetch(allow_private=False), 1)
+
+        urlitem.refresh_from_db()
+        self.assertIsNotNone(urlitem.fetched)
+        self.assertIsNone(urlitem.fetch_status)
+        self.assertEqual(urlitem.page_title, '')
+        self.assertEqual(self.server.paths, [])
+
+    def test_private_redirect_refused(self):
+        """Test that the host a redirect leads to is checked as well"""
+        urlitem = self.create_urlitem('/moved')
+        checked = []
+
+        def first_host_public(host):
+            checked.append(host)
+            return len(checked) == 1
+
+        with mock.patch.object(metadata, 'is_public_address',
+                               first_host_public):
+            self.fetch(allow_private=False)
+
+        urlitem.refresh_from_db()
+        self.assertIsNone(urlitem.fetch_status)
+        self.assertEqual(self.server.paths, ['/moved'])
+        self.assertGreater(len(checked), 1)
+
+
+class QueueMetadataFetchTests(TestCase):
+    """Test that saving new urlitems through the api queues a metadata
+    fetch once committed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def queued(self):
+        return list(Job.objects.filter(name='jrnurl.fetch_metadata')
+                    .values_list('args', 'user'))
+
+    def item(self, index):
+        return {'title': f'Item {index}',
+                'url': f'https://example.com/{index}',
+                'visits': 0, 'user': self.user.id}
+
+    def test_create_urlitem(self):
+        """Test that creating a urlitem queues a fetch after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(URLITEM_URL, self.item(1))
+            self.assertEqual(self.queued(), [])
+
+        self.assertEqual(self.queued(), [([self.user.id], self.user.id)])
+
+    def test_create_fetched_urlitem_again(self):
+        """Test that saving a url whose metadata was fetched queues
+        nothing"""
+        URLItem.objects.create(title='Item 1', url='https://example.com/1',
+                               visits=0, user=self.user,
+                               fetched=timezone.now())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(URLITEM_URL, self.item(1))
+
+        self.assertEqual(self.queued(), [])
+
+    def test_nested_create_and_update(self):
+        """Test that creating or replacing the urlitems of a urlcollection
+        queues a fetch, and that updating only its fields does not"""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(URLCOLLECTION_URL, {
+                'name': 'Reading', 'user': self.user.id,
+                'items': [self.item(1), self.item(2)],
+            }, format='json')
+        self.assertEqual(len(self.queued()), 1)
+        url = reverse('jrnurl:urlcollection-detail', args=[res.data['id']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'name': 'Renamed'}, format='json')
+        self.assertEqual(len(self.queued()), 1)
+
+        Job.objects.update(status=Job.RUNNING)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(url, {
+                'name': 'Reading', 'user': self.user.id,
+                'items': [self.item(3)],
+            }, format='json')
+        self.assertEqual(len(self.queued()), 2)
+        self.assertEqual(URLCollection.objects.get().item_count, 1)
+
+    def test_one_waiting_fetch(self):
+        """Test that no fetch is queued while one is waiting to start,
+        which will claim the new urlitems as well"""
+        for index in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(URLITEM_URL, self.item(index))
+
+        self.assertEqual(len(self.queued()), 1)
+
+    def test_bulk_import(self):
+        """Test that a bulk import creating urlitems queues a fetch after
+        commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(URLITEM_BULK_URL, [self.item(1)], format='json')
+            self.assertEqual(self.queued(), [])
+
+        self.assertEqual(len(self.queued()), 1)
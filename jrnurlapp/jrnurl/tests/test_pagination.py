@@ -0,0 +1,117 @@
+from base64 import b64encode
+from urllib.parse import urlencode
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+
+
+class KeysetPaginationTests(TestCase):
+    """Test the keyset pagination of the jrnurl list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+        # Duplicate titles force the pagination onto the id tiebreaker
+        for index in range(7):
+            URLItem.objects.create(
+                title=f'Item {index // 3}',
+                url=f'https://example.com/{index}',
+                visits=1,
+                user=self.user
+            )
+        self.expected = [
+            str(pk) for pk in URLItem.objects.filter(
+                user=self.user
+            ).order_by('title', 'id').values_list('id', flat=True)
+        ]
+
+    def walk(self, url, link):
+        """Follow the given pagination link until it runs out"""
+        ids = []
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            page = [item['id'] for item in res.data['results']]
+            ids = page + ids if link == 'previous' else ids + page
+            url = res.data[link]
+        return ids, res
+
+    def test_walk_forward_through_all_pages(self):
+        """Test following next links returns every row exactly once"""
+        ids, res = self.walk(f'{URLITEM_URL}?page_size=2', 'next')
+
+        self.assertEqual(ids, self.expected)
+        self.assertIsNotNone(res.data['previous'])
+
+    def test_walk_backward_through_all_pages(self):
+        """Test following previous links from the last page returns
+        every row in order"""
+        url = f'{URLITEM_URL}?page_size=2'
+        while True:
+            res = self.client.get(url)
+            if not res.data['next']:
+                break
+            url = res.data['next']
+
+        ids, res = self.walk(res.data['previous'], 'previous')
+        last_page = self.expected[len(ids):]
+
+        self.assertEqual(ids + last_page, self.expected)
+        self.assertIsNone(res.data['previous'])
+
+    def test_first_page_has_no_previous_link(self):
+        """Test that the first page only links forward"""
+        res = self.client.get(f'{URLITEM_URL}?page_size=3')
+
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertIsNone(res.data['previous'])
+        self.assertIsNotNone(res.data['next'])
+
+    def test_invalid_cursor(self):
+        """Test that a cursor not matching the ordering is rejected"""
+        cursor = b64encode(b'p=%5B%22Item%22%5D').decode('ascii')
+        res = self.client.get(f'{URLITEM_URL}?cursor={cursor}')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor_position(self):
+        """Test that a well formed cursor whose position holds values the
+        ordering fields cannot take is rejected"""
+        for url, position in (
+            (URLITEM_URL, '["Item", "not-a-uuid"]'),
+            (URLITEM_URL, '["Item", {"id": 1}]'),
+            (f'{URLCOLLECTION_URL}?ordering=-item_count',
+             f'["many", "{self.expected[0]}"]'),
+            (f'{URLCOLLECTION_URL}?ordering=-last_item_added',
+             f'["yesterday", "{self.expected[0]}"]'),
+        ):
+            cursor = b64encode(
+                urlencode({'p': position}).encode('ascii')
+            ).decode('ascii')
+            separator = '&' if '?' in url else '?'
+
+            res = self.client.get(f'{url}{separator}cursor={cursor}')
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND,
+                             position)
+
+    def test_urlcollection_ordered_by_name(self):
+        """Test that urlcollections are paged in name order"""
+        for name in ('Charlie', 'Alpha', 'Bravo'):
+            URLCollection.objects.create(name=name, user=self.user)
+
+        ids, res = self.walk(f'{URLCOLLECTION_URL}?page_size=1', 'next')
+        names = [URLCollection.objects.get(id=pk).name for pk in ids]
+
+        self.assertEqual(names, ['Alpha', 'Bravo', 'Charlie'])
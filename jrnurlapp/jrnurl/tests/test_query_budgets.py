@@ -0,0 +1,124 @@
+import os
+from itertools import count
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+from core.tests.query_budget import QueryBudgetMixin
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test that the hot API paths stay within their query budgets and do
+    not run more queries as the journal grows"""
+    query_budget_file = os.path.join(os.path.dirname(__file__),
+                                     'query_budgets.json')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.numbers = count()
+
+    def create_urlitem(self, collections=()):
+        number = next(self.numbers)
+        urlitem = URLItem.objects.create(
+            title=f'Python item {number}',
+            url=f'https://example.com/{number}', visits=number,
+            tags=['python', f'tag{number % 3}'], user=self.user
+        )
+        for urlcollection in collections:
+            urlcollection.items.add(urlitem,
+                                    through_defaults={'user': self.user})
+        return urlitem
+
+    def create_urlitems(self, rows, collections=()):
+        for _ in range(rows):
+            self.create_urlitem(collections)
+
+    def create_urlcollections(self, rows):
+        for _ in range(rows):
+            urlcollection = URLCollection.objects.create(
+                name=f'Collection {next(self.numbers)}', tags=['python'],
+                user=self.user
+            )
+            self.create_urlitems(2, [urlcollection])
+
+    def get(self, path, **params):
+        return lambda: self.client.get(path, params)
+
+    def results(self, response):
+        return len(response.data['results'])
+
+    def test_urlcollection_list(self):
+        """Test listing urlcollections with their item counts"""
+        self.assertQueryBudget('urlcollection.list', self.get(
+            URLCOLLECTION_URL
+        ), self.create_urlcollections, count=self.results)
+
+    def test_urlcollection_list_expanded(self):
+        """Test listing urlcollections with their urlitems embedded"""
+        self.assertQueryBudget('urlcollection.list?expand=items', self.get(
+            URLCOLLECTION_URL, expand='items'
+        ), self.create_urlcollections, count=self.results)
+
+    def test_urlcollection_retrieve(self):
+        """Test retrieving a urlcollection with its urlitems"""
+        urlcollection = URLCollection.objects.create(name='Collection',
+                                                     user=self.user)
+        self.assertQueryBudget('urlcollection.retrieve', self.get(
+            reverse('jrnurl:urlcollection-detail', args=[urlcollection.id])
+        ), lambda rows: self.create_urlitems(rows, [urlcollection]),
+            count=lambda response: len(response.data['items']))
+
+    def test_urlitem_list(self):
+        """Test listing urlitems"""
+        self.assertQueryBudget('urlitem.list', self.get(URLITEM_URL),
+                               self.create_urlitems, count=self.results)
+
+    def test_urlitem_list_by_tag(self):
+        """Test listing urlitems filtered by tag"""
+        self.assertQueryBudget('urlitem.list?tags__any', self.get(
+            URLITEM_URL, tags__any='python'
+        ), self.create_urlitems, count=self.results)
+
+    def test_urlitem_search(self):
+        """Test searching urlitems"""
+        self.assertQueryBudget('urlitem.search', self.get(
+            reverse('jrnurl:urlitem-search'), q='python'
+        ), self.create_urlitems, count=self.results)
+
+    def test_tags(self):
+        """Test counting tags"""
+        self.assertQueryBudget('tags', self.get(reverse('jrnurl:tags')),
+                               self.create_urlitems,
+                               count=lambda response:
+                               response.data['results'][0]['count'])
+
+    def test_lookup(self):
+        """Test looking up a urlitem held by many urlcollections"""
+        urlitem = self.create_urlitem()
+
+        def add_collections(rows):
+            for _ in range(rows):
+                urlcollection = URLCollection.objects.create(
+                    name=f'Collection {next(self.numbers)}', user=self.user
+                )
+                urlcollection.items.add(urlitem,
+                                        through_defaults={'user': self.user})
+
+        self.assertQueryBudget('lookup', self.get(
+            reverse('jrnurl:lookup'), url=urlitem.url
+        ), add_collections,
+            count=lambda response: len(response.data['collections']))
+
+    def test_export(self):
+        """Test exporting the journal"""
+        self.assertQueryBudget('export', self.get(reverse('jrnurl:export')),
+                               self.create_urlcollections)
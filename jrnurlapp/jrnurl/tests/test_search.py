@@ -0,0 +1,122 @@
+import json
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import URLItem
+
+URLITEM_SEARCH_URL = reverse('jrnurl:urlitem-search')
+URLITEM_BULK_URL = reverse('jrnurl:urlitem-bulk-import')
+
+
+class SearchApiTests(TestCase):
+    """Test the urlitem full text search endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_urlitem(self, title, url, tags=None, user=None):
+        return URLItem.objects.create(title=title, url=url, visits=1,
+                                      tags=tags, user=user or self.user)
+
+    def search(self, terms):
+        return self.client.get(URLITEM_SEARCH_URL, {'q': terms})
+
+    def test_search_title_is_stemmed(self):
+        """Test that title words match other forms of the same word"""
+        urlitem = self.create_urlitem('Browsers supporting HTML5',
+                                      'https://html5test.com')
+        self.create_urlitem('Google Search', 'http://google.com')
+
+        res = self.search('browser support')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [str(urlitem.id)])
+        self.assertIn('<mark>', res.data['results'][0]['headline'])
+
+    def test_headline_escaped(self):
+        """Test that markup in titles is escaped in the headline, around
+        the matches marked up"""
+        self.create_urlitem('<img src=x onerror=alert(1)> Tutorial \x02',
+                            'https://example.com')
+        self.create_urlitem('<script>alert(1)</script> Tutorial',
+                            'https://example.org')
+
+        res = self.search('tutorial')
+
+        headlines = sorted(result['headline']
+                           for result in res.data['results'])
+        self.assertEqual(headlines, [
+            ' alert(1)  <mark>Tutorial</mark>',
+            '&lt;img src=x onerror=alert(1)&gt; <mark>Tutorial</mark> ',
+        ])
+
+    def test_search_url_host_and_path(self):
+        """Test that words in the url host and path are searchable"""
+        urlitem = self.create_urlitem(
+            'Tryit Editor v3.6',
+            'https://www.w3schools.com/html/tryit.asp?filename=tryhtml_intro'
+        )
+
+        for terms in ('w3schools', 'tryhtml_intro', 'html'):
+            res = self.search(terms)
+            self.assertEqual([item['id'] for item in res.data['results']],
+                             [str(urlitem.id)], terms)
+
+        res = self.search('https')
+        self.assertEqual(res.data['results'], [])
+
+    def test_search_tags_and_ranking(self):
+        """Test that tags are searchable and title matches rank first"""
+        tagged = self.create_urlitem('Example', 'https://example.com',
+                                     tags=['python'])
+        titled = self.create_urlitem('Python documentation',
+                                     'https://docs.python.org')
+
+        res = self.search('python')
+
+        self.assertEqual([item['id'] for item in res.data['results']],
+                         [str(titled.id), str(tagged.id)])
+        self.assertGreater(res.data['results'][0]['rank'],
+                           res.data['results'][1]['rank'])
+
+    def test_search_vector_updated_on_save(self):
+        """Test that editing a urlitem re-indexes it"""
+        urlitem = self.create_urlitem('Google Search', 'http://google.com')
+        urlitem.title = 'Search engine'
+        urlitem.save()
+
+        self.assertEqual(len(self.search('engine').data['results']), 1)
+
+    def test_search_finds_bulk_imported_urlitems(self):
+        """Test that urlitems inserted by the bulk import are indexed"""
+        body = json.dumps({'title': 'Bulk imported page',
+                           'url': 'https://example.com/imported'})
+        self.client.post(URLITEM_BULK_URL, body,
+                         content_type='application/x-ndjson')
+
+        self.assertEqual(len(self.search('imported').data['results']), 1)
+
+    def test_search_limited_to_user(self):
+        """Test that other users' urlitems are not returned"""
+        other_user = get_user_model().objects.create_user(
+            'otheruser@testdomain.com',
+            'test1234'
+        )
+        self.create_urlitem('Google Search', 'http://google.com',
+                            user=other_user)
+
+        self.assertEqual(self.search('google').data['results'], [])
+
+    def test_search_requires_query(self):
+        """Test that a search without terms is rejected"""
+        res = self.search('')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
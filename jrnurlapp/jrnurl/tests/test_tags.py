@@ -0,0 +1,104 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import URLCollection, URLItem
+
+URLCOLLECTION_URL = reverse('jrnurl:urlcollection-list')
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+TAGS_URL = reverse('jrnurl:tags')
+
+
+class TagApiTests(TestCase):
+    """Test tag filtering and tag facet counts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+        self.python = self.create_urlitem('Python', ['python', 'docs'])
+        self.django = self.create_urlitem('Django', ['python', 'web'])
+        self.html = self.create_urlitem('HTML5test', ['web'])
+
+    def create_urlitem(self, title, tags, user=None):
+        return URLItem.objects.create(
+            title=title,
+            url=f'https://example.com/{title.lower()}',
+            visits=1,
+            tags=tags,
+            user=user or self.user
+        )
+
+    def titles(self, res):
+        return [item['title'] for item in res.data['results']]
+
+    def test_filter_urlitems_by_all_tags(self):
+        """Test that tags__all keeps urlitems with every listed tag"""
+        res = self.client.get(URLITEM_URL, {'tags__all': 'python,web'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.titles(res), ['Django'])
+
+    def test_filter_urlitems_by_any_tag(self):
+        """Test that tags__any keeps urlitems with one of the listed tags"""
+        res = self.client.get(URLITEM_URL, {'tags__any': 'docs,web'})
+
+        self.assertEqual(self.titles(res), ['Django', 'HTML5test', 'Python'])
+
+    def test_filter_urlcollections_by_tags(self):
+        """Test that urlcollections can be filtered by tag"""
+        URLCollection.objects.create(name='Reading', tags=['python'],
+                                     user=self.user)
+        URLCollection.objects.create(name='Games', tags=['fun'],
+                                     user=self.user)
+
+        res = self.client.get(URLCOLLECTION_URL, {'tags__all': 'python'})
+
+        self.assertEqual([c['name'] for c in res.data['results']],
+                         ['Reading'])
+
+    def test_tag_counts(self):
+        """Test that tag counts are computed over the user's urlitems"""
+        other_user = get_user_model().objects.create_user(
+            'otheruser@testdomain.com',
+            'test1234'
+        )
+        self.create_urlitem('Other', ['web', 'web2'], user=other_user)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'tag': 'python', 'count': 2},
+            {'tag': 'web', 'count': 2},
+            {'tag': 'docs', 'count': 1},
+        ])
+
+    def test_tag_counts_drill_down(self):
+        """Test that tag counts respect the tag filters"""
+        res = self.client.get(TAGS_URL, {'tags__all': 'web', 'limit': 1})
+
+        self.assertEqual(res.data['results'], [{'tag': 'web', 'count': 2}])
+
+    def test_tag_counts_for_urlcollections(self):
+        """Test counting the tags of the user's urlcollections"""
+        URLCollection.objects.create(name='Reading', tags=['python', 'web'],
+                                     user=self.user)
+
+        res = self.client.get(TAGS_URL, {'scope': 'collections'})
+
+        self.assertEqual(res.data['results'], [
+            {'tag': 'python', 'count': 1},
+            {'tag': 'web', 'count': 1},
+        ])
+
+    def test_tag_counts_invalid_scope(self):
+        """Test that an unknown scope is rejected"""
+        res = self.client.get(TAGS_URL, {'scope': 'users'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,132 @@
+import uuid
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import URLItem
+from jrnurl import visits
+
+URLITEM_URL = reverse('jrnurl:urlitem-list')
+
+
+def visit_url(pk):
+    return reverse('jrnurl:urlitem-visit', args=[pk])
+
+
+class VisitApiTests(TestCase):
+    """Test counting urlitem visits"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.urlitem = URLItem.objects.create(
+            title='Google Search',
+            url='http://google.com',
+            visits=1,
+            user=self.user
+        )
+
+    def test_visit_increments_atomically(self):
+        """Test that a visit is counted with a single UPDATE"""
+        modified = self.urlitem.modified
+
+        with self.assertNumQueries(1):
+            res = self.client.post(visit_url(self.urlitem.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.urlitem.refresh_from_db()
+        self.assertEqual(self.urlitem.visits, 2)
+        self.assertGreater(self.urlitem.modified, modified)
+
+    def test_visit_invalidates_cached_list(self):
+        """Test that the new visit count shows up in the list"""
+        self.client.get(URLITEM_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(visit_url(self.urlitem.id))
+
+        res = self.client.get(URLITEM_URL)
+
+        self.assertEqual(res.data['results'][0]['visits'], 2)
+
+    def test_visit_unknown_urlitem(self):
+        """Test that other users' and unknown urlitems are not found"""
+        other_user = get_user_model().objects.create_user(
+            'otheruser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(other_user)
+
+        for pk in (self.urlitem.id, uuid.uuid4(), 'not-a-uuid'):
+            res = self.client.post(visit_url(pk))
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.urlitem.refresh_from_db()
+        self.assertEqual(self.urlitem.visits, 1)
+
+
+@override_settings(JRNURL_VISIT_FLUSH_INTERVAL=60)
+@mock.patch('jrnurl.visits._start_flusher')
+class BufferedVisitTests(TestCase):
+    """Test buffering visits in memory and writing them in batches"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(visits._pending.clear)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'testuser@testdomain.com',
+            'test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.urlitems = [
+            URLItem.objects.create(title=f'Page {index}',
+                                   url=f'https://example.com/{index}',
+                                   visits=1, user=self.user)
+            for index in range(3)
+        ]
+
+    def test_visits_buffered_until_flush(self, start_flusher):
+        """Test that visits are only written when flushed"""
+        for urlitem in self.urlitems:
+            for _ in range(2):
+                self.client.post(visit_url(urlitem.id))
+        start_flusher.assert_called()
+        self.assertEqual(
+            {urlitem.visits for urlitem in URLItem.objects.all()}, {1}
+        )
+
+        with self.assertNumQueries(1):
+            counts = visits.flush()
+
+        self.assertEqual(sum(counts.values()), 6)
+        self.assertEqual(
+            {urlitem.visits for urlitem in URLItem.objects.all()}, {3}
+        )
+
+    def test_visit_unknown_urlitem_not_buffered(self, start_flusher):
+        """Test that visits of unknown urlitems are rejected up front"""
+        res = self.client.post(visit_url(uuid.uuid4()))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(visits.flush(), {})
+
+    def test_failed_flush_keeps_visits(self, start_flusher):
+        """Test that visits survive a failed write"""
+        self.client.post(visit_url(self.urlitems[0].id))
+
+        with mock.patch.object(URLItem.objects, 'add_visits',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                visits.flush()
+        visits.flush()
+
+        self.urlitems[0].refresh_from_db()
+        self.assertEqual(self.urlitems[0].visits, 2)
@@ -8,7 +8,13 @@ router = DefaultRouter()
 router.register('urlcollection', views.URLCollectionViewSet)
 # router.register('urlcollection/<uuid:pk>', views.URLCollectionDetail)
 router.register('urlitem', views.URLItemViewSet)
+router.register('jobs', views.JobViewSet)
 
 urlpatterns = [
+    path('tags/', views.TagFacetView.as_view(), name='tags'),
+    path('lookup/', views.URLLookupView.as_view(), name='lookup'),
+    path('export/', views.JournalExportView.as_view(), name='export'),
+    path('import/bookmarks/', views.BookmarkImportView.as_view(),
+         name='import-bookmarks'),
     path('', include(router.urls))
 ]
@@ -1,29 +1,292 @@
-from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
+import os
+import shutil
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, \
+    SearchRank
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Replace
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import generics, mixins, status, views, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
-from core.models import URLCollection, URLItem
-from . import serializers
+from rest_framework.response import Response
+from core.models import Job, URLCollection, URLItem
+from user.authentication import CachedTokenAuthentication
+from . import bookmarks, bulk, export, filters, lookup, pagination, \
+    parsers, serializers, tasks, visits
+from .async_views import AsyncReadMixin
+from .mixins import CachedListMixin, ConditionalRetrieveMixin
 
 
-class URLCollectionViewSet(viewsets.ModelViewSet):
+def queue_metadata_fetch(user):
+    """Fetch page metadata for the user's new urlitems once the request's
+    writes are committed, unless a fetch that has not started yet will
+    claim them anyway"""
+    def queue():
+        waiting = Job.objects.filter(name=tasks.fetch_metadata.name,
+                                     user=user, status=Job.QUEUED)
+        if not waiting.exists():
+            tasks.fetch_metadata.delay(user.id, user=user)
+
+    transaction.on_commit(queue)
+
+
+class URLCollectionViewSet(AsyncReadMixin, CachedListMixin,
+                           ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """Manage URLCollections in the database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = URLCollection.objects.all()
     serializer_class = serializers.URLCollectionSerializer
+    pagination_class = pagination.URLCollectionPagination
+    filter_backends = (filters.TagFilter,)
+    conditional_relations = ('items',)
+
+    def get_queryset(self):
+        """Return the authenticated user's urlcollections with their
+        urlitems fetched in a single extra query.
+
+        Lists give the item_count kept on every urlcollection instead and
+        only fetch the urlitems when they are to be embedded."""
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == 'list' and \
+                not serializers.URLCollectionListSerializer.expands_items(
+                    self.request):
+            return queryset
+        return queryset.prefetch_related('items')
+
+    def get_serializer_class(self):
+        """Use the compact serializer for lists"""
+        if self.action == 'list':
+            return serializers.URLCollectionListSerializer
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new object"""
         serializer.save(user=self.request.user)
+        if serializer.validated_data.get('items'):
+            queue_metadata_fetch(self.request.user)
 
+    def perform_update(self, serializer):
+        """Update an object, fetching metadata for new nested urlitems"""
+        serializer.save()
+        if serializer.validated_data.get('items'):
+            queue_metadata_fetch(self.request.user)
 
-class URLItemViewSet(viewsets.ModelViewSet):
+
+class URLItemViewSet(AsyncReadMixin, CachedListMixin,
+                     ConditionalRetrieveMixin, viewsets.ModelViewSet):
     """Manage URLItems in the database"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = URLItem.objects.all()
     serializer_class = serializers.URLItemSerializer
+    pagination_class = pagination.URLItemPagination
+    filter_backends = (filters.TagFilter, filters.LinkHealthFilter)
+
+    def get_queryset(self):
+        """Return the authenticated user's urlitems"""
+        return self.queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         """Create a new object"""
-        serializer.save(user=self.request.user)
+        urlitem = serializer.save(user=self.request.user)
+        if urlitem.fetched is None:
+            queue_metadata_fetch(self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='bulk',
+            parser_classes=(parsers.NDJSONParser, parsers.CSVParser,
+                            JSONParser))
+    def bulk_import(self, request):
+        """Import many urlitems from an NDJSON, CSV or JSON array body"""
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = [rows] if rows else []
+        elif not isinstance(rows, (list, Iterator)):
+            # NDJSON and CSV bodies parse lazily into iterators of rows
+            raise ValidationError(
+                {'non_field_errors': ['Expected a list of urlitems.']}
+            )
+
+        results = list(bulk.import_urlitems(request.user, rows))
+        counts = Counter(result['status'] for result in results)
+        if counts[bulk.CREATED]:
+            queue_metadata_fetch(request.user)
+
+        return Response({
+            'created': counts[bulk.CREATED],
+            'exists': counts[bulk.EXISTS],
+            'invalid': counts[bulk.INVALID],
+            'results': results,
+        })
+
+    @action(detail=True, methods=['post'])
+    def visit(self, request, pk=None):
+        """Count a visit of the urlitem"""
+        if not visits.record_visit(request.user, pk):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full text search the user's urlitems by title, url and tags"""
+        terms = request.query_params.get('q', '').strip()
+        if not terms:
+            raise ValidationError({'q': ['This query parameter is required.']})
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+
+        # Titles and tags are stemmed but url words are not, so match the
+        # terms both ways
+        headline = serializers.HeadlineField
+        query = SearchQuery(terms, config='english', search_type='websearch') \
+            | SearchQuery(terms, config='simple', search_type='websearch')
+        urlitems = self.get_queryset().filter(
+            search_vector=query
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            # Matches are marked up by the serializer once the title is
+            # escaped, between delimiters no title can hold
+            headline=SearchHeadline(
+                Replace(Replace('title', Value(headline.HEADLINE_START)),
+                        Value(headline.HEADLINE_STOP)),
+                query, config='english', start_sel=headline.HEADLINE_START,
+                stop_sel=headline.HEADLINE_STOP
+            )
+        ).order_by('-rank', 'id')[:max(limit, 1)]
+
+        serializer = serializers.URLItemSearchSerializer(urlitems, many=True)
+        return Response({'results': serializer.data})
+
+
+class TagFacetView(generics.GenericAPIView):
+    """Count how often each tag is used by the authenticated user"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    filter_backends = (filters.TagFilter,)
+    scopes = {
+        'items': URLItem.objects.all(),
+        'collections': URLCollection.objects.all(),
+    }
+
+    def get_queryset(self):
+        scope = self.request.query_params.get('scope', 'items')
+        if scope not in self.scopes:
+            raise ValidationError(
+                {'scope': [f'Must be one of: {", ".join(self.scopes)}.']}
+            )
+        return self.scopes[scope].filter(user=self.request.user)
+
+    def get(self, request):
+        """Return tag counts, optionally within a tags__all/tags__any
+        drill down"""
+        try:
+            limit = min(int(request.query_params.get('limit', 100)), 1000)
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response({'results': [
+            {'tag': tag, 'count': count}
+            for tag, count in queryset.tag_counts(limit=max(limit, 1))
+        ]})
+
+
+class URLLookupView(views.APIView):
+    """Find whether the authenticated user saved a url, and where"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Return the urlitem saved for ?url= in its canonical form and
+        the collections holding it"""
+        url = request.query_params.get('url', '').strip()
+        if not url:
+            raise ValidationError(
+                {'url': ['This query parameter is required.']}
+            )
+        return Response(lookup.lookup(request.user, url))
+
+
+class JournalExportView(views.APIView):
+    """Stream an export of the authenticated user's whole journal"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        """Return the journal as NDJSON or, with ?output=json, as a single
+        JSON document, gzip compressed with ?gzip=1"""
+        output_format = request.query_params.get('output', export.NDJSON)
+        if output_format not in export.FORMATS:
+            raise ValidationError(
+                {'output': [f'Must be one of: {", ".join(export.FORMATS)}.']}
+            )
+        gzip = request.query_params.get('gzip') in ('1', 'true')
+
+        chunks = export.export_journal(request.user, output_format, gzip)
+        content_type = 'application/gzip' if gzip \
+            else export.FORMATS[output_format]
+        if isinstance(request._request, ASGIRequest):
+            # Streamed responses would read the database in the event loop
+            response = FileResponse(export.spooled(chunks),
+                                    content_type=content_type)
+        else:
+            response = StreamingHttpResponse(chunks,
+                                             content_type=content_type)
+        filename = f'journal.{output_format}{".gz" if gzip else ""}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class BookmarkImportView(views.APIView):
+    """Queue the import of an uploaded browser bookmark or history export"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        """Store the export uploaded as "file" and return the job that
+        imports it"""
+        upload = request.data.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        source = request.data.get('source') or None
+        if source is not None and source not in bookmarks.READERS:
+            raise ValidationError({'source': [
+                f'Must be one of: {", ".join(sorted(bookmarks.READERS))}.'
+            ]})
+
+        os.makedirs(settings.JRNURL_IMPORT_DIR, exist_ok=True)
+        path = os.path.join(settings.JRNURL_IMPORT_DIR, uuid.uuid4().hex)
+        with open(path, 'wb') as stored:
+            shutil.copyfileobj(upload, stored)
+
+        job = tasks.import_bookmarks.delay(request.user.id, path, source,
+                                           user=request.user)
+        serializer = serializers.JobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': reverse(
+                            'jrnurl:job-detail', args=[job.id]
+                        )})
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Report the status of the authenticated user's background jobs"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    queryset = Job.objects.all()
+    serializer_class = serializers.JobSerializer
+
+    def get_queryset(self):
+        """Return the authenticated user's jobs"""
+        return self.queryset.filter(user=self.request.user)
@@ -0,0 +1,97 @@
+"""Visit counting for urlitems.
+
+With JRNURL_VISIT_FLUSH_INTERVAL set to 0 every visit is written straight
+away with an atomic UPDATE. Otherwise visits are counted in memory and a
+background thread of each process writes them every that many seconds in
+one batched UPDATE; visits counted since the last flush are lost if the
+process is killed.
+"""
+import atexit
+import logging
+import threading
+import uuid
+from collections import Counter
+from django.conf import settings
+from django.db import close_old_connections
+from core.models import URLItem
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+_pending = Counter()
+_lock = threading.Lock()
+_flusher = None
+
+
+def record_visit(user, pk):
+    """Count a visit of the user's urlitem pk.
+
+    Returns False if the user has no such urlitem."""
+    try:
+        pk = uuid.UUID(str(pk))
+    except ValueError:
+        return False
+    urlitems = URLItem.objects.filter(user=user, pk=pk)
+
+    if not settings.JRNURL_VISIT_FLUSH_INTERVAL:
+        if not urlitems.visit():
+            return False
+        cache.bump_version(user.id)
+        return True
+
+    if not urlitems.exists():
+        return False
+    with _lock:
+        _pending[pk] += 1
+    _start_flusher()
+    return True
+
+
+def flush():
+    """Write the buffered visits to the database in one UPDATE"""
+    with _lock:
+        counts = dict(_pending)
+        _pending.clear()
+    if not counts:
+        return counts
+    try:
+        user_ids = URLItem.objects.add_visits(counts)
+    except Exception:
+        # Keep the visits for the next attempt
+        with _lock:
+            _pending.update(counts)
+        raise
+    cache.bump_version(*user_ids)
+    return counts
+
+
+def _flush_forever(interval, stop):
+    while not stop.wait(interval):
+        try:
+            flush()
+        except Exception:
+            logger.exception('Failed to write buffered visits')
+        finally:
+            close_old_connections()
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        stop = threading.Event()
+        _flusher = threading.Thread(
+            target=_flush_forever,
+            args=(settings.JRNURL_VISIT_FLUSH_INTERVAL, stop),
+            name='visit-flusher', daemon=True
+        )
+        _flusher.start()
+        atexit.register(_stop_flusher, stop)
+
+
+def _stop_flusher(stop):
+    stop.set()
+    flush()
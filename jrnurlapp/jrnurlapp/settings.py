@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from . import secrets
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,9 +48,11 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'core.apps.CoreConfig',
     'user.apps.UserConfig',
+    'jrnurl.apps.JrnurlConfig',
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -106,20 +109,116 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'jrnurlapp.wsgi.application'
 
+# Set by jrnurlapp.asgi: serve the jrnurl list/retrieve views as coroutines
+# that run concurrently in a thread pool
+JRNURL_ASYNC_VIEWS = os.environ.get('JRNURL_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds and health checked
+# before reuse. DB_POOL_SIZE > 0 additionally shares up to that many
+# connections per process between threads (see core.backends.postgresql),
+# handing them back at the end of each request instead of keeping them.
+# Set DB_PGBOUNCER=1 when connecting through PgBouncer in transaction
+# pooling mode, which does not support server-side cursors.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.environ.get('DB_PGBOUNCER') == '1'
+        ),
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_SIZE', 0)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Local memory by default, which only suits a single process; point
+# CACHE_BACKEND/CACHE_LOCATION at a cache shared by every web and job
+# worker (docker-compose.yml runs memcached with PyMemcacheCache) so they
+# all see the same invalidations. `check --deploy` warns about, and
+# gunicorn.conf.py refuses to start several workers with, a local cache.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'jrnurl'),
     }
 }
 
+JRNURL_CACHE_TIMEOUT = int(os.environ.get('JRNURL_CACHE_TIMEOUT', 300))
+
+# Answers of the url lookup endpoint kept in each process (see
+# jrnurl.lookup); a change to the user's journal retires them at once
+JRNURL_LOOKUP_CACHE_SIZE = int(
+    os.environ.get('JRNURL_LOOKUP_CACHE_SIZE', 10000)
+)
+JRNURL_LOOKUP_CACHE_TIMEOUT = int(
+    os.environ.get('JRNURL_LOOKUP_CACHE_TIMEOUT', 300)
+)
+
+# Seconds between batched writes of urlitem visits; 0 writes every visit
+# straight away (see jrnurl.visits)
+JRNURL_VISIT_FLUSH_INTERVAL = float(
+    os.environ.get('JRNURL_VISIT_FLUSH_INTERVAL', 0)
+)
+
+# Saved links are checked every this many days, visited ones at least
+# this soon after a visit (see jrnurl.links)
+JRNURL_LINK_CHECK_DAYS = float(os.environ.get('JRNURL_LINK_CHECK_DAYS', 30))
+JRNURL_LINK_CHECK_VISITED_DAYS = float(
+    os.environ.get('JRNURL_LINK_CHECK_VISITED_DAYS', 1)
+)
+
+# Background jobs are run by `manage.py run_workers` (see core.jobs)
+JOBS_BROKER = os.environ.get('JOBS_BROKER', 'core.jobs.DatabaseBroker')
+JOBS_BROKER_URL = os.environ.get('JOBS_BROKER_URL', 'redis://localhost:6379/0')
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1))
+# Seconds after which a running job whose worker stopped renewing its
+# lease is run again
+JOBS_LEASE = int(os.environ.get('JOBS_LEASE', 300))
+
+# Uploaded bookmark exports wait here for the job that imports them
+JRNURL_IMPORT_DIR = os.environ.get(
+    'JRNURL_IMPORT_DIR', os.path.join(tempfile.gettempdir(), 'jrnurl-imports')
+)
+
+# Authenticated tokens are kept in the cache, when every process shares it,
+# and for a few seconds in a bounded per-process LRU in front of it
+USER_TOKEN_CACHE_TIMEOUT = int(
+    os.environ.get('USER_TOKEN_CACHE_TIMEOUT', 300)
+)
+USER_TOKEN_LOCAL_CACHE_TIMEOUT = int(
+    os.environ.get('USER_TOKEN_LOCAL_CACHE_TIMEOUT', 5)
+)
+USER_TOKEN_LOCAL_CACHE_SIZE = int(
+    os.environ.get('USER_TOKEN_LOCAL_CACHE_SIZE', 1024)
+)
+
+# Per-view query count and latency histograms on /metrics, and the
+# X-Profile breakdown for staff users (see core.profiling). /metrics is
+# served to staff users and to scrapers sending METRICS_TOKEN as a bearer
+# token.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -159,4 +258,9 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-AUTH_USER_MODEL = 'core.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'core.User'
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'jrnurl.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
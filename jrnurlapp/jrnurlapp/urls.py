@@ -14,9 +14,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core import views as core_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', core_views.metrics, name='metrics'),
     path('api/user/', include('user.urls')),
     path('api/jrnurl/', include('jrnurl.urls')),
 ]
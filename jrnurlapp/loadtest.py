@@ -0,0 +1,141 @@
+"""Load test a jrnurl API endpoint with many concurrent keep-alive clients.
+
+Compare the synchronous WSGI and the ASGI serving modes by starting the
+application both ways with the same number of worker processes
+
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py
+    WEB_CONCURRENCY=4 ASGI=1 gunicorn -c gunicorn.conf.py
+
+and running the same test against each of them, e.g.
+
+    python loadtest.py http://localhost:8000/api/jrnurl/urlitem/ \\
+        --token <token> --clients 200 --duration 30 --send-delay 0.2
+
+--send-delay makes every client pause half way through sending each
+request, like a mobile client on a slow link. Only the standard library
+is used so the script runs from any machine.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def build_request(url, token):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    headers = [
+        f'GET {path} HTTP/1.1',
+        f'Host: {parts.netloc}',
+        'Accept: application/json',
+        'Connection: keep-alive',
+    ]
+    if token:
+        headers.append(f'Authorization: Token {token}')
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1')
+
+
+async def fetch(reader, writer, request, send_delay):
+    """Send one request and read its response, returning
+    (status, keep_alive)"""
+    if send_delay:
+        half = len(request) // 2
+        writer.write(request[:half])
+        await writer.drain()
+        await asyncio.sleep(send_delay)
+        request = request[half:]
+    writer.write(request)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = None
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+
+    if length is None:
+        await reader.read()
+        keep_alive = False
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def client(url, request, deadline, send_delay, results):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    writer = None
+    while time.monotonic() < deadline:
+        if writer is None:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    parts.hostname, port, ssl=parts.scheme == 'https'
+                )
+            except OSError:
+                results.append((None, 0.0))
+                await asyncio.sleep(0.1)
+                continue
+        start = time.monotonic()
+        try:
+            status, keep_alive = await fetch(reader, writer, request,
+                                             send_delay)
+        except (OSError, asyncio.IncompleteReadError, IndexError,
+                ValueError):
+            status, keep_alive = None, False
+        results.append((status, time.monotonic() - start))
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(args):
+    request = build_request(args.url, args.token)
+    results = []
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        client(args.url, request, deadline, args.send_delay, results)
+        for _ in range(args.clients)
+    ))
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(latency for status, latency in results
+                       if status == 200)
+    errors = len(results) - len(latencies)
+    print(f'clients       {args.clients}')
+    print(f'requests      {len(results)} ({errors} failed)')
+    print(f'throughput    {len(latencies) / elapsed:.1f} req/s')
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f'latency p50   {quantiles[49] * 1000:.1f} ms')
+        print(f'latency p95   {quantiles[94] * 1000:.1f} ms')
+        print(f'latency p99   {quantiles[98] * 1000:.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('url')
+    parser.add_argument('--token', help='API token of the test user')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds to run for')
+    parser.add_argument('--send-delay', type=float, default=0,
+                        help='seconds each client stalls mid-request')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from core.checks import cache_is_shared
+
+TOKEN_KEY = 'user:token-user:{digest}'
+
+
+class LRUCache:
+    """A small thread safe in-process cache with a TTL and a size bound"""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_tokens = LRUCache(settings.USER_TOKEN_LOCAL_CACHE_SIZE,
+                        settings.USER_TOKEN_LOCAL_CACHE_TIMEOUT)
+
+
+def _cache_key(key):
+    # Tokens are credentials, so only a digest of them is used as a key
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return TOKEN_KEY.format(digest=digest)
+
+
+def _user_fields():
+    # The password hash is never cached
+    return [field.attname
+            for field in get_user_model()._meta.concrete_fields
+            if field.attname != 'password']
+
+
+def invalidate_tokens(*keys):
+    """Forget the cached users of the given token keys once the current
+    transaction commits.
+
+    Entries are removed from the shared cache and from this process'
+    local cache; other processes drop theirs within
+    USER_TOKEN_LOCAL_CACHE_TIMEOUT seconds. Forgetting them before the
+    commit would let a concurrent request cache the old rows again."""
+    cache_keys = [_cache_key(key) for key in keys]
+    if not cache_keys:
+        return
+
+    def invalidate():
+        for cache_key in cache_keys:
+            local_tokens.delete(cache_key)
+        if cache_is_shared():
+            cache.delete_many(cache_keys)
+
+    transaction.on_commit(invalidate)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token to user lookup.
+
+    Users are looked up in a bounded in-process LRU first, then in the
+    shared Django cache, and only then with the token and user join of
+    TokenAuthentication. The Django cache is skipped unless it is shared
+    by every process, as invalidations could not reach the copies of
+    the others. The caches hold the user's field values but for
+    the password, and every request gets a user instance of its own,
+    which loads the password from the database should it be needed. The
+    signal handlers in user.signals invalidate entries when a token is
+    deleted or its user is saved, updated or deleted."""
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        fields = _user_fields()
+        values = local_tokens.get(cache_key)
+        if values is None:
+            shared = cache_is_shared()
+            if shared:
+                values = cache.get(cache_key)
+            if values is None:
+                user, token = super().authenticate_credentials(key)
+                values = tuple(getattr(user, field) for field in fields)
+                if shared:
+                    cache.set(cache_key, values,
+                              timeout=settings.USER_TOKEN_CACHE_TIMEOUT)
+            local_tokens.set(cache_key, values)
+
+        model = get_user_model()
+        user = model.from_db(router.db_for_read(model), fields, values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        # An unsaved token stands in for request.auth so that a cache hit
+        # needs no query at all
+        return (user, self.get_model()(key=key, user=user))
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from core.models import users_updated
+from .authentication import invalidate_tokens
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Forget the cached user of a changed or deleted token"""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, **kwargs):
+    """Forget the cached copies of a modified or deleted user"""
+    keys = Token.objects.filter(user_id=instance.pk).values_list('key',
+                                                                 flat=True)
+    invalidate_tokens(*keys)
+
+
+@receiver(users_updated)
+def invalidate_updated_user_tokens(sender, pks, **kwargs):
+    """Forget the cached copies of users changed with update()"""
+    keys = Token.objects.filter(user_id__in=pks).values_list('key',
+                                                             flat=True)
+    invalidate_tokens(*keys)
@@ -0,0 +1,180 @@
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.authentication import CachedTokenAuthentication, LRUCache, \
+    _cache_key, local_tokens
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication"""
+
+    def setUp(self):
+        # The tests run in one process, where the local memory cache is
+        # shared like the cache of a deployment
+        patcher = patch('user.authentication.cache_is_shared',
+                        return_value=True)
+        self.cache_is_shared = patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        local_tokens.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@testdomain.com',
+            'test1234',
+            name='Test User'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test that repeated requests do not look the token up again"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_shared_cache_used_after_local_miss(self):
+        """Test that another process finds the user in the shared cache"""
+        self.client.get(ME_URL)
+        local_tokens.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_local_cache_not_used_as_shared(self):
+        """Test that a cache of this process only is not used as the
+        shared cache, which other processes could not invalidate"""
+        self.cache_is_shared.return_value = False
+        self.client.get(ME_URL)
+        local_tokens.clear()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(_cache_key(self.token.key)))
+
+    def test_invalidated_on_commit(self):
+        """Test that a deactivated user stays cached until the change is
+        committed, so that no request caches the old row again"""
+        self.client.get(ME_URL)
+        cache_key = _cache_key(self.token.key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            self.assertIsNotNone(local_tokens.get(cache_key))
+            self.assertIsNotNone(cache.get(cache_key))
+
+        self.assertIsNone(local_tokens.get(cache_key))
+        self.assertIsNone(cache.get(cache_key))
+
+    def test_invalid_token_rejected(self):
+        """Test that unknown tokens are still rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """Test that deleting a token invalidates its cached user"""
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test that deactivating a user invalidates the cached user"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_modified_user_refreshed(self):
+        """Test that changes to the user are seen by later requests"""
+        self.client.get(ME_URL)
+        self.user.name = 'New Name'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    def test_user_updated_rejected(self):
+        """Test that users deactivated with update() are rejected"""
+        self.client.get(ME_URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            get_user_model().objects.filter(pk=self.user.pk).update(
+                is_active=False
+            )
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_not_cached(self):
+        """Test that the password hash is left out of the cache and
+        loaded only when needed"""
+        self.client.get(ME_URL)
+
+        self.assertNotIn(self.user.password,
+                         cache.get(_cache_key(self.token.key)))
+        user, token = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key
+        )
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('test1234'))
+
+    def test_user_instance_per_request(self):
+        """Test that requests do not share a user instance"""
+        authentication = CachedTokenAuthentication()
+        first, token = authentication.authenticate_credentials(
+            self.token.key
+        )
+        first.name = 'Changed in one request'
+
+        second, token = authentication.authenticate_credentials(
+            self.token.key
+        )
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, 'Test User')
+
+    def test_lru_cache_bounded(self):
+        """Test that the local cache evicts the least recently used key"""
+        lru = LRUCache(maxsize=2, timeout=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')),
+                         (1, None, 3))
+
+    def test_lru_cache_expires(self):
+        """Test that local cache entries expire after the timeout"""
+        lru = LRUCache(maxsize=2, timeout=-1)
+        lru.set('a', 1)
+
+        self.assertIsNone(lru.get('a'))